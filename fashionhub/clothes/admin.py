@@ -1,15 +1,19 @@
 from django.contrib import admin
-from .models import Category, Product, ProductImage
+from .models import Category, Product, ProductImage, ProductVariant
 
 class ProductImageInline(admin.TabularInline):
     model = ProductImage
     extra = 1
 
+class ProductVariantInline(admin.TabularInline):
+    model = ProductVariant
+    extra = 0
+    fields = ('size', 'stock', 'sku')
+
 class ProductAdmin(admin.ModelAdmin):
     list_display = ('name', 'category', 'price', 'stock', 'is_available')
     prepopulated_fields = {'slug': ('name',)}
-    inlines = [ProductImageInline]
-    filter_horizontal = ('sizes',)
+    inlines = [ProductVariantInline, ProductImageInline]
 
 class CategoryAdmin(admin.ModelAdmin):
     prepopulated_fields = {'slug': ('name',)}
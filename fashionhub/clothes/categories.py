@@ -0,0 +1,49 @@
+from django.core.cache import cache
+
+from .models import Category
+
+
+# ---------------------------
+# In-process category lookup
+# ---------------------------
+#
+# Category listings resolve their slug on every request; the table is tiny and
+# rarely changes, so each process keeps a slug -> (id, name) map. The map is
+# tagged with a version number kept in the shared cache, which is bumped
+# whenever a Category is saved or deleted (see clothes.signals), so every
+# process reloads its map after a change made by any of them.
+
+_VERSION_KEY = 'categories:version'
+
+_by_slug = None
+
+
+def _version():
+    version = cache.get(_VERSION_KEY)
+    if version is None:
+        version = 1
+        cache.add(_VERSION_KEY, version, None)
+    return version
+
+
+def get_category(slug):
+    """Return (id, name) for a category slug, or None if there is no such category."""
+    global _by_slug
+    version = _version()
+    loaded = _by_slug
+    if loaded is None or loaded[0] != version:
+        loaded = (version, {
+            slug: (pk, name)
+            for pk, slug, name in Category.objects.values_list('id', 'slug', 'name')
+        })
+        _by_slug = loaded
+    return loaded[1].get(slug)
+
+
+def invalidate():
+    """Make every process reload its category map on its next lookup."""
+    try:
+        cache.incr(_VERSION_KEY)
+    except ValueError:
+        # No version stored yet (or it was evicted): start a fresh one
+        cache.set(_VERSION_KEY, 2, None)
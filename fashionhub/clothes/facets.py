@@ -0,0 +1,156 @@
+from decimal import Decimal
+
+from django.db.models import Count, Q
+
+from .models import Category, ProductVariant, Size
+
+
+# ---------------------------
+# Faceted catalogue filtering
+# ---------------------------
+#
+# Filters come from the query string (?category=men&size=M&size=L&price=1000-2500)
+# and every facet count on the page is computed in one aggregate query. Each
+# facet's counts honour the *other* active filters but not its own, so shoppers
+# can see how many products they would get by widening a selection.
+
+# (key, label, lower bound inclusive, upper bound exclusive)
+PRICE_BANDS = [
+    ('0-1000', 'Under ₹1,000', None, Decimal('1000')),
+    ('1000-2500', '₹1,000 – ₹2,500', Decimal('1000'), Decimal('2500')),
+    ('2500-5000', '₹2,500 – ₹5,000', Decimal('2500'), Decimal('5000')),
+    ('5000-', '₹5,000 & above', Decimal('5000'), None),
+]
+
+
+def _price_q(band):
+    _, _, low, high = band
+    q = Q()
+    if low is not None:
+        q &= Q(price__gte=low)
+    if high is not None:
+        q &= Q(price__lt=high)
+    return q
+
+
+def _any(qs):
+    """OR together a list of Q objects."""
+    combined = Q()
+    for q in qs:
+        combined |= q
+    return combined
+
+
+def _all(qs):
+    combined = Q()
+    for q in qs:
+        combined &= q
+    return combined
+
+
+def _count(q):
+    return Count('id', distinct=True, filter=q) if q else Count('id', distinct=True)
+
+
+class Facets:
+    """Selected filters and per-value counts for a product listing."""
+
+    def __init__(self, params, categories=None, sizes=None):
+        # Async views load the categories and sizes themselves and pass them in
+        self.categories = list(Category.objects.order_by('name')) if categories is None else categories
+        self.sizes = list(Size.objects.all()) if sizes is None else sizes
+
+        category_slugs = set(params.getlist('category'))
+        size_names = set(params.getlist('size'))
+        band_keys = set(params.getlist('price'))
+        self.selected = {
+            'category': [c for c in self.categories if c.slug in category_slugs],
+            'size': [s for s in self.sizes if s.name in size_names],
+            'price': [b for b in PRICE_BANDS if b[0] in band_keys],
+        }
+
+        # One condition per facet; a facet with nothing selected does not filter
+        self.conditions = {}
+        if self.selected['category']:
+            self.conditions['category'] = Q(category_id__in=[c.id for c in self.selected['category']])
+        if self.selected['size']:
+            self.conditions['size'] = Q(id__in=ProductVariant.objects
+                                        .filter(size__in=self.selected['size'], stock__gt=0)
+                                        .values('product_id'))
+        if self.selected['price']:
+            self.conditions['price'] = _any(_price_q(b) for b in self.selected['price'])
+        self.counts = {}
+
+    @property
+    def active(self):
+        return bool(self.conditions)
+
+    def _others(self, facet):
+        return _all(q for name, q in self.conditions.items() if name != facet)
+
+    def filter(self, qs):
+        """Apply every selected filter to ``qs``."""
+        return qs.filter(_all(self.conditions.values()))
+
+    def _count_expressions(self):
+        exprs = {}
+        for c in self.categories:
+            exprs[f'category_{c.id}'] = _count(self._others('category') & Q(category_id=c.id))
+        for s in self.sizes:
+            exprs[f'size_{s.id}'] = _count(
+                self._others('size') & Q(variants__size_id=s.id, variants__stock__gt=0)
+            )
+        for i, band in enumerate(PRICE_BANDS):
+            exprs[f'price_{i}'] = _count(self._others('price') & _price_q(band))
+        return exprs
+
+    def count(self, qs):
+        """Compute counts for every facet value over ``qs`` in a single query."""
+        exprs = self._count_expressions()
+        self.counts = qs.order_by().aggregate(**exprs) if exprs else {}
+        return self.counts
+
+    async def acount(self, qs):
+        exprs = self._count_expressions()
+        self.counts = await qs.order_by().aaggregate(**exprs) if exprs else {}
+        return self.counts
+
+    def options(self):
+        """Facet values for templates: {facet: [{value, label, count, selected}]}."""
+        return {
+            'category': [
+                {'value': c.slug, 'label': c.name, 'count': self.counts.get(f'category_{c.id}', 0),
+                 'selected': c in self.selected['category']}
+                for c in self.categories
+            ],
+            'size': [
+                {'value': s.name, 'label': s.name, 'count': self.counts.get(f'size_{s.id}', 0),
+                 'selected': s in self.selected['size']}
+                for s in self.sizes
+            ],
+            'price': [
+                {'value': b[0], 'label': b[1], 'count': self.counts.get(f'price_{i}', 0),
+                 'selected': b in self.selected['price']}
+                for i, b in enumerate(PRICE_BANDS)
+            ],
+        }
+
+
+def facet_listing(qs, params):
+    """Filter ``qs`` from the query string and count its facets.
+
+    Returns (filtered queryset, facet options for the template). Costs three
+    queries (categories, sizes, one aggregate) whatever the number of values.
+    """
+    facets = Facets(params)
+    facets.count(qs)
+    return facets.filter(qs), facets.options()
+
+
+async def afacet_listing(qs, params):
+    """facet_listing() for async views, with the same three queries."""
+    categories = [c async for c in Category.objects.order_by('name')]
+    sizes = [s async for s in Size.objects.all()]
+    facets = Facets(params, categories, sizes)
+    await facets.acount(qs)
+    return facets.filter(qs), facets.options()
@@ -0,0 +1,115 @@
+import hashlib
+import logging
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+
+# ---------------------------
+# Responsive image renditions
+# ---------------------------
+#
+# Every ProductImage gets downsized copies for thumbnails (cart/orders), grid
+# cards and the product zoom view, each in WebP and JPEG. Files are named by a
+# hash of the original's bytes, so re-uploading the same photo reuses the
+# existing renditions and a changed photo never serves a stale cached file.
+# The generated paths are recorded on ProductImage.renditions:
+#
+#   {"source": "products/x.jpg",
+#    "card": {"width": 480, "height": 640,
+#             "webp": "products/renditions/<hash>-card.webp",
+#             "jpeg": "products/renditions/<hash>-card.jpg"}, ...}
+
+# Rendition name -> maximum width in pixels (originals are never upscaled)
+RENDITION_WIDTHS = {
+    'thumb': 160,
+    'card': 480,
+    'zoom': 1200,
+}
+
+# Format key -> (Pillow format, file extension, save options)
+RENDITION_FORMATS = {
+    'webp': ('WEBP', 'webp', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', 'jpg', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+RENDITION_DIR = 'products/renditions'
+
+
+def _content_hash(fh):
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: fh.read(64 * 1024), b''):
+        digest.update(chunk)
+    return digest.hexdigest()[:16]
+
+
+def _for_format(image, fmt):
+    """Convert ``image`` to a mode the target format can store."""
+    if fmt == 'jpeg':
+        if image.mode in ('RGBA', 'LA', 'P'):
+            # JPEG has no alpha channel: flatten transparent areas onto white
+            image = image.convert('RGBA')
+            background = Image.new('RGB', image.size, (255, 255, 255))
+            background.paste(image, mask=image.getchannel('A'))
+            return background
+        return image.convert('RGB') if image.mode != 'RGB' else image
+    if image.mode in ('RGB', 'RGBA'):
+        return image
+    return image.convert('RGBA' if image.has_transparency_data else 'RGB')
+
+
+def build_renditions(name, storage=default_storage):
+    """Generate every rendition of the stored original ``name``.
+
+    Returns the mapping stored on ProductImage.renditions. Renditions that
+    already exist in storage are not regenerated. Raises OSError (including
+    PIL.UnidentifiedImageError) if the original cannot be read as an image,
+    or Image.DecompressionBombError if it is absurdly large.
+    """
+    with storage.open(name, 'rb') as fh:
+        digest = _content_hash(fh)
+        fh.seek(0)
+        with Image.open(fh) as original:
+            # Phone photos are often stored sideways with an EXIF rotation flag
+            source = ImageOps.exif_transpose(original)
+            source.load()
+
+    renditions = {'source': name}
+    for label, width in RENDITION_WIDTHS.items():
+        resized = source.copy()
+        resized.thumbnail((width, width * 4), Image.Resampling.LANCZOS)
+        entry = {'width': resized.width, 'height': resized.height}
+        for fmt, (pil_format, ext, options) in RENDITION_FORMATS.items():
+            path = f'{RENDITION_DIR}/{digest}-{label}.{ext}'
+            if not storage.exists(path):
+                buffer = BytesIO()
+                _for_format(resized, fmt).save(buffer, pil_format, **options)
+                path = storage.save(path, ContentFile(buffer.getvalue()))
+            entry[fmt] = path
+        renditions[label] = entry
+    return renditions
+
+
+def refresh_renditions(product_image):
+    """Build renditions for a ProductImage whose original has changed.
+
+    Does nothing if the recorded renditions already match the current file.
+    Unreadable uploads are logged and left without renditions, so templates
+    keep serving the original.
+    """
+    name = product_image.image.name if product_image.image else ''
+    if not name or product_image.renditions.get('source') == name:
+        return False
+    try:
+        renditions = build_renditions(name, product_image.image.storage)
+    except (OSError, Image.DecompressionBombError):
+        logger.warning("Could not build renditions for %s", name, exc_info=True)
+        return False
+    # update() rather than save() so the post_save hooks do not fire again
+    type(product_image).objects.filter(pk=product_image.pk).update(renditions=renditions)
+    product_image.renditions = renditions
+    return True
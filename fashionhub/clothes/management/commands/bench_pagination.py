@@ -0,0 +1,79 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.core.paginator import Paginator
+from django.db import transaction
+
+from clothes.models import Category, Product
+from clothes.pagination import CursorPaginator, encode_cursor
+
+
+PER_PAGE = 12
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare OFFSET (Paginator) and keyset (CursorPaginator) page latency on the first "
+        "and a deep page of a generated catalogue. Generated products are rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--pages", type=int, default=5000, help="Number of pages to generate; the last is timed.")
+        parser.add_argument("--repeat", type=int, default=20, help="Timed runs per measurement.")
+
+    def _time(self, fn, repeat):
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best * 1000
+
+    def handle(self, *args, **options):
+        pages = options["pages"]
+        repeat = options["repeat"]
+        total = pages * PER_PAGE
+        try:
+            with transaction.atomic():
+                category = Category.objects.create(name="__bench_pagination__", slug="__bench_pagination__")
+                for offset in range(0, total, 5_000):
+                    Product.objects.bulk_create([
+                        Product(
+                            category=category,
+                            name=f"Bench {i}",
+                            slug=f"__bench-page-{i}__",
+                            price="999.00",
+                        ) for i in range(offset, min(offset + 5_000, total))
+                    ])
+
+                qs = Product.objects.filter(category=category, is_available=True)
+
+                def offset_page(number):
+                    page = Paginator(qs.order_by("-created_at", "-id"), PER_PAGE).get_page(number)
+                    list(page)
+
+                # Token for the edge of page pages-1, so the keyset query fetches the last page
+                edge = qs.order_by("-created_at", "-id")[(pages - 1) * PER_PAGE - 1]
+                deep_token = encode_cursor(edge, "next")
+
+                def cursor_page(token):
+                    list(CursorPaginator(qs, PER_PAGE).get_page(token))
+
+                rows = [
+                    ("offset", 1, self._time(lambda: offset_page(1), repeat)),
+                    ("offset", pages, self._time(lambda: offset_page(pages), repeat)),
+                    ("cursor", 1, self._time(lambda: cursor_page(None), repeat)),
+                    ("cursor", pages, self._time(lambda: cursor_page(deep_token), repeat)),
+                ]
+                self.stdout.write(self.style.NOTICE(f"{total} products, {PER_PAGE} per page"))
+                for mode, number, ms in rows:
+                    self.stdout.write(f"  {mode:<7} page {number:>6}: {ms:8.2f} ms")
+                raise _Rollback
+        except _Rollback:
+            pass
+        self.stdout.write(self.style.SUCCESS("Benchmark finished; generated products rolled back."))
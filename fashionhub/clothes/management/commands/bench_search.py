@@ -0,0 +1,97 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+
+from clothes import search
+from clothes.models import Category, Product
+
+
+WORDS = [
+    'cotton', 'denim', 'leather', 'linen', 'wool', 'slim', 'relaxed', 'classic', 'vintage', 'zipper',
+    'jacket', 'shirt', 'trouser', 'hoodie', 'polo', 'cargo', 'track', 'pants', 'cap', 'scarf',
+    'black', 'white', 'navy', 'olive', 'grey', 'summer', 'winter', 'casual', 'formal', 'sport',
+]
+QUERIES = ['jacket', 'denim jack', 'winter wool', 'cap', 'zz-no-match']
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the old icontains search against the full-text search index at growing "
+        "catalogue sizes. All generated products are rolled back at the end."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--products",
+            type=int,
+            nargs="+",
+            default=[10_000, 100_000, 1_000_000],
+            help="Catalogue sizes to benchmark.",
+        )
+        parser.add_argument("--repeat", type=int, default=5, help="Timed runs per query.")
+
+    def _time(self, fn, repeat):
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best * 1000
+
+    def _old_search(self, query):
+        qs = Product.objects.filter(
+            Q(name__icontains=query) |
+            Q(description__icontains=query) |
+            Q(category__name__icontains=query),
+            is_available=True
+        ).select_related('category').order_by('-created_at').distinct()
+        qs.count()
+        list(qs[:12])
+
+    def _new_search(self, query):
+        results = search.search_products(query)
+        results.count()
+        list(results[:12])
+
+    def handle(self, *args, **options):
+        rng = random.Random(42)
+        try:
+            with transaction.atomic():
+                category = Category.objects.create(name="__bench_search__", slug="__bench_search__")
+                created = 0
+                for target in sorted(options["products"]):
+                    while created < target:
+                        batch = min(5_000, target - created)
+                        Product.objects.bulk_create([
+                            Product(
+                                category=category,
+                                name=" ".join(rng.sample(WORDS, 3)).title(),
+                                slug=f"__bench-search-{created + i}__",
+                                description=" ".join(rng.choices(WORDS, k=12)),
+                                price="999.00",
+                            ) for i in range(batch)
+                        ])
+                        created += batch
+                    # bulk_create skips signals, so refresh the index in one pass
+                    search.rebuild_index()
+
+                    self.stdout.write(self.style.NOTICE(f"{created} products"))
+                    for query in QUERIES:
+                        old = self._time(lambda: self._old_search(query), options["repeat"])
+                        new = self._time(lambda: self._new_search(query), options["repeat"])
+                        self.stdout.write(
+                            f"  {query!r:<16} icontains {old:9.2f} ms   full-text {new:9.2f} ms   "
+                            f"({old / new if new else float('inf'):.1f}x)"
+                        )
+                raise _Rollback
+        except _Rollback:
+            pass
+        self.stdout.write(self.style.SUCCESS("Benchmark finished; generated products rolled back."))
@@ -0,0 +1,124 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from wsgiref.util import setup_testing_defaults
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db.backends.signals import connection_created
+from django.urls import reverse
+
+from clothes.models import Category, Product
+
+PROFILES = ("development", "production")
+
+# Fresh interpreter: time from importing the WSGI module to having an application
+_STARTUP_SNIPPET = (
+    "import time; start = time.perf_counter(); "
+    "from fashionhub.wsgi import application; "
+    "print(time.perf_counter() - start)"
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the development and production settings profiles (DJANGO_ENV): cold "
+        "start-up time of the WSGI application and requests/sec for anonymous catalogue "
+        "pages served through the WSGI handler. Each profile runs in its own process; "
+        "only GET requests are made, so nothing is written."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=500, help="Timed requests per profile.")
+        parser.add_argument("--startup-runs", type=int, default=5, help="Cold starts timed per profile (median reported).")
+        # Internal: run the request loop in this process and print the result as JSON
+        parser.add_argument("--serve", action="store_true", help="Used by the benchmark's child processes.")
+
+    def _urls(self):
+        urls = [reverse("home"), reverse("product_list"), reverse("contact")]
+        category = Category.objects.order_by("id").first()
+        if category is not None:
+            urls.append(reverse("category", args=[category.slug]))
+        product = Product.objects.filter(is_available=True).order_by("id").first()
+        if product is not None:
+            urls.append(reverse("product_detail", args=[product.slug]))
+        return urls
+
+    def _serve(self, count):
+        from django.core.wsgi import get_wsgi_application
+
+        application = get_wsgi_application()
+        urls = self._urls()
+        opened = [0]
+        connection_created.connect(lambda **kwargs: opened.__setitem__(0, opened[0] + 1), weak=False)
+
+        def get(url):
+            environ = {"PATH_INFO": url, "HTTP_HOST": "localhost", "SERVER_NAME": "localhost"}
+            setup_testing_defaults(environ)
+            response = application(environ, lambda status, headers: None)
+            try:
+                for _ in response:
+                    pass
+            finally:
+                # Fires request_finished, which is when CONN_MAX_AGE is honoured
+                response.close()
+            return response.status_code
+
+        for url in urls:
+            if get(url) != 200:
+                raise CommandError(f"GET {url} did not return 200 under DJANGO_ENV={settings.DJANGO_ENV}.")
+        opened[0] = 0
+        start = time.perf_counter()
+        for i in range(count):
+            get(urls[i % len(urls)])
+        elapsed = time.perf_counter() - start
+        self.stdout.write(json.dumps({
+            "requests": count, "elapsed": elapsed, "connections": opened[0], "urls": urls, "debug": settings.DEBUG,
+        }))
+
+    def _env(self, profile):
+        env = dict(os.environ, DJANGO_ENV=profile)
+        if profile == "production":
+            # Throwaway values so the production profile can start on a dev machine
+            env.setdefault("DJANGO_SECRET_KEY", "bench-" + os.urandom(24).hex())
+            hosts = env.get("DJANGO_ALLOWED_HOSTS", "")
+            env["DJANGO_ALLOWED_HOSTS"] = f"{hosts},localhost" if hosts else "localhost"
+        return env
+
+    def _run(self, args, env):
+        result = subprocess.run(args, env=env, cwd=settings.BASE_DIR, capture_output=True, text=True)
+        if result.returncode:
+            raise CommandError(result.stderr.strip() or result.stdout.strip())
+        return result.stdout.strip().splitlines()[-1]
+
+    def handle(self, *args, **options):
+        if options["serve"]:
+            self._serve(options["requests"])
+            return
+
+        manage = str(settings.BASE_DIR / "manage.py")
+        results = []
+        for profile in PROFILES:
+            env = self._env(profile)
+            startups = [
+                float(self._run([sys.executable, "-c", _STARTUP_SNIPPET], env))
+                for _ in range(options["startup_runs"])
+            ]
+            served = json.loads(self._run(
+                [sys.executable, manage, "bench_settings_profiles", "--serve", "--requests", str(options["requests"])],
+                env,
+            ))
+            results.append((profile, statistics.median(startups), served))
+
+        self.stdout.write(self.style.NOTICE(f"Pages: {', '.join(results[0][2]['urls'])}"))
+        for profile, startup, served in results:
+            self.stdout.write(
+                f"  {profile:<12} start-up {startup * 1000:7.1f} ms   "
+                f"{served['requests'] / served['elapsed']:8.1f} req/s   "
+                f"{served['connections']} DB connection(s) opened for {served['requests']} requests"
+                f"{'   (DEBUG on)' if served['debug'] else ''}"
+            )
+        self.stdout.write(self.style.SUCCESS("Benchmark finished; no data was written."))
@@ -0,0 +1,169 @@
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+from wsgiref.util import setup_testing_defaults
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+
+from clothes.models import Product
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare read throughput of the WSGI handler (synchronous views, one thread per "
+        "in-flight request) against the ASGI handler (async views on one event loop) at high "
+        "concurrency. Requests the product list, a product page, a search and the cart "
+        "in-process, without a network server. Each handler runs in its own process; only "
+        "GET requests are made."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--concurrency", type=int, default=64, help="Requests in flight at once.")
+        parser.add_argument("--requests", type=int, default=1000, help="Timed requests per handler.")
+        # Internal: run one handler in this process and print the result as JSON
+        parser.add_argument("--serve", choices=["wsgi", "asgi"], help="Used by the benchmark's child processes.")
+
+    def _urls(self):
+        urls = [reverse("product_list"), reverse("cart")]
+        product = Product.objects.filter(is_available=True).order_by("id").first()
+        if product is not None:
+            urls.append(reverse("product_detail", args=[product.slug]))
+            urls.append(f"{reverse('search')}?q={product.name.split()[0]}")
+        return urls
+
+    def _wsgi(self, urls, count, concurrency):
+        from django.core.wsgi import get_wsgi_application
+        from django.db import connection
+
+        application = get_wsgi_application()
+
+        def get(url):
+            parts = urlsplit(url)
+            environ = {"PATH_INFO": parts.path, "QUERY_STRING": parts.query,
+                       "HTTP_HOST": "localhost", "SERVER_NAME": "localhost"}
+            setup_testing_defaults(environ)
+            start = time.perf_counter()
+            response = application(environ, lambda status, headers: None)
+            try:
+                for _ in response:
+                    pass
+            finally:
+                response.close()
+            return response.status_code, time.perf_counter() - start
+
+        def get_and_close(url):
+            try:
+                return get(url)
+            finally:
+                connection.close()
+
+        for url in urls:
+            if get(url)[0] != 200:
+                raise CommandError(f"GET {url} did not return 200 under WSGI.")
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            start = time.perf_counter()
+            results = list(pool.map(get, (urls[i % len(urls)] for i in range(count))))
+            elapsed = time.perf_counter() - start
+            # Each worker thread opened its own connection
+            list(pool.map(get_and_close, urls * concurrency))
+        return results, elapsed
+
+    def _asgi(self, urls, count, concurrency):
+        from django.core.asgi import get_asgi_application
+
+        application = get_asgi_application()
+
+        async def get(url):
+            parts = urlsplit(url)
+            scope = {
+                "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+                "scheme": "http", "path": parts.path, "raw_path": parts.path.encode(),
+                "query_string": parts.query.encode(), "root_path": "",
+                "headers": [(b"host", b"localhost")], "client": ("127.0.0.1", 50000), "server": ("localhost", 80),
+            }
+            body_sent = asyncio.Event()
+            status = []
+
+            async def receive():
+                if not body_sent.is_set():
+                    body_sent.set()
+                    return {"type": "http.request", "body": b"", "more_body": False}
+                # Django listens for a disconnect; the client never goes away
+                await asyncio.Future()
+
+            async def send(message):
+                if message["type"] == "http.response.start":
+                    status.append(message["status"])
+
+            start = time.perf_counter()
+            await application(scope, receive, send)
+            return status[0], time.perf_counter() - start
+
+        async def run():
+            for url in urls:
+                if (await get(url))[0] != 200:
+                    raise CommandError(f"GET {url} did not return 200 under ASGI.")
+            queue = iter(range(count))
+            results = []
+
+            async def client():
+                for i in queue:
+                    results.append(await get(urls[i % len(urls)]))
+
+            start = time.perf_counter()
+            await asyncio.gather(*(client() for _ in range(concurrency)))
+            return results, time.perf_counter() - start
+
+        return asyncio.run(run())
+
+    def _serve(self, handler, count, concurrency):
+        urls = self._urls()
+        run = self._wsgi if handler == "wsgi" else self._asgi
+        results, elapsed = run(urls, count, concurrency)
+        latencies = sorted(latency for _, latency in results)
+        self.stdout.write(json.dumps({
+            "requests": len(results), "elapsed": elapsed, "urls": urls,
+            "errors": sum(1 for status, _ in results if status != 200),
+            "p50": statistics.median(latencies), "p95": latencies[int(len(latencies) * 0.95) - 1],
+            "async_views": settings.ASYNC_VIEWS,
+        }))
+
+    def handle(self, *args, **options):
+        count, concurrency = options["requests"], options["concurrency"]
+        if options["serve"]:
+            self._serve(options["serve"], count, concurrency)
+            return
+
+        manage = str(settings.BASE_DIR / "manage.py")
+        results = []
+        for handler in ("wsgi", "asgi"):
+            # Each deployment gets the views its entry point selects
+            env = dict(os.environ, DJANGO_ASYNC_VIEWS="1" if handler == "asgi" else "0")
+            result = subprocess.run(
+                [sys.executable, manage, "bench_wsgi_asgi", "--serve", handler,
+                 "--requests", str(count), "--concurrency", str(concurrency)],
+                env=env, cwd=settings.BASE_DIR, capture_output=True, text=True,
+            )
+            if result.returncode:
+                raise CommandError(result.stderr.strip() or result.stdout.strip())
+            results.append((handler, json.loads(result.stdout.strip().splitlines()[-1])))
+
+        self.stdout.write(self.style.NOTICE(
+            f"{count} requests, {concurrency} in flight, over {', '.join(results[0][1]['urls'])}"
+        ))
+        for handler, served in results:
+            views = "async views" if served["async_views"] else "sync views"
+            self.stdout.write(
+                f"  {handler.upper()} ({views:<11}) {served['requests'] / served['elapsed']:8.1f} req/s   "
+                f"p50 {served['p50'] * 1000:7.1f} ms   p95 {served['p95'] * 1000:7.1f} ms   "
+                f"{served['errors']} error(s)"
+            )
+        self.stdout.write(self.style.SUCCESS("Benchmark finished; no data was written."))
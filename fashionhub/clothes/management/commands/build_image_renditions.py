@@ -0,0 +1,59 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+from PIL import Image
+
+from clothes import sections
+from clothes.images import build_renditions
+from clothes.models import ProductImage
+
+
+def _build(name):
+    # Runs in a worker process; only touches storage, never the database
+    try:
+        return name, build_renditions(name), None
+    except (OSError, Image.DecompressionBombError) as exc:
+        return name, None, str(exc)
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate thumbnail/card/zoom WebP and JPEG renditions for product images that do "
+        "not have them yet (or whose original was replaced), using a pool of worker processes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                            help="Worker processes (default: number of CPUs).")
+
+    def handle(self, *args, **options):
+        pending = {}
+        for pk, name, renditions in ProductImage.objects.values_list("pk", "image", "renditions"):
+            if name and renditions.get("source") != name:
+                pending.setdefault(name, []).append(pk)
+
+        if not pending:
+            self.stdout.write(self.style.SUCCESS("All product images already have renditions."))
+            return
+
+        self.stdout.write(f"Building renditions for {len(pending)} image(s) with {options['workers']} worker(s)...")
+        # Forked workers must not share the parent's database connection
+        connections.close_all()
+        built = failed = 0
+        with ProcessPoolExecutor(max_workers=options["workers"], initializer=django.setup) as pool:
+            futures = [pool.submit(_build, name) for name in pending]
+            for future in as_completed(futures):
+                name, renditions, error = future.result()
+                if error:
+                    failed += 1
+                    self.stderr.write(f"  {name}: {error}")
+                    continue
+                ProductImage.objects.filter(pk__in=pending[name]).update(renditions=renditions)
+                built += 1
+
+        if built:
+            sections.invalidate()
+        self.stdout.write(self.style.SUCCESS(f"Built {built} image(s); {failed} failed."))
@@ -0,0 +1,78 @@
+# Generated by Django 5.2.7 on 2026-10-18 10:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def copy_sizes_to_variants(apps, schema_editor):
+    """Create one ProductVariant per existing product/size through row.
+
+    The product's stock is split evenly across its sizes (remainder to the
+    first sizes) so the total on hand is unchanged.
+    """
+    Product = apps.get_model('clothes', 'Product')
+    ProductVariant = apps.get_model('clothes', 'ProductVariant')
+    through = Product.sizes.through
+
+    sizes_by_product = {}
+    for row in through.objects.select_related('size').order_by('product_id', 'size__name'):
+        sizes_by_product.setdefault(row.product_id, []).append(row.size)
+
+    variants = []
+    for product in Product.objects.filter(id__in=sizes_by_product):
+        sizes = sizes_by_product[product.id]
+        share, remainder = divmod(product.stock, len(sizes))
+        for index, size in enumerate(sizes):
+            variants.append(ProductVariant(
+                product=product,
+                size=size,
+                stock=share + (1 if index < remainder else 0),
+                sku=f"{product.slug}-{size.name}".upper(),
+            ))
+    ProductVariant.objects.bulk_create(variants)
+
+
+def copy_variants_to_sizes(apps, schema_editor):
+    Product = apps.get_model('clothes', 'Product')
+    ProductVariant = apps.get_model('clothes', 'ProductVariant')
+    through = Product.sizes.through
+    through.objects.bulk_create([
+        through(product_id=product_id, size_id=size_id)
+        for product_id, size_id in ProductVariant.objects.values_list('product_id', 'size_id')
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clothes', '0003_size_product_sizes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductVariant',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stock', models.PositiveIntegerField(default=0)),
+                ('sku', models.CharField(blank=True, max_length=64, null=True, unique=True)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='variants', to='clothes.product')),
+                ('size', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='variants', to='clothes.size')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='productvariant',
+            constraint=models.UniqueConstraint(fields=('product', 'size'), name='unique_product_size'),
+        ),
+        migrations.RunPython(copy_sizes_to_variants, copy_variants_to_sizes),
+        # An auto-created M2M cannot be altered to use a through model, so drop
+        # the old through table and re-add the field on top of ProductVariant.
+        migrations.RemoveField(
+            model_name='product',
+            name='sizes',
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='sizes',
+            field=models.ManyToManyField(blank=True, related_name='products', through='clothes.ProductVariant', to='clothes.size'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.7 on 2026-10-18 10:16
+
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    from clothes import search
+    search.rebuild_index(schema_editor.connection)
+
+
+def drop_search_index(apps, schema_editor):
+    from clothes import search
+    search.drop_index(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clothes', '0004_productvariant'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.7 on 2026-10-18 11:03
+
+from django.db import migrations, models
+
+
+def clear_sized_product_stock(apps, schema_editor):
+    # Sized products are stocked per size; a leftover Product.stock would
+    # otherwise still be sold under a missing or unknown size
+    Product = apps.get_model('clothes', 'Product')
+    ProductVariant = apps.get_model('clothes', 'ProductVariant')
+    Product.objects.filter(pk__in=ProductVariant.objects.values('product_id')).update(stock=0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clothes', '0008_product_listing_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='product',
+            name='stock',
+            field=models.PositiveIntegerField(default=0, help_text='Only for products without sizes; sized products keep their stock on each size.'),
+        ),
+        migrations.RunPython(clear_sized_product_stock, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,6 @@
 from django.db import models
+from django.db.models import BooleanField, Exists, ExpressionWrapper, F, OuterRef, Q, Window
+from django.db.models.functions import RowNumber
 from django.utils.text import slugify
 
 
@@ -26,12 +28,23 @@ class Product(models.Model):
     slug = models.SlugField(unique=True, blank=True)
     description = models.TextField(blank=True)
     price = models.DecimalField(max_digits=10, decimal_places=2)
-    stock = models.PositiveIntegerField(default=0)
+    stock = models.PositiveIntegerField(
+        default=0, help_text='Only for products without sizes; sized products keep their stock on each size.')
     is_available = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
-    # Available sizes for the product (e.g., M, L, XL, XXL)
-    sizes = models.ManyToManyField('Size', blank=True, related_name='products')
+    # Available sizes for the product (e.g., M, L, XL, XXL); per-size stock lives on ProductVariant
+    sizes = models.ManyToManyField('Size', blank=True, related_name='products', through='ProductVariant')
+
+    class Meta:
+        indexes = [
+            # Every listing shows available products newest-first (keyset
+            # pagination on created_at, id); partial, so hidden products cost nothing
+            models.Index(fields=['-created_at', '-id'], condition=models.Q(is_available=True),
+                         name='product_available_created_idx'),
+            models.Index(fields=['category', '-created_at', '-id'], condition=models.Q(is_available=True),
+                         name='product_cat_available_idx'),
+        ]
 
     def save(self, *args, **kwargs):
         if not self.slug:
@@ -47,11 +60,27 @@ class ProductImage(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='images')
     image = models.ImageField(upload_to='products/')
     alt_text = models.CharField(max_length=150, blank=True)
+    # Resized WebP/JPEG copies of ``image``, filled in by clothes.images
+    renditions = models.JSONField(default=dict, blank=True, editable=False)
 
     def __str__(self):
         return f"Image for {self.product.name}"
 
 
+def primary_image_prefetch(lookup='images'):
+    """Prefetch only each product's primary (first uploaded) image.
+
+    The images land in a ``primary_images`` list on every product, which the
+    ``primary_image`` template filter reads, so a grid of cards costs one
+    image query however many cards it has. ``lookup`` may be a nested path
+    such as ``'items__product__images'``.
+    """
+    first_images = (ProductImage.objects
+                    .annotate(position=Window(RowNumber(), partition_by=F('product_id'), order_by=F('id').asc()))
+                    .filter(position=1))
+    return models.Prefetch(lookup, queryset=first_images, to_attr='primary_images')
+
+
 # Size model to represent available sizes for products
 class Size(models.Model):
     name = models.CharField(max_length=10, unique=True)
@@ -61,3 +90,39 @@ class Size(models.Model):
 
     def __str__(self):
         return self.name
+
+
+# Product Variant Model (one row per product and size, with its own stock)
+class ProductVariant(models.Model):
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='variants')
+    size = models.ForeignKey(Size, on_delete=models.CASCADE, related_name='variants')
+    stock = models.PositiveIntegerField(default=0)
+    sku = models.CharField(max_length=64, unique=True, blank=True, null=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'size'], name='unique_product_size'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if not self.sku:
+            self.sku = f"{self.product.slug}-{self.size.name}".upper()
+        super().save(*args, **kwargs)
+
+    @property
+    def in_stock(self):
+        return self.stock > 0
+
+    def __str__(self):
+        return f"{self.product.name} ({self.size.name})"
+
+
+def with_stock_status(qs):
+    """Annotate each product with ``in_stock``.
+
+    Products sold in sizes are in stock when any size is; Product.stock only
+    counts for products that have no variants (and is kept at 0 otherwise).
+    """
+    sized_in_stock = ProductVariant.objects.filter(product=OuterRef('pk'), stock__gt=0)
+    return qs.annotate(in_stock=ExpressionWrapper(Q(stock__gt=0) | Exists(sized_in_stock),
+                                                  output_field=BooleanField()))
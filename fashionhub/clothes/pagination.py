@@ -0,0 +1,143 @@
+from asgiref.sync import sync_to_async
+from django.core import signing
+from django.core.paginator import EmptyPage, Page, PageNotAnInteger, Paginator
+from django.db.models import Q, QuerySet
+from django.utils.dateparse import parse_datetime
+
+
+# ---------------------------
+# Keyset (cursor) pagination
+# ---------------------------
+#
+# Pages are addressed by an opaque token holding the (created_at, id) of the
+# row at the page edge instead of an OFFSET, so every page is one indexed range
+# scan and no COUNT(*) is needed. Listings are newest-first.
+
+_SALT = 'clothes.pagination.cursor'
+
+
+def encode_cursor(obj, direction):
+    return signing.dumps({'c': obj.created_at.isoformat(), 'i': obj.pk, 'd': direction}, salt=_SALT, compress=True)
+
+
+def decode_cursor(token):
+    """Return (created_at, id, direction) for a token, or None if it is missing or invalid."""
+    if not token:
+        return None
+    try:
+        data = signing.loads(token, salt=_SALT)
+        created_at = parse_datetime(data['c'])
+        if created_at is None or data['d'] not in ('next', 'prev'):
+            return None
+        return created_at, int(data['i']), data['d']
+    except (signing.BadSignature, KeyError, TypeError, ValueError):
+        return None
+
+
+class CursorPage:
+    """One page of a CursorPaginator; iterable like a Paginator page."""
+
+    is_cursor = True
+
+    def __init__(self, object_list, has_next, has_previous):
+        self.object_list = object_list
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    @property
+    def next_cursor(self):
+        if not (self._has_next and self.object_list):
+            return None
+        return encode_cursor(self.object_list[-1], 'next')
+
+    @property
+    def previous_cursor(self):
+        if not (self._has_previous and self.object_list):
+            return None
+        return encode_cursor(self.object_list[0], 'prev')
+
+
+class CursorPaginator:
+    """Paginate a queryset newest-first on (created_at, id) using cursor tokens."""
+
+    def __init__(self, object_list, per_page):
+        self.object_list = object_list.order_by('-created_at', '-id')
+        self.per_page = per_page
+
+    def _page_query(self, token):
+        """Return (queryset of up to per_page + 1 rows, direction, had a cursor)."""
+        cursor = decode_cursor(token)
+        if cursor is None:
+            return self.object_list[:self.per_page + 1], 'next', False
+
+        created_at, pk, direction = cursor
+        if direction == 'next':
+            qs = self.object_list.filter(
+                Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk)
+            )
+        else:
+            qs = self.object_list.filter(
+                Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=pk)
+            ).order_by('created_at', 'id')
+        return qs[:self.per_page + 1], direction, True
+
+    def _make_page(self, rows, direction, has_cursor):
+        page = rows[:self.per_page]
+        more = len(rows) > self.per_page
+        if direction == 'next':
+            return CursorPage(page, more, has_cursor)
+        page.reverse()
+        return CursorPage(page, True, more)
+
+    def get_page(self, token):
+        qs, direction, has_cursor = self._page_query(token)
+        return self._make_page(list(qs), direction, has_cursor)
+
+    async def aget_page(self, token):
+        """get_page() for async views, fetching the rows with the async ORM."""
+        qs, direction, has_cursor = self._page_query(token)
+        return self._make_page([row async for row in qs], direction, has_cursor)
+
+
+class AsyncPaginator(Paginator):
+    """Paginator that async views can count and fetch a page from.
+
+    Querysets go through the async ORM; other sequences (search results) are
+    read in a worker thread, the same way the async ORM runs its queries.
+    """
+
+    async def aget_page(self, number):
+        if isinstance(self.object_list, QuerySet):
+            self.count = await self.object_list.acount()
+        else:
+            self.count = await sync_to_async(len)(self.object_list)
+        try:
+            number = self.validate_number(number)
+        except PageNotAnInteger:
+            number = 1
+        except EmptyPage:
+            number = self.num_pages
+        bottom = (number - 1) * self.per_page
+        top = bottom + self.per_page
+        if top + self.orphans >= self.count:
+            top = self.count
+        if isinstance(self.object_list, QuerySet):
+            rows = [row async for row in self.object_list[bottom:top]]
+        else:
+            rows = await sync_to_async(self.object_list.__getitem__)(slice(bottom, top))
+        return Page(rows, number, self)
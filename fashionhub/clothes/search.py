@@ -0,0 +1,206 @@
+import re
+
+from django.db import connection
+from django.db.models import Q
+
+from .models import Product, primary_image_prefetch
+
+
+# ---------------------------
+# Full-text product search
+# ---------------------------
+#
+# SQLite keeps an FTS5 virtual table keyed by product id; PostgreSQL keeps a
+# side table with a weighted tsvector and a GIN index. Both are kept in sync by
+# the Product/Category signals in clothes.signals and can be rebuilt with the
+# rebuild_search_index command. Other databases fall back to icontains.
+
+SQLITE_TABLE = 'clothes_product_fts'
+POSTGRES_TABLE = 'clothes_product_search'
+
+# Relative weight of the name, description and category columns
+SQLITE_RANK = f"bm25({SQLITE_TABLE}, 10.0, 1.0, 5.0)"
+
+_DOCUMENT_SQL = """
+    SELECT p.id, p.name, COALESCE(p.description, ''), COALESCE(c.name, '')
+    FROM clothes_product p
+    LEFT JOIN clothes_category c ON c.id = p.category_id
+"""
+
+
+def _vendor(conn=None):
+    return (conn or connection).vendor
+
+
+def tokenize(query):
+    """Split a free-text query into lower-case word tokens (punctuation dropped)."""
+    return re.findall(r'\w+', query.lower())
+
+
+def create_index(conn=None):
+    """Create the search table for the current database engine if it is missing."""
+    conn = conn or connection
+    with conn.cursor() as cursor:
+        if _vendor(conn) == 'sqlite':
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {SQLITE_TABLE} "
+                "USING fts5(name, description, category, tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+            )
+        elif _vendor(conn) == 'postgresql':
+            cursor.execute(
+                f"CREATE TABLE IF NOT EXISTS {POSTGRES_TABLE} ("
+                "product_id bigint PRIMARY KEY REFERENCES clothes_product (id) ON DELETE CASCADE, "
+                "document tsvector NOT NULL)"
+            )
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS {POSTGRES_TABLE}_document_gin "
+                f"ON {POSTGRES_TABLE} USING GIN (document)"
+            )
+
+
+def drop_index(conn=None):
+    conn = conn or connection
+    table = {'sqlite': SQLITE_TABLE, 'postgresql': POSTGRES_TABLE}.get(_vendor(conn))
+    if table:
+        with conn.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {table}")
+
+
+def _reindex(where='', params=(), conn=None):
+    """Re-populate search rows for the products matching ``where`` in one statement."""
+    conn = conn or connection
+    vendor = _vendor(conn)
+    select = _DOCUMENT_SQL + (f" WHERE {where}" if where else '')
+    with conn.cursor() as cursor:
+        if vendor == 'sqlite':
+            if where:
+                cursor.execute(
+                    f"DELETE FROM {SQLITE_TABLE} WHERE rowid IN (SELECT p.id FROM clothes_product p WHERE {where})",
+                    params,
+                )
+            else:
+                cursor.execute(f"DELETE FROM {SQLITE_TABLE}")
+            cursor.execute(
+                f"INSERT INTO {SQLITE_TABLE} (rowid, name, description, category) {select}",
+                params,
+            )
+        elif vendor == 'postgresql':
+            cursor.execute(
+                f"INSERT INTO {POSTGRES_TABLE} (product_id, document) "
+                "SELECT id, setweight(to_tsvector('simple', name), 'A') "
+                "|| setweight(to_tsvector('simple', description), 'C') "
+                "|| setweight(to_tsvector('simple', category), 'B') "
+                f"FROM ({select}) AS doc (id, name, description, category) "
+                "ON CONFLICT (product_id) DO UPDATE SET document = EXCLUDED.document",
+                params,
+            )
+
+
+def rebuild_index(conn=None):
+    """Rebuild the whole search index from the product table."""
+    create_index(conn)
+    if _vendor(conn) == 'postgresql':
+        with (conn or connection).cursor() as cursor:
+            cursor.execute(f"TRUNCATE {POSTGRES_TABLE}")
+    _reindex(conn=conn)
+
+
+def index_product(product_id):
+    _reindex('p.id = %s', [product_id])
+
+
+def index_category(category_id):
+    _reindex('p.category_id = %s', [category_id])
+
+
+def remove_product(product_id):
+    # PostgreSQL rows go away through ON DELETE CASCADE
+    if _vendor() == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {SQLITE_TABLE} WHERE rowid = %s", [product_id])
+
+
+class SearchResults:
+    """Lazily evaluated, rank-ordered search hits usable with Paginator.
+
+    ``count()`` and slicing each run one SQL statement against the search
+    index; slices are hydrated into Product objects with their category and
+    primary image loaded.
+    """
+
+    def __init__(self, tokens):
+        vendor = _vendor()
+        if vendor == 'sqlite':
+            self.match = ' '.join(f'"{t}"*' for t in tokens)
+            self.from_sql = (
+                f"FROM {SQLITE_TABLE} JOIN clothes_product p ON p.id = {SQLITE_TABLE}.rowid "
+                f"WHERE {SQLITE_TABLE} MATCH %s AND p.is_available"
+            )
+            self.rank_sql = f"{SQLITE_RANK}, p.created_at DESC"
+            self.params = [self.match]
+        else:
+            self.match = ' & '.join(f"{t}:*" for t in tokens)
+            self.from_sql = (
+                f"FROM {POSTGRES_TABLE} s JOIN clothes_product p ON p.id = s.product_id "
+                "WHERE s.document @@ to_tsquery('simple', %s) AND p.is_available"
+            )
+            self.rank_sql = "ts_rank(s.document, to_tsquery('simple', %s)) DESC, p.created_at DESC"
+            self.params = [self.match]
+        self._count = None
+
+    def count(self):
+        if self._count is None:
+            with connection.cursor() as cursor:
+                cursor.execute(f"SELECT COUNT(*) {self.from_sql}", self.params)
+                self._count = cursor.fetchone()[0]
+        return self._count
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        start = index.start or 0
+        stop = index.stop if index.stop is not None else self.count()
+        if stop <= start:
+            return []
+        params = list(self.params)
+        if _vendor() != 'sqlite':
+            params.append(self.match)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT p.id {self.from_sql} ORDER BY {self.rank_sql} LIMIT %s OFFSET %s",
+                params + [stop - start, start],
+            )
+            ids = [row[0] for row in cursor.fetchall()]
+        products = (Product.objects
+                    .select_related('category')
+                    .prefetch_related(primary_image_prefetch())
+                    .in_bulk(ids))
+        return [products[pid] for pid in ids if pid in products]
+
+
+def search_products(query):
+    """Return rank-ordered available products matching every word of ``query``.
+
+    Each word is matched as a prefix, so "jack" finds "Jacket".
+    """
+    tokens = tokenize(query)
+    if not tokens:
+        return Product.objects.none()
+    if _vendor() in ('sqlite', 'postgresql'):
+        return SearchResults(tokens)
+
+    # No search index for this engine: fall back to a LIKE scan
+    condition = Q()
+    for token in tokens:
+        condition &= (Q(name__icontains=token) |
+                      Q(description__icontains=token) |
+                      Q(category__name__icontains=token))
+    return (Product.objects
+            .filter(condition, is_available=True)
+            .select_related('category')
+            .prefetch_related(primary_image_prefetch())
+            .order_by('-created_at')
+            .distinct())
@@ -0,0 +1,84 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F, Q, Window
+from django.db.models.functions import RowNumber
+from django.template.loader import render_to_string
+
+from .categories import get_category
+from .models import Product, primary_image_prefetch
+
+
+# ---------------------------
+# Cached homepage sections
+# ---------------------------
+#
+# The Featured / New Arrivals / Accessories blocks on the homepage are the
+# same for every visitor, so they are rendered once and the HTML is kept in
+# the cache. The cache key carries a version number that is bumped whenever a
+# Product, ProductImage or Category changes (see clothes.signals); old entries
+# are never read again and simply expire.
+
+FEATURED_COUNT = 3
+NEW_ARRIVALS_COUNT = 4
+ACCESSORIES_COUNT = 3
+ACCESSORIES_SLUG = 'accessories'
+
+_VERSION_KEY = 'home_sections:version'
+
+
+def _version():
+    version = cache.get(_VERSION_KEY)
+    if version is None:
+        version = 1
+        cache.add(_VERSION_KEY, version, None)
+    return version
+
+
+def invalidate():
+    """Make every cached copy of the homepage sections stale."""
+    try:
+        cache.incr(_VERSION_KEY)
+    except ValueError:
+        # No version stored yet (or it was evicted): start a fresh one
+        cache.set(_VERSION_KEY, 2, None)
+
+
+def build_home_sections():
+    """Return {'featured_products', 'new_arrivals', 'accessories'} lists.
+
+    The newest available products and the newest accessories come from a
+    single query that ranks products both overall and within their category,
+    plus one prefetch for their primary images.
+    """
+    newest_first = [F('created_at').desc(), F('id').desc()]
+    qs = (Product.objects
+          .filter(is_available=True)
+          .annotate(
+              overall_rank=Window(RowNumber(), order_by=newest_first),
+              category_rank=Window(RowNumber(), partition_by=F('category_id'), order_by=newest_first),
+          ))
+    wanted = Q(overall_rank__lte=FEATURED_COUNT + NEW_ARRIVALS_COUNT)
+    category = get_category(ACCESSORIES_SLUG)
+    if category is not None:
+        wanted |= Q(category_id=category[0], category_rank__lte=ACCESSORIES_COUNT)
+
+    rows = list(qs.filter(wanted).order_by('-created_at', '-id').prefetch_related(primary_image_prefetch()))
+    newest = [p for p in rows if p.overall_rank <= FEATURED_COUNT + NEW_ARRIVALS_COUNT]
+    return {
+        'featured_products': newest[:FEATURED_COUNT],
+        'new_arrivals': newest[FEATURED_COUNT:],
+        'accessories': [
+            p for p in rows
+            if category is not None and p.category_id == category[0] and p.category_rank <= ACCESSORIES_COUNT
+        ],
+    }
+
+
+def home_sections_html():
+    """Rendered homepage sections, served from the cache when possible."""
+    key = f'home_sections:{_version()}'
+    html = cache.get(key)
+    if html is None:
+        html = render_to_string('home_sections.html', build_home_sections())
+        cache.set(key, html, getattr(settings, 'HOME_SECTIONS_TIMEOUT', 10 * 60))
+    return html
@@ -0,0 +1,53 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import categories, search, sections, tasks
+from .models import Category, Product, ProductImage
+
+
+# Keep the full-text search index in step with the catalogue
+
+@receiver(post_save, sender=Product)
+def index_saved_product(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.index_product(instance.pk)
+
+
+@receiver(post_delete, sender=Product)
+def unindex_deleted_product(sender, instance, **kwargs):
+    search.remove_product(instance.pk)
+
+
+@receiver(post_save, sender=Category)
+def reindex_category_products(sender, instance, created=False, raw=False, **kwargs):
+    # A renamed category changes the searchable text of all its products
+    if not raw and not created:
+        search.index_category(instance.pk)
+
+
+# Make every process reload its slug -> id map whenever categories change
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_category_cache(sender, **kwargs):
+    categories.invalidate()
+
+
+# Queue thumbnail/card/zoom renditions for new or replaced product images
+
+@receiver(post_save, sender=ProductImage)
+def queue_image_renditions(sender, instance, raw=False, **kwargs):
+    if not raw and instance.image and instance.renditions.get('source') != instance.image.name:
+        tasks.build_image_renditions.delay(instance.pk)
+
+
+# Re-render the cached homepage sections after any catalogue change
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_home_sections(sender, **kwargs):
+    sections.invalidate()
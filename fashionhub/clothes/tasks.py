@@ -0,0 +1,13 @@
+from taskqueue.queue import task
+
+from . import images, sections
+from .models import ProductImage
+
+
+@task()
+def build_image_renditions(image_id):
+    """Resize a newly uploaded or replaced product image (see clothes.images)."""
+    image = ProductImage.objects.filter(pk=image_id).first()
+    if image is not None and images.refresh_renditions(image):
+        # Cached homepage cards should pick up the new renditions
+        sections.invalidate()
@@ -0,0 +1,59 @@
+from django import template
+
+from clothes.images import RENDITION_WIDTHS
+
+register = template.Library()
+
+
+@register.filter
+def primary_image(product):
+    """Return the product's first image, or None.
+
+    Uses ``primary_images`` from clothes.models.primary_image_prefetch when the
+    view loaded it, otherwise the prefetched ``images`` cache, and only falls
+    back to a query when neither is available.
+    """
+    if product is None:
+        return None
+    images = getattr(product, 'primary_images', None)
+    if images is None:
+        images = product.images.all()
+        if 'images' not in getattr(product, '_prefetched_objects_cache', {}):
+            images = images.order_by('id')[:1]
+    for image in images:
+        return image
+    return None
+
+
+def _rendition_url(image, name, fmt):
+    path = (image.renditions.get(name) or {}).get(fmt)
+    return image.image.storage.url(path) if path else None
+
+
+@register.filter
+def rendition(image, spec):
+    """URL of a resized copy of a ProductImage, e.g. ``img|rendition:'card'``.
+
+    ``spec`` is a rendition name from clothes.images.RENDITION_WIDTHS,
+    optionally followed by a format (``'card.webp'``; JPEG by default). Falls
+    back to the original upload when the rendition has not been built.
+    """
+    if not image or not image.image:
+        return ''
+    name, _, fmt = spec.partition('.')
+    return _rendition_url(image, name, fmt or 'jpeg') or image.image.url
+
+
+@register.simple_tag
+def srcset(image, fmt='jpeg'):
+    """``srcset`` attribute value listing every rendition of ``image`` in ``fmt``."""
+    if not image or not getattr(image, 'renditions', None):
+        return ''
+    candidates = {}
+    for name in RENDITION_WIDTHS:
+        entry = image.renditions.get(name) or {}
+        url = _rendition_url(image, name, fmt)
+        # Small originals give several renditions of the same width; list each once
+        if url and entry.get('width') not in candidates:
+            candidates[entry['width']] = url
+    return ', '.join(f'{url} {width}w' for width, url in sorted(candidates.items()))
@@ -1,3 +1,163 @@
+import re
+from unittest import skipUnless
+
+from django.core.cache import cache
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from order.models import Cart, CartLine, Order, OrderItem
+from user.models import Address, User
+from . import categories
+from .categories import get_category
+from .models import Category, Product, ProductImage, ProductVariant, Size
+
+
+class ListingQueryCountTests(TestCase):
+    """The homepage and the product list make the same number of queries for a few cards as for a full page."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.categories = [
+            Category.objects.create(name='Men', slug='men'),
+            Category.objects.create(name='Accessories', slug='accessories'),
+        ]
+        cls.size = Size.objects.create(name='M')
+
+    def setUp(self):
+        cache.clear()
+
+    def _add_products(self, count):
+        start = Product.objects.count()
+        for i in range(start, start + count):
+            product = Product.objects.create(category=self.categories[i % 2], name=f'Product {i}',
+                                             slug=f'product-{i}', price='799.00')
+            ProductVariant.objects.create(product=product, size=self.size, stock=5)
+            ProductImage.objects.create(product=product, image=f'products/product-{i}.jpg')
+
+    def _warm(self, url):
+        # Loads the per-process category map, then empties the cache so the
+        # homepage sections are built on the measured request too
+        self.client.get(url)
+        cache.clear()
+
+    def _count(self, url):
+        self._warm(url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response
+
+    def test_home_queries_do_not_grow_with_cards(self):
+        # Eight products put at least one card in every homepage section
+        self._add_products(8)
+        baseline, _ = self._count(reverse('home'))
+        self._add_products(4)
+        self._warm(reverse('home'))
+        with self.assertNumQueries(baseline):
+            response = self.client.get(reverse('home'))
+        self.assertContains(response, 'Product 11')
+
+    def test_product_list_queries_do_not_grow_with_cards(self):
+        self._add_products(3)
+        baseline, response = self._count(reverse('product_list'))
+        self.assertEqual(len(response.context['page_obj']), 3)
+        self._add_products(9)
+        self._warm(reverse('product_list'))
+        with self.assertNumQueries(baseline):
+            response = self.client.get(reverse('product_list'))
+        self.assertEqual(len(response.context['page_obj']), 12)
+
+
+class CategoryLookupTests(TestCase):
+    """Each process's slug map follows category changes made by any process."""
+
+    def setUp(self):
+        cache.clear()
+        self.men = Category.objects.create(name='Men', slug='men')
+
+    def test_saving_a_category_reloads_the_map(self):
+        self.assertEqual(get_category('men'), (self.men.id, 'Men'))
+        self.men.slug = 'menswear'
+        self.men.save()
+        self.assertIsNone(get_category('men'))
+        self.assertEqual(get_category('menswear'), (self.men.id, 'Men'))
+
+    def test_a_change_made_by_another_process_reloads_the_map(self):
+        self.assertIsNone(get_category('sale'))
+        # Another process writes the row and bumps the shared version; this
+        # process's map is not touched
+        sale = Category.objects.bulk_create([Category(name='Sale', slug='sale')])[0]
+        categories.invalidate()
+        with self.assertNumQueries(1):
+            self.assertEqual(get_category('sale'), (sale.id, 'Sale'))
+        with self.assertNumQueries(0):
+            self.assertEqual(get_category('men'), (self.men.id, 'Men'))
+
+
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN checks are written for SQLite')
+class QueryPlanTests(TestCase):
+    """Catalogue, order and account pages reach the tables that grow with the shop through indexes."""
+
+    # A query may scan the small lookup tables (categories, sizes) but must
+    # reach these through an index
+    HOT_TABLES = {
+        'clothes_product', 'clothes_productimage', 'clothes_productvariant',
+        'order_order', 'order_orderitem', 'order_cartline', 'user_address',
+    }
+    SCAN = re.compile(r'^SCAN (?P<table>\w+)(?P<rest>.*)$')
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Men', slug='men')
+        cls.product = Product.objects.create(category=cls.category, name='Linen Shirt', slug='linen-shirt',
+                                             price='1299.00')
+        ProductVariant.objects.create(product=cls.product, size=Size.objects.create(name='M'), stock=5)
+        ProductImage.objects.create(product=cls.product, image='products/linen-shirt.jpg')
+        cls.user = User.objects.create_user(username='plans')
+        Address.objects.create(user=cls.user, address1='1 Plan Street', city='Jalandhar', is_primary=True)
+        cls.order = Order.objects.create(user=cls.user, total_amount=cls.product.price)
+        OrderItem.objects.create(order=cls.order, product=cls.product, product_name=cls.product.name,
+                                 size='M', quantity=1, unit_price=cls.product.price, line_total=cls.product.price)
+        cart = Cart.objects.create(user=cls.user, item_count=1)
+        CartLine.objects.create(cart=cart, product=cls.product, size='M', quantity=1)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def _full_scans(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            plan = [row[-1] for row in cursor.fetchall()]
+        # "SCAN t USING [COVERING] INDEX i" walks an index in order, which is
+        # what a LIMITed newest-first listing should do
+        return [detail for detail in plan
+                if (match := self.SCAN.match(detail))
+                and match['table'] in self.HOT_TABLES and 'INDEX' not in match['rest']]
 
-# Create your tests here.
+    def test_pages_do_not_scan_hot_tables(self):
+        pages = {
+            'product_list': reverse('product_list'),
+            'category': reverse('category', args=[self.category.slug]),
+            'product_detail': reverse('product_detail', args=[self.product.slug]),
+            'search': reverse('search') + '?q=Linen',
+            'cart': reverse('cart'),
+            'checkout': reverse('checkout'),
+            'orders': reverse('orders'),
+            'order_detail': reverse('order_detail', args=[self.order.id]),
+            'profile': reverse('profile'),
+        }
+        checked = 0
+        for name, url in pages.items():
+            with self.subTest(page=name):
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                hot = [query['sql'] for query in queries.captured_queries
+                       if query['sql'].startswith('SELECT') and any(f'"{t}"' in query['sql'] for t in self.HOT_TABLES)]
+                checked += len(hot)
+                scans = [f'{detail}: {sql[:200]}' for sql in hot for detail in self._full_scans(sql)]
+                self.assertEqual(scans, [])
+        self.assertGreater(checked, len(pages))
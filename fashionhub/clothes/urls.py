@@ -1,11 +1,21 @@
 from . import views
+from django.conf import settings
 from django.urls import path
+from django.views.generic import RedirectView
+
+# ASGI deployments get the async variants (see fashionhub/asgi.py)
+if settings.ASYNC_VIEWS:
+    product_list, product_detail, search = views.product_list_async, views.product_detail_async, views.search_async
+else:
+    product_list, product_detail, search = views.product_list, views.product_detail, views.search
 
 urlpatterns = [
-    path('search/', views.search, name='search'),
-    path('men', views.men, name='men'),
-    path('women', views.women, name='women'),
-    path('accessories', views.accessories, name='accessories'),
-    path('product/<slug:slug>/', views.product_detail, name='product_detail'),
-    path('', views.product_list, name='product_list'), 
+    path('search/', search, name='search'),
+    path('category/<slug:slug>/', views.category, name='category'),
+    # Old per-category pages redirect to the shared category listing
+    path('men', RedirectView.as_view(pattern_name='category', permanent=True, query_string=True), {'slug': 'men'}, name='men'),
+    path('women', RedirectView.as_view(pattern_name='category', permanent=True, query_string=True), {'slug': 'women'}, name='women'),
+    path('accessories', RedirectView.as_view(pattern_name='category', permanent=True, query_string=True), {'slug': 'accessories'}, name='accessories'),
+    path('product/<slug:slug>/', product_detail, name='product_detail'),
+    path('', product_list, name='product_list'), 
 ]
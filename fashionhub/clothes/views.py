@@ -1,69 +1,131 @@
 # Product detail view
 from django.shortcuts import get_object_or_404
 
+def _product_detail_qs():
+    # Sizes and their stock come from ProductVariant in a single prefetch query
+    variants = Prefetch('variants', queryset=ProductVariant.objects.select_related('size').order_by('size__name'))
+    return Product.objects.select_related('category').prefetch_related('images', variants)
+
+
 def product_detail(request, slug):
-    product = get_object_or_404(Product.objects.select_related('category').prefetch_related('images'), slug=slug, is_available=True)
+    product = get_object_or_404(_product_detail_qs(), slug=slug, is_available=True)
     return render(request, 'product_detail.html', {'product': product})
 
 from django.shortcuts import render
 from django.shortcuts import render
+from django.conf import settings
 from django.core.paginator import Paginator
-from django.db.models import Q
-from .models import Product
+from django.http import Http404
+from django.db.models import Prefetch
+from .models import Product, ProductVariant, primary_image_prefetch, with_stock_status
+from .categories import get_category
+from .facets import afacet_listing, facet_listing
+from .pagination import AsyncPaginator, CursorPaginator
+from .search import search_products
+from fashionhub.shortcuts import arender
+
+
+def _uses_cursor(request):
+    url_name = request.resolver_match.url_name if request.resolver_match else None
+    return url_name in getattr(settings, 'CURSOR_PAGINATION_VIEWS', ())
+
+
+def _listing(request, qs, template, extra_context=None):
+    """Render a paginated product grid with facet filters from the query string.
+
+    Views listed in settings.CURSOR_PAGINATION_VIEWS page with opaque cursors
+    on (created_at, id) instead of page numbers.
+    """
+    qs, facets = facet_listing(qs, request.GET)
+    if _uses_cursor(request):
+        page_obj = CursorPaginator(qs, 12).get_page(request.GET.get('cursor'))
+    else:
+        paginator = Paginator(qs, 12)
+        page_number = request.GET.get('page')
+        page_obj = paginator.get_page(page_number)
+    context = {'page_obj': page_obj, 'facets': facets}
+    context.update(extra_context or {})
+    return render(request, template, context)
+
+
+def _available_products():
+    return with_stock_status(Product.objects.filter(is_available=True)).select_related('category').prefetch_related(primary_image_prefetch()).order_by('-created_at')
 
 
 def product_list(request):
-    qs = Product.objects.filter(is_available=True).select_related('category').prefetch_related('images').order_by('-created_at')
-    paginator = Paginator(qs, 12)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    return render(request, 'store/product_list.html', {'page_obj': page_obj})
+    return _listing(request, _available_products(), 'product_list.html')
 
 
 def search(request):
     """Search products by name, description, or category"""
     query = request.GET.get('q', '').strip()
-    
-    if query:
-        # Search in product name, description, and category name
-        qs = Product.objects.filter(
-            Q(name__icontains=query) | 
-            Q(description__icontains=query) | 
-            Q(category__name__icontains=query),
-            is_available=True
-        ).select_related('category').prefetch_related('images').order_by('-created_at').distinct()
-    else:
-        qs = Product.objects.none()
-    
-    paginator = Paginator(qs, 12)
+
+    # Ranked full-text lookup against the search index (see clothes.search)
+    results = search_products(query) if query else Product.objects.none()
+
+    paginator = Paginator(results, 12)
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
-    
+
     return render(request, 'search_results.html', {
         'page_obj': page_obj,
         'query': query,
-        'total_results': qs.count()
+        'total_results': paginator.count
     })
 
 
-def men(request):
-    qs = Product.objects.filter(is_available=True, category__name__iexact='Men').select_related('category').prefetch_related('images').order_by('-created_at')
-    paginator = Paginator(qs, 12)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    return render(request, 'men.html', {'page_obj': page_obj})
+def category(request, slug):
+    """Product grid for one category, resolved by its indexed slug."""
+    entry = get_category(slug)
+    if entry is None:
+        raise Http404('No such category')
+    category_id, category_name = entry
+    qs = with_stock_status(Product.objects.filter(is_available=True, category_id=category_id)).select_related('category').prefetch_related(primary_image_prefetch()).order_by('-created_at')
+    return _listing(request, qs, 'category.html', {'category_name': category_name, 'category_slug': slug})
 
-def women(request):
-    qs = Product.objects.filter(is_available=True, category__name__iexact='Men').select_related('category').prefetch_related('images').order_by('-created_at')
-    paginator = Paginator(qs, 12)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    return render(request, 'women.html', {'page_obj': page_obj})
 
-def accessories(request):
-    qs = Product.objects.filter(is_available=True, category__name__iexact='Men').select_related('category').prefetch_related('images').order_by('-created_at')
-    paginator = Paginator(qs, 12)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    return render(request, 'accessories.html', {'page_obj': page_obj})
+# ---------------------------
+# Async variants
+# ---------------------------
+#
+# Served instead of the views above when settings.ASYNC_VIEWS is on (the
+# ASGI entry point turns it on), so an ASGI server runs them on its event
+# loop rather than handing each request to a thread. Same queries and
+# templates as their synchronous counterparts.
+
+async def _alisting(request, qs, template, extra_context=None):
+    qs, facets = await afacet_listing(qs, request.GET)
+    if _uses_cursor(request):
+        page_obj = await CursorPaginator(qs, 12).aget_page(request.GET.get('cursor'))
+    else:
+        page_obj = await AsyncPaginator(qs, 12).aget_page(request.GET.get('page'))
+    context = {'page_obj': page_obj, 'facets': facets}
+    context.update(extra_context or {})
+    return await arender(request, template, context)
+
+
+async def product_list_async(request):
+    return await _alisting(request, _available_products(), 'product_list.html')
+
 
+async def product_detail_async(request, slug):
+    try:
+        product = await _product_detail_qs().aget(slug=slug, is_available=True)
+    except Product.DoesNotExist:
+        raise Http404('No Product matches the given query.')
+    return await arender(request, 'product_detail.html', {'product': product})
+
+
+async def search_async(request):
+    """Search products by name, description, or category"""
+    query = request.GET.get('q', '').strip()
+    results = search_products(query) if query else Product.objects.none()
+
+    paginator = AsyncPaginator(results, 12)
+    page_obj = await paginator.aget_page(request.GET.get('page'))
+
+    return await arender(request, 'search_results.html', {
+        'page_obj': page_obj,
+        'query': query,
+        'total_results': paginator.count
+    })
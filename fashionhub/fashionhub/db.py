@@ -0,0 +1,40 @@
+from contextlib import contextmanager
+
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+
+# ---------------------------
+# Write transactions
+# ---------------------------
+#
+# SQLite starts transactions DEFERRED: the write lock is only requested at the
+# first INSERT/UPDATE. A transaction that reads first and then writes, while
+# another connection holds the lock, cannot wait for it (its snapshot would
+# be stale) and fails straight away with "database is locked", whatever
+# busy_timeout says. BEGIN IMMEDIATE takes the write lock up front, so
+# concurrent writers queue on busy_timeout instead. The connection pragmas
+# themselves are set in settings (SQLITE_PRAGMAS).
+
+@contextmanager
+def write_transaction(using=None):
+    """``transaction.atomic()`` that starts with BEGIN IMMEDIATE on SQLite.
+
+    Use it for transactions that will write. Nested inside an existing
+    transaction it is a plain savepoint; other backends get atomic() as is.
+    """
+    connection = connections[using or DEFAULT_DB_ALIAS]
+    if connection.vendor != 'sqlite' or connection.in_atomic_block:
+        with transaction.atomic(using=using):
+            yield
+        return
+
+    # Connecting resets transaction_mode from settings, so connect first
+    connection.ensure_connection()
+    previous = connection.transaction_mode
+    connection.transaction_mode = 'IMMEDIATE'
+    try:
+        with transaction.atomic(using=using):
+            connection.transaction_mode = previous
+            yield
+    finally:
+        connection.transaction_mode = previous
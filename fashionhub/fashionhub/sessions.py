@@ -0,0 +1,53 @@
+from django.contrib.sessions.backends.cached_db import SessionStore as CachedDBSessionStore
+
+
+# ---------------------------
+# Session engine
+# ---------------------------
+#
+# cached_db keeps every session in the cache and writes through to the
+# database, so most requests read their session without a query. On top of
+# that, a save is skipped when the session holds exactly what was loaded:
+# views that re-assign an unchanged value (or set session.modified by hand)
+# no longer cost a write. Rotating the key at login is deferred to the
+# end-of-request save too, so a request makes at most one session write
+# (plus deleting the old row once the new one is stored). If that save never
+# happens (SessionMiddleware skips it on a 5xx), the old session survives.
+
+class SessionStore(CachedDBSessionStore):
+    _loaded_payload = None
+    _replaced_key = None
+
+    def _payload(self, data):
+        return self.serializer().dumps(data)
+
+    def load(self):
+        data = super().load()
+        self._loaded_payload = self._payload(data)
+        return data
+
+    async def aload(self):
+        data = await super().aload()
+        self._loaded_payload = self._payload(data)
+        return data
+
+    def save(self, must_create=False):
+        if (not must_create and self.session_key is not None and self._loaded_payload is not None
+                and self._payload(self._get_session()) == self._loaded_payload):
+            return
+        super().save(must_create=must_create)
+        self._loaded_payload = self._payload(self._get_session())
+        if self._replaced_key:
+            old_key, self._replaced_key = self._replaced_key, None
+            self.delete(old_key)
+
+    def cycle_key(self):
+        # Django writes the new key straight away and SessionMiddleware then
+        # saves it a second time with the login data; let that final save
+        # create the new row, and only then drop the old one.
+        data = self._get_session()
+        self._replaced_key = self.session_key or self._replaced_key
+        self._session_key = None
+        self._session_cache = data
+        self._loaded_payload = None
+        self.modified = True
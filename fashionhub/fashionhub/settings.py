@@ -17,16 +17,41 @@ import os
 BASE_DIR = Path(__file__).resolve().parent.parent
 
 
-# Quick-start development settings - unsuitable for production
-# See https://docs.djangoproject.com/en/5.2/howto/deployment/checklist/
+# ---------------------------
+# Profiles
+# ---------------------------
+#
+# DJANGO_ENV picks the profile: "development" (the default, what runserver
+# uses) or "production". Production turns DEBUG off, caches compiled
+# templates, keeps database connections open between requests, expects SQLite
+# in WAL mode (see enable_sqlite_wal), drops the browser-reload tooling and
+# takes every secret from the environment. See the README for the variables
+# it reads.
+
+from django.core.exceptions import ImproperlyConfigured
+
+DJANGO_ENV = os.environ.get('DJANGO_ENV', 'development').strip().lower()
+if DJANGO_ENV not in ('development', 'production'):
+    raise ImproperlyConfigured(f'DJANGO_ENV must be "development" or "production", not "{DJANGO_ENV}".')
+PRODUCTION = DJANGO_ENV == 'production'
+
+
+def env_list(name, default=''):
+    """Comma-separated environment variable as a list, without blanks."""
+    return [item.strip() for item in os.environ.get(name, default).split(',') if item.strip()]
+
 
 # SECURITY WARNING: keep the secret key used in production secret!
-SECRET_KEY = 'django-insecure-uo&mk73u#kuj(4+=-+xwu6mwtcm=05-6@a=uhy+9w40!i0q--r'
+SECRET_KEY = os.environ.get('DJANGO_SECRET_KEY', '')
+if not SECRET_KEY:
+    if PRODUCTION:
+        raise ImproperlyConfigured('Set DJANGO_SECRET_KEY when running with DJANGO_ENV=production.')
+    SECRET_KEY = 'django-insecure-uo&mk73u#kuj(4+=-+xwu6mwtcm=05-6@a=uhy+9w40!i0q--r'
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = os.environ.get('DJANGO_DEBUG', '0' if PRODUCTION else '1') == '1'
 
-ALLOWED_HOSTS = []
+ALLOWED_HOSTS = env_list('DJANGO_ALLOWED_HOSTS')
 
 
 # Application definition
@@ -41,7 +66,7 @@ INSTALLED_APPS = [
     'order',
     'user',
     'clothes',
-    'django_browser_reload',
+    'taskqueue',
 ]
 
 MIDDLEWARE = [
@@ -52,16 +77,20 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'django_browser_reload.middleware.BrowserReloadMiddleware',
 ]
 
+# Reloads the browser on template/static changes; development only
+if not PRODUCTION:
+    INSTALLED_APPS.append('django_browser_reload')
+    MIDDLEWARE.append('django_browser_reload.middleware.BrowserReloadMiddleware')
+
 ROOT_URLCONF = 'fashionhub.urls'
 
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [BASE_DIR / 'fashionhub' / 'templates'],
-        'APP_DIRS': True,
+        'APP_DIRS': not PRODUCTION,
         'OPTIONS': {
             'context_processors': [
                 'django.template.context_processors.request',
@@ -74,8 +103,22 @@ TEMPLATES = [
     },
 ]
 
+if PRODUCTION:
+    # Templates are compiled once per process instead of on every render
+    TEMPLATES[0]['OPTIONS']['loaders'] = [
+        ('django.template.loaders.cached.Loader', [
+            'django.template.loaders.filesystem.Loader',
+            'django.template.loaders.app_directories.Loader',
+        ]),
+    ]
+
 WSGI_APPLICATION = 'fashionhub.wsgi.application'
 
+# Serve the async variants of the catalogue and cart views. fashionhub.asgi
+# turns this on, so ASGI servers (e.g. uvicorn fashionhub.asgi:application)
+# run them on the event loop while WSGI servers keep the synchronous views.
+ASYNC_VIEWS = os.environ.get('DJANGO_ASYNC_VIEWS', '0') == '1'
+
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
@@ -83,10 +126,39 @@ WSGI_APPLICATION = 'fashionhub.wsgi.application'
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'NAME': os.environ.get('DJANGO_SQLITE_PATH', BASE_DIR / 'db.sqlite3'),
+        # Seconds a connection is reused across requests (0 = one per request);
+        # health checks replace a connection that went away between requests
+        'CONN_MAX_AGE': int(os.environ.get('DJANGO_CONN_MAX_AGE', 600 if PRODUCTION else 0)),
+        'CONN_HEALTH_CHECKS': PRODUCTION,
+        'OPTIONS': {},
+        # Tests run against a file rather than Django's shared in-memory
+        # database, whose table locks ignore busy_timeout: the checkout
+        # contention tests need the same locking as the real database
+        'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
     }
 }
 
+# Applied to every new SQLite connection in both profiles. busy_timeout (ms)
+# makes a writer wait for the lock instead of failing with "database is
+# locked"; write paths that read before writing also need
+# fashionhub.db.write_transaction. mmap_size (bytes) and cache_size (negative =
+# KiB per connection) keep hot pages in memory. Production databases run in WAL
+# mode, which lets readers carry on while a write is in progress and keeps
+# synchronous=NORMAL safe against application crashes. WAL is stored in the
+# database file itself, so it is not a per-connection pragma: the
+# enable_sqlite_wal deploy command switches a production database over once,
+# and the bundled development database keeps its rollback journal.
+SQLITE_PRAGMAS = {
+    'synchronous': 'NORMAL' if PRODUCTION else 'FULL',
+    'busy_timeout': int(os.environ.get('DJANGO_SQLITE_BUSY_TIMEOUT', 5000)),
+    'mmap_size': 128 * 1024 * 1024,
+    'cache_size': -16 * 1024,
+}
+DATABASES['default']['OPTIONS']['init_command'] = ';'.join(
+    f'PRAGMA {name}={value}' for name, value in SQLITE_PRAGMAS.items()
+)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -128,6 +200,8 @@ STATIC_URL = '/static/'
 STATICFILES_DIRS = [
     BASE_DIR / 'fashionhub' / 'static',
 ]
+# Where collectstatic gathers files for the web server in production
+STATIC_ROOT = os.environ.get('DJANGO_STATIC_ROOT', BASE_DIR / 'staticfiles')
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
@@ -135,12 +209,86 @@ STATICFILES_DIRS = [
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 MEDIA_URL = '/media/'
-MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+MEDIA_ROOT = os.environ.get('DJANGO_MEDIA_ROOT', os.path.join(BASE_DIR, 'media'))
 
 # settings.py
 LOGIN_URL = 'login'
 LOGIN_REDIRECT_URL = 'home'   # optional, where to go after login
 
 # Stripe Configuration
-STRIPE_API_KEY = 'sk_test_51RAsFTGOlmzlPsd5l4AC2rCsCGifellA2tuqBFOfMCCJgOSu4aN8lAGijRsad8Z5VcxVjARSAKydqGs1l2TTSfOJ00GjsOlo3q'
-STRIPE_PUBLISHABLE_KEY = 'pk_test_51RAsFTGOlmzlPsd5CTHWgoHCQu5BqhzO21zOKGY5GYOFHeeLQZbcVeXCVdDTPeSHqHPcaZEYw3c3VgkQJZ9DzBCi00xPSCi0Sf'
+# Keys only come from the environment. Without STRIPE_API_KEY card payments are
+# off (shoppers are offered Cash on Delivery) unless PAYMENT_GATEWAY is 'fake'.
+STRIPE_API_KEY = os.environ.get('STRIPE_API_KEY', '')
+STRIPE_PUBLISHABLE_KEY = os.environ.get('STRIPE_PUBLISHABLE_KEY', '')
+# Signing secret of the webhook endpoint (payment/webhook/) that marks card orders paid
+STRIPE_WEBHOOK_SECRET = os.environ.get('STRIPE_WEBHOOK_SECRET', '' if PRODUCTION else 'whsec_fashionhub_local_development')
+
+# Card payments go through order.payments: 'stripe', or 'fake' to approve every
+# checkout locally (offline development and load tests). Stripe calls time out
+# after the connect/read timeouts below (seconds); after PAYMENT_BREAKER_FAILURES
+# failed or slower-than-PAYMENT_SLOW_CALL calls in a row, card payments are
+# paused for PAYMENT_BREAKER_RESET seconds and shoppers are offered Cash on Delivery.
+PAYMENT_GATEWAY = os.environ.get('PAYMENT_GATEWAY', 'stripe')
+PAYMENT_CONNECT_TIMEOUT = 3.05
+PAYMENT_READ_TIMEOUT = 10
+PAYMENT_MAX_RETRIES = 1
+PAYMENT_SLOW_CALL = 5
+PAYMENT_BREAKER_FAILURES = 3
+PAYMENT_BREAKER_RESET = 30
+# Simulated latency (seconds) and failure ratio of the fake gateway
+PAYMENT_FAKE_LATENCY = float(os.environ.get('PAYMENT_FAKE_LATENCY', 0))
+PAYMENT_FAKE_FAILURE_RATE = float(os.environ.get('PAYMENT_FAKE_FAILURE_RATE', 0))
+
+# Seconds a checkout holds its stock before the sweeper gives it back
+STOCK_RESERVATION_TTL = 15 * 60
+# Seconds a Stripe checkout session stays payable. Stripe only accepts an
+# expiry between 30 minutes and 24 hours from when the session is created, so
+# keep a margin above 30 minutes for clock skew and request latency.
+PAYMENT_SESSION_TTL = 35 * 60
+# Seconds a pending order waits for its payment before it expires (and its
+# stock is given back). Longer than PAYMENT_SESSION_TTL, so the order is still
+# pending whenever its checkout session can be paid.
+PENDING_ORDER_TTL = 45 * 60
+
+# Catalogue listings (by URL name) that page with keyset cursors instead of
+# page numbers; deep pages stay as fast as the first one
+CURSOR_PAGINATION_VIEWS = ['product_list']
+
+# Seconds the rendered homepage product sections stay cached; catalogue edits
+# invalidate them immediately regardless
+HOME_SECTIONS_TIMEOUT = 10 * 60
+
+# Background jobs (taskqueue app): run `python manage.py run_tasks` next to the
+# web server. Failed jobs are retried with exponential backoff starting at
+# TASKQUEUE_RETRY_DELAY seconds; set TASKQUEUE_EAGER = True to run jobs inline.
+TASKQUEUE_EAGER = False
+TASKQUEUE_RETRY_DELAY = 10
+
+# Order confirmation emails are printed to the console until SMTP is configured
+EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
+DEFAULT_FROM_EMAIL = 'FashionHub <orders@fashionhub.local>'
+
+# Largest profile picture upload accepted; bigger uploads are cut off while
+# streaming instead of being buffered
+PROFILE_PICTURE_MAX_BYTES = 5 * 1024 * 1024
+
+# Sessions live in the cache and are written through to the database; unchanged
+# sessions are not saved again (see fashionhub.sessions). The local-memory cache
+# used in development is per process, so production shares a file-based cache
+# between worker processes (DJANGO_CACHE_DIR).
+SESSION_ENGINE = 'fashionhub.sessions'
+
+if PRODUCTION:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ.get('DJANGO_CACHE_DIR', BASE_DIR / '.cache'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'fashionhub',
+        }
+    }
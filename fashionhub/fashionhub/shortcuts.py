@@ -0,0 +1,22 @@
+from django.shortcuts import render
+
+from order.cart import acart_item_count
+
+
+# ---------------------------
+# Rendering from async views
+# ---------------------------
+#
+# Templates render synchronously, and the context processors read the
+# signed-in user, the session and the cart badge lazily. Called from an async
+# view, any of those that still needs a query would raise
+# SynchronousOnlyOperation, so arender() loads them with async queries first.
+# The view itself must hand over fully loaded objects (select_related /
+# prefetch_related everything the template touches).
+
+async def arender(request, template_name, context=None, status=None):
+    """render() for async views."""
+    # Replaces the lazy request.user with the already loaded one
+    request.user = await request.auser()
+    await acart_item_count(request)
+    return render(request, template_name, context, status=status)
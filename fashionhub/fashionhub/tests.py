@@ -0,0 +1,66 @@
+from django.contrib.auth import SESSION_KEY
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from user.models import User
+from .sessions import SessionStore
+
+
+class SessionStoreTests(TestCase):
+    """Sessions are only written when their contents change; login rotates the key without leaving the old row."""
+
+    def setUp(self):
+        cache.clear()
+
+    def _session_writes(self, queries):
+        return [q['sql'] for q in queries.captured_queries
+                if '"django_session"' in q['sql'] and not q['sql'].startswith('SELECT')]
+
+    def _stored(self, **data):
+        session = SessionStore()
+        session.update(data)
+        session.save()
+        return session.session_key
+
+    def test_unchanged_session_is_not_saved_again(self):
+        key = self._stored(cart_id=7)
+        session = SessionStore(key)
+        session['cart_id'] = session['cart_id']
+        self.assertTrue(session.modified)
+        with CaptureQueriesContext(connection) as queries:
+            session.save()
+        self.assertEqual(self._session_writes(queries), [])
+
+    def test_changed_session_is_saved(self):
+        key = self._stored(cart_id=7)
+        session = SessionStore(key)
+        session['cart_id'] = 8
+        with CaptureQueriesContext(connection) as queries:
+            session.save()
+        self.assertEqual(len(self._session_writes(queries)), 1)
+        self.assertEqual(Session.objects.get(pk=key).get_decoded(), {'cart_id': 8})
+        # Stored again as saved: a second save has nothing to write
+        with CaptureQueriesContext(connection) as queries:
+            session.save()
+        self.assertEqual(self._session_writes(queries), [])
+
+    def test_login_replaces_the_old_session_row(self):
+        User.objects.create_user(username='rotate', password='rotate-pass-123')
+        session = self.client.session
+        session['recently_viewed'] = [3, 5]
+        session.save()
+        old_key = session.session_key
+
+        response = self.client.post(reverse('login'), {'username': 'rotate', 'password': 'rotate-pass-123'})
+        self.assertRedirects(response, reverse('profile'), fetch_redirect_response=False)
+        new_key = self.client.cookies['sessionid'].value
+        self.assertNotEqual(new_key, old_key)
+        self.assertFalse(Session.objects.filter(pk=old_key).exists())
+        self.assertFalse(SessionStore().exists(old_key))
+        data = Session.objects.get(pk=new_key).get_decoded()
+        self.assertEqual(data['recently_viewed'], [3, 5])
+        self.assertIn(SESSION_KEY, data)
@@ -30,9 +30,11 @@ urlpatterns = [
     path('clothes/', include('clothes.urls')),
     path('user/', include('user.urls')),
     path('order/', include('order.urls')),
-    path("__reload__/", include("django_browser_reload.urls")),
     ]
 
+if 'django_browser_reload' in settings.INSTALLED_APPS:
+    urlpatterns.append(path("__reload__/", include("django_browser_reload.urls")))
+
 
 if settings.DEBUG:
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
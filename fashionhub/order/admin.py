@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.contrib.auth.models import  Group
-from .models import Order, OrderItem
+from .models import Cart, CartLine, CustomerStats, Order, OrderItem, ProcessedEvent, StockReservation
 
 admin.site.unregister(Group)
 
@@ -13,8 +13,59 @@ class OrderItemInline(admin.TabularInline):
 
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
-	list_display = ("id", "user", "total_amount", "is_paid", "created_at")
-	list_filter = ("is_paid", "created_at")
-	search_fields = ("id", "user__username")
+	list_display = ("id", "user", "total_amount", "status", "is_paid", "created_at", "customer_orders", "customer_spend")
+	list_filter = ("status", "is_paid", "created_at")
+	search_fields = ("id", "user__username", "payment_session_id")
 	ordering = ("-created_at",)
 	inlines = [OrderItemInline]
+	# The customer columns read CustomerStats, joined in the list query
+	list_select_related = ("user", "user__customer_stats")
+
+	def _stats(self, obj):
+		return getattr(obj.user, "customer_stats", None)
+
+	@admin.display(description="Customer orders")
+	def customer_orders(self, obj):
+		stats = self._stats(obj)
+		return stats.order_count if stats else 0
+
+	@admin.display(description="Customer lifetime spend")
+	def customer_spend(self, obj):
+		stats = self._stats(obj)
+		return stats.lifetime_spend if stats else 0
+
+
+@admin.register(CustomerStats)
+class CustomerStatsAdmin(admin.ModelAdmin):
+	list_display = ("user", "order_count", "lifetime_spend", "last_order_at")
+	list_select_related = ("user",)
+	search_fields = ("user__username",)
+	ordering = ("-lifetime_spend",)
+
+
+@admin.register(ProcessedEvent)
+class ProcessedEventAdmin(admin.ModelAdmin):
+	list_display = ("event_id", "type", "processed_at")
+	list_filter = ("type",)
+	search_fields = ("event_id",)
+
+
+@admin.register(StockReservation)
+class StockReservationAdmin(admin.ModelAdmin):
+	list_display = ("product", "user", "order", "quantity", "created_at", "expires_at")
+	list_filter = ("expires_at",)
+	search_fields = ("product__name", "user__username")
+
+
+class CartLineInline(admin.TabularInline):
+	model = CartLine
+	extra = 0
+	fields = ("product", "size", "quantity")
+
+
+@admin.register(Cart)
+class CartAdmin(admin.ModelAdmin):
+	list_display = ("id", "user", "item_count", "updated_at")
+	search_fields = ("user__username",)
+	readonly_fields = ("item_count",)
+	inlines = [CartLineInline]
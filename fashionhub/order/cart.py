@@ -0,0 +1,307 @@
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from clothes.models import primary_image_prefetch
+from .models import Cart, CartLine
+
+
+# ---------------------------
+# Server-side cart store
+# ---------------------------
+#
+# Carts live in the Cart / CartLine tables. The session only remembers the
+# cart's id, so adding to the cart never re-serialises the cart itself.
+# Cart.item_count is the authoritative, denormalised sum of line quantities.
+# The navbar badge reads a copy of it cached under the cart's id, so every
+# device and session showing the same cart sees the same count; each change
+# to the cart drops that copy once its transaction commits.
+
+CART_SESSION_KEY = 'cart_id'
+# Cached badge counts expire eventually, in case a cart is changed without
+# going through this module (e.g. in the admin)
+COUNT_CACHE_TIMEOUT = 10 * 60
+# Carts stored by older versions of the site, as {"<pid>:<size>": qty}
+LEGACY_SESSION_KEY = 'cart'
+
+
+def parse_cart_key(key):
+    """Split a "<product_id>:<size>" cart key into (product_id, size).
+
+    Returns (None, '') for keys that do not start with a valid product id.
+    """
+    pid, _, size = str(key).partition(':')
+    try:
+        return int(pid), size
+    except ValueError:
+        return None, ''
+
+
+def _count_key(cart_id):
+    return f'cart:{cart_id}:count'
+
+
+def _forget_count(cart):
+    key = _count_key(cart.pk)
+    transaction.on_commit(lambda: cache.delete(key))
+
+
+def get_cart(request, create=False):
+    """Return the request's Cart, or None if it has none and ``create`` is False.
+
+    Signed-in users always get their own cart; guests get the cart whose id is
+    in their session.
+    """
+    user = request.user if request.user.is_authenticated else None
+    cart_id = request.session.get(CART_SESSION_KEY)
+    if user is not None:
+        cart = Cart.objects.filter(user=user).first()
+    else:
+        cart = Cart.objects.filter(pk=cart_id, user__isnull=True).first() if cart_id else None
+
+    if cart is None and (create or request.session.get(LEGACY_SESSION_KEY)):
+        try:
+            cart = Cart.objects.create(user=user)
+        except IntegrityError:
+            # A concurrent request created the user's cart first
+            cart = Cart.objects.get(user=user)
+    if cart is not None and cart.id != cart_id:
+        request.session[CART_SESSION_KEY] = cart.id
+
+    legacy = request.session.pop(LEGACY_SESSION_KEY, None) if cart is not None else None
+    if legacy:
+        for key, qty in legacy.items():
+            pid, size = parse_cart_key(key)
+            try:
+                qty = int(qty)
+            except (TypeError, ValueError):
+                continue
+            if pid is not None and qty > 0:
+                add_item(cart, pid, size, qty)
+    return cart
+
+
+def _refresh_count(cart):
+    """Recompute ``cart.item_count`` from its lines."""
+    total = (CartLine.objects
+             .filter(cart=OuterRef('pk'))
+             .values('cart')
+             .annotate(total=Sum('quantity'))
+             .values('total'))
+    Cart.objects.filter(pk=cart.pk).update(item_count=Coalesce(Subquery(total), 0))
+    cart.refresh_from_db(fields=['item_count', 'updated_at'])
+    _forget_count(cart)
+    return cart.item_count
+
+
+def line_quantity(cart, product_id, size=''):
+    if cart is None:
+        return 0
+    return (CartLine.objects
+            .filter(cart=cart, product_id=product_id, size=size or '')
+            .values_list('quantity', flat=True)
+            .first()) or 0
+
+
+def add_item(cart, product_id, size='', quantity=1):
+    """Add ``quantity`` of a product (in ``size``) to ``cart``."""
+    size = size or ''
+    with transaction.atomic():
+        updated = (CartLine.objects
+                   .filter(cart=cart, product_id=product_id, size=size)
+                   .update(quantity=F('quantity') + quantity))
+        if not updated:
+            try:
+                with transaction.atomic():
+                    CartLine.objects.create(cart=cart, product_id=product_id, size=size, quantity=quantity)
+            except IntegrityError:
+                # Another request added the same line first; add on top of it
+                (CartLine.objects
+                 .filter(cart=cart, product_id=product_id, size=size)
+                 .update(quantity=F('quantity') + quantity))
+        # Hot path: bump the counter instead of re-summing the lines
+        Cart.objects.filter(pk=cart.pk).update(item_count=F('item_count') + quantity, updated_at=timezone.now())
+        cart.refresh_from_db(fields=['item_count'])
+        _forget_count(cart)
+
+
+def set_quantity(cart, product_id, size, quantity):
+    """Set a line's quantity; zero or less removes the line. Returns False if there was no such line."""
+    size = size or ''
+    with transaction.atomic():
+        lines = CartLine.objects.filter(cart=cart, product_id=product_id, size=size)
+        if quantity > 0:
+            changed = lines.update(quantity=quantity)
+        else:
+            changed, _ = lines.delete()
+        if changed:
+            _refresh_count(cart)
+    return bool(changed)
+
+
+def remove_item(cart, product_id, size=''):
+    return set_quantity(cart, product_id, size, 0)
+
+
+def change_size(cart, product_id, old_size, new_size):
+    """Move a line to another size, merging it into an existing line for that size."""
+    old_size, new_size = old_size or '', new_size or ''
+    if old_size == new_size:
+        return False
+    with transaction.atomic():
+        line = CartLine.objects.filter(cart=cart, product_id=product_id, size=old_size).first()
+        if line is None:
+            return False
+        merged = (CartLine.objects
+                  .filter(cart=cart, product_id=product_id, size=new_size)
+                  .update(quantity=F('quantity') + line.quantity))
+        if merged:
+            line.delete()
+        else:
+            line.size = new_size
+            line.save(update_fields=['size'])
+    return True
+
+
+def clear_cart(cart):
+    if cart is None:
+        return
+    with transaction.atomic():
+        cart.lines.all().delete()
+        _refresh_count(cart)
+
+
+def merge_guest_cart(request, user):
+    """Fold the session's guest cart into ``user``'s cart after login.
+
+    Quantities of lines present in both carts are added together and the guest
+    cart is deleted.
+    """
+    cart_id = request.session.get(CART_SESSION_KEY)
+    guest = Cart.objects.filter(pk=cart_id, user__isnull=True).first() if cart_id else None
+    if guest is None:
+        own = Cart.objects.filter(user=user).first()
+        if own is not None:
+            request.session[CART_SESSION_KEY] = own.id
+        return
+    with transaction.atomic():
+        cart = Cart.objects.filter(user=user).first()
+        if cart is None:
+            # Nothing to merge into: the guest cart simply becomes the user's
+            guest.user = user
+            guest.save(update_fields=['user'])
+            cart = guest
+        else:
+            for line in guest.lines.all():
+                add_item(cart, line.product_id, line.size, line.quantity)
+            guest.delete()
+    request.session[CART_SESSION_KEY] = cart.id
+
+
+def _cached_count(cart_id):
+    key = _count_key(cart_id)
+    count = cache.get(key)
+    if count is None:
+        count = Cart.objects.filter(pk=cart_id).values_list('item_count', flat=True).first() or 0
+        cache.set(key, count, COUNT_CACHE_TIMEOUT)
+    return count
+
+
+async def _acached_count(cart_id):
+    key = _count_key(cart_id)
+    count = await cache.aget(key)
+    if count is None:
+        count = await Cart.objects.filter(pk=cart_id).values_list('item_count', flat=True).afirst() or 0
+        await cache.aset(key, count, COUNT_CACHE_TIMEOUT)
+    return count
+
+
+def cart_item_count(request):
+    """Number of items in the request's cart, normally read from the cache."""
+    if hasattr(request, '_cart_item_count'):
+        return request._cart_item_count
+    cart_id = request.session.get(CART_SESSION_KEY)
+    if cart_id is None and request.user.is_authenticated:
+        cart_id = Cart.objects.filter(user=request.user).values_list('id', flat=True).first()
+    if cart_id is not None:
+        count = _cached_count(cart_id)
+    elif not request.user.is_authenticated:
+        count = sum(request.session.get(LEGACY_SESSION_KEY, {}).values())
+    else:
+        count = 0
+    request._cart_item_count = count
+    return count
+
+
+async def acart_item_count(request):
+    """cart_item_count() for async views.
+
+    Also remembers the count on the request, where the synchronous context
+    processor finds it without a query, so an async view can render its
+    template safely.
+    """
+    if hasattr(request, '_cart_item_count'):
+        return request._cart_item_count
+    cart_id = await request.session.aget(CART_SESSION_KEY)
+    user = await request.auser()
+    if cart_id is None and user.is_authenticated:
+        cart_id = await Cart.objects.filter(user=user).values_list('id', flat=True).afirst()
+    if cart_id is not None:
+        count = await _acached_count(cart_id)
+    elif not user.is_authenticated:
+        count = sum((await request.session.aget(LEGACY_SESSION_KEY, {})).values())
+    else:
+        count = 0
+    request._cart_item_count = count
+    return count
+
+
+async def aget_cart(request):
+    """get_cart() for async views that only read the cart (never creates one).
+
+    Carts still held in the legacy session format are imported by the
+    synchronous get_cart(), which runs in a worker thread for that one request.
+    """
+    if await request.session.aget(LEGACY_SESSION_KEY):
+        return await sync_to_async(get_cart)(request)
+    user = await request.auser()
+    cart_id = await request.session.aget(CART_SESSION_KEY)
+    if user.is_authenticated:
+        cart = await Cart.objects.filter(user=user).afirst()
+    else:
+        cart = await Cart.objects.filter(pk=cart_id, user__isnull=True).afirst() if cart_id else None
+    if cart is not None and cart.id != cart_id:
+        await request.session.aset(CART_SESSION_KEY, cart.id)
+    return cart
+
+
+def _cart_lines(cart):
+    return (cart.lines
+            .filter(product__is_available=True)
+            .select_related('product__category')
+            .prefetch_related(primary_image_prefetch('product__images'), 'product__sizes')
+            .order_by('id'))
+
+
+def resolve_cart(cart):
+    """Return the cart's CartLine rows (with products loaded) and the cart total.
+
+    A fixed number of queries: the lines with their products and categories,
+    plus one prefetch each for primary images and sizes. Lines whose product
+    is no longer available are left out.
+    """
+    if cart is None:
+        return [], 0
+    lines = list(_cart_lines(cart))
+    return lines, sum((line.total_price for line in lines), 0)
+
+
+async def aresolve_cart(cart):
+    """resolve_cart() for async views, with the same queries."""
+    if cart is None:
+        return [], 0
+    lines = [line async for line in _cart_lines(cart)]
+    return lines, sum((line.total_price for line in lines), 0)
@@ -0,0 +1,109 @@
+import threading
+import time
+from importlib import import_module
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection
+
+from clothes.models import Category, Product
+from order.cart import add_item
+from order.models import Cart
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare add-to-cart throughput for the old session-blob cart (load the session, "
+        "update the dict, rewrite the whole row) against the Cart/CartLine tables, with "
+        "several browser tabs adding concurrently. Also reports how many adds were lost to "
+        "concurrent read-modify-write of the session. Rows created by the benchmark are deleted afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=8, help="Concurrent tabs adding to carts.")
+        parser.add_argument("--shoppers", type=int, default=2, help="Carts shared by the tabs (tab i uses cart i %% shoppers).")
+        parser.add_argument("--adds", type=int, default=200, help="Add-to-cart operations per shopper.")
+        parser.add_argument("--lines", type=int, default=20, help="Distinct products each shopper cycles through.")
+
+    def _run(self, threads, adds, operation):
+        done = [0] * threads
+        lock_errors = [0] * threads
+
+        def worker(index):
+            try:
+                for i in range(adds):
+                    try:
+                        operation(index, i)
+                        done[index] += 1
+                    except OperationalError:
+                        lock_errors[index] += 1
+            finally:
+                connection.close()
+
+        start = time.perf_counter()
+        pool = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+        for t in pool:
+            t.start()
+        for t in pool:
+            t.join()
+        return sum(done), sum(lock_errors), time.perf_counter() - start
+
+    def handle(self, *args, **options):
+        threads = options["threads"]
+        adds = options["adds"]
+        shoppers = max(1, min(options["shoppers"], threads))
+        SessionStore = import_module(settings.SESSION_ENGINE).SessionStore
+
+        category = Category.objects.create(name="__bench_cart__", slug="__bench_cart__")
+        products = Product.objects.bulk_create([
+            Product(category=category, name=f"Bench cart {i}", slug=f"__bench-cart-{i}__", price="799.00", stock=10_000)
+            for i in range(options["lines"])
+        ])
+        product_ids = [p.id for p in products]
+        sessions, carts = [], []
+        try:
+            for _ in range(shoppers):
+                session = SessionStore()
+                # Typical session contents besides the cart: login state and a pending order's id
+                session["_auth_user_id"] = "1"
+                session["pending_order_id"] = 1
+                session["cart"] = {}
+                session.create()
+                sessions.append(session.session_key)
+                carts.append(Cart.objects.create())
+
+            def session_add(index, i):
+                session = SessionStore(session_key=sessions[index % shoppers])
+                cart = session.get("cart", {})
+                key = f"{product_ids[i % len(product_ids)]}:M"
+                cart[key] = cart.get(key, 0) + 1
+                session["cart"] = cart
+                session.save()
+
+            def table_add(index, i):
+                add_item(carts[index % shoppers], product_ids[i % len(product_ids)], "M")
+
+            session_run = self._run(threads, adds, session_add)
+            session_items = sum(sum(SessionStore(session_key=key).load().get("cart", {}).values()) for key in sessions)
+            table_run = self._run(threads, adds, table_add)
+            table_items = sum(Cart.objects.filter(pk__in=[c.pk for c in carts]).values_list("item_count", flat=True))
+            store = SessionStore(session_key=sessions[0])
+            blob = store.encode(store.load())
+
+            self.stdout.write(self.style.NOTICE(
+                f"{threads} tab(s) over {shoppers} cart(s) x {adds} add(s), {len(product_ids)} products"
+            ))
+            for label, (done, errors, elapsed), items in (
+                ("session blob", session_run, session_items),
+                ("cart table", table_run, table_items),
+            ):
+                self.stdout.write(
+                    f"  {label:<13} {done / elapsed:9.1f} adds/s  ({done} ok, {errors} lock errors, "
+                    f"{done - items} lost, {elapsed:.2f}s)"
+                )
+            self.stdout.write(f"  session row rewritten per add: {len(blob)} bytes; cart table: one CartLine row")
+        finally:
+            for key in sessions:
+                SessionStore(session_key=key).delete()
+            Cart.objects.filter(pk__in=[c.pk for c in carts]).delete()
+            category.delete()
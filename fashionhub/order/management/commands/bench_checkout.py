@@ -0,0 +1,118 @@
+import threading
+import time
+from importlib import import_module
+from urllib.parse import parse_qsl, urlsplit
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from clothes.models import Category, Product
+from order.models import Order, ProcessedEvent
+from order.tasks import send_order_confirmation, sweep_expired_orders, sweep_expired_reservations
+from taskqueue.models import Job
+from user.models import Address
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-test the card checkout end to end against the fake payment gateway: several "
+        "shoppers add to cart, start a card payment and return from the (fake) provider. "
+        "Reports checkouts/second and how many fell back to Cash on Delivery because the "
+        "provider was slow or failing. Orders are marked paid by the provider's (fake, signed) "
+        "webhook. Rows created by the benchmark are deleted afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=8, help="Concurrent shoppers.")
+        parser.add_argument("--checkouts", type=int, default=20, help="Checkouts per shopper.")
+        parser.add_argument("--latency", type=float, default=0.05, help="Seconds the fake provider takes per call.")
+        parser.add_argument("--failure-rate", type=float, default=0.0, help="Share of fake provider calls that fail.")
+        parser.add_argument("--slow-call", type=float, default=None,
+                            help="Calls slower than this count as failures (default: PAYMENT_SLOW_CALL).")
+
+    def _shop(self, index, product, user, address, rounds, stats):
+        client = Client(HTTP_HOST="localhost")
+        client.force_login(user)
+        try:
+            for _ in range(rounds):
+                client.post(reverse("cart_add", args=[product.id]))
+                # Double submit of the same checkout: the provider must see one session
+                first = client.post(reverse("payment"), {"paymentMethod": "stripe", "selected_address": address.id})
+                again = client.post(reverse("payment"), {"paymentMethod": "stripe", "selected_address": address.id})
+                target = urlsplit(first.url)
+                if target.path != reverse("payment_fake_checkout"):
+                    stats["fallback"][index] += 1
+                    client.post(reverse("cart_remove", args=[product.id]))
+                    continue
+                if urlsplit(again.url).path == target.path and again.url != first.url:
+                    stats["duplicates"][index] += 1
+                # Paying on the fake provider page delivers the signed webhook, then
+                # returns to payment_success
+                if client.get(first.url).status_code != 200:
+                    continue
+                landed = client.post(target.path, dict(parse_qsl(target.query)), follow=True).redirect_chain[0][0]
+                if urlsplit(landed).path == reverse("payment_success"):
+                    stats["paid"][index] += 1
+        finally:
+            stats["sessions"].append(client.session.session_key)
+            connection.close()
+
+    def handle(self, *args, **options):
+        from user.models import User
+
+        threads, rounds = options["threads"], options["checkouts"]
+        slow_call = options["slow_call"] if options["slow_call"] is not None else settings.PAYMENT_SLOW_CALL
+        category = Category.objects.create(name="__bench_checkout__", slug="__bench_checkout__")
+        product = Product.objects.create(category=category, name="Bench checkout", slug="__bench-checkout__",
+                                         price="1299.00", stock=threads * rounds * 2)
+        users = [User.objects.create_user(username=f"__bench_checkout_{i}__") for i in range(threads)]
+        addresses = [Address.objects.create(user=u, address1="1 Bench Road", city="Jalandhar", is_primary=True)
+                     for u in users]
+        started = timezone.now()
+        last_job = Job.objects.order_by("-id").values_list("id", flat=True).first() or 0
+        stats = {key: [0] * threads for key in ("paid", "fallback", "duplicates")}
+        stats["sessions"] = []
+
+        try:
+            with override_settings(PAYMENT_GATEWAY="fake", PAYMENT_FAKE_LATENCY=options["latency"],
+                                   PAYMENT_FAKE_FAILURE_RATE=options["failure_rate"], PAYMENT_SLOW_CALL=slow_call):
+                start = time.perf_counter()
+                pool = [
+                    threading.Thread(target=self._shop, args=(i, product, users[i], addresses[i], rounds, stats))
+                    for i in range(threads)
+                ]
+                for t in pool:
+                    t.start()
+                for t in pool:
+                    t.join()
+                elapsed = time.perf_counter() - start
+
+            paid, fallback = sum(stats["paid"]), sum(stats["fallback"])
+            orders = Order.objects.filter(user__in=users, status=Order.PAID).count()
+            self.stdout.write(
+                f"{threads} shopper(s) x {rounds} checkout(s), provider latency {options['latency'] * 1000:.0f} ms, "
+                f"failure rate {options['failure_rate']:.0%}"
+            )
+            self.stdout.write(
+                f"  {paid} paid, {fallback} sent back to choose Cash on Delivery, "
+                f"{sum(stats['duplicates'])} duplicate provider session(s); "
+                f"{(paid + fallback) / elapsed:.1f} checkouts/s"
+            )
+            if orders != paid:
+                raise CommandError(f"{paid} payments completed but {orders} paid orders were written.")
+            self.stdout.write(self.style.SUCCESS("Benchmark finished."))
+        finally:
+            ProcessedEvent.objects.filter(processed_at__gte=started).delete()
+            SessionStore = import_module(settings.SESSION_ENGINE).SessionStore
+            for key in stats["sessions"]:
+                SessionStore(session_key=key).delete()
+            User.objects.filter(pk__in=[u.pk for u in users]).delete()
+            Job.objects.filter(id__gt=last_job, name__in=[
+                send_order_confirmation.task_name, sweep_expired_reservations.task_name,
+                sweep_expired_orders.task_name,
+            ]).delete()
+            category.delete()
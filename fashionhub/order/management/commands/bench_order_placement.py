@@ -0,0 +1,74 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from clothes.models import Category, Product
+from order.services import create_pending_order, finalise_paid_order
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark order placement (orders/second) for carts of different sizes: each order is "
+        "written as a pending order with its stock reserved, then finalised as paid. "
+        "All rows created by the benchmark are rolled back at the end."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--lines",
+            type=int,
+            nargs="+",
+            default=[1, 10, 50],
+            help="Cart sizes (number of order lines) to benchmark.",
+        )
+        parser.add_argument(
+            "--orders",
+            type=int,
+            default=200,
+            help="Number of orders to place for each cart size.",
+        )
+
+    def handle(self, *args, **options):
+        from user.models import User
+
+        try:
+            with transaction.atomic():
+                user = User.objects.create_user(username="__bench_order_placement__")
+                category = Category.objects.create(name="__bench__", slug="__bench__")
+                products = [
+                    Product(category=category, name=f"Bench {i}", slug=f"__bench-{i}__", price="499.00",
+                            stock=2 * options["orders"] * len(options["lines"]))
+                    for i in range(max(options["lines"]))
+                ]
+                Product.objects.bulk_create(products)
+
+                for n in options["lines"]:
+                    items = [
+                        {
+                            "product_id": p.id,
+                            "name": p.name,
+                            "size": "",
+                            "quantity": 2,
+                            "unit_price": 499.0,
+                            "total_price": 998.0,
+                        } for p in products[:n]
+                    ]
+                    start = time.perf_counter()
+                    for _ in range(options["orders"]):
+                        order = create_pending_order(user, items)
+                        finalise_paid_order(order.id, f"cs_bench_{order.id}")
+                    elapsed = time.perf_counter() - start
+                    self.stdout.write(
+                        f"{n:>4} line(s): {options['orders'] / elapsed:10.1f} orders/s "
+                        f"({elapsed * 1000 / options['orders']:.2f} ms/order)"
+                    )
+                raise _Rollback
+        except _Rollback:
+            pass
+
+        self.stdout.write(self.style.SUCCESS("Benchmark finished; all benchmark rows rolled back."))
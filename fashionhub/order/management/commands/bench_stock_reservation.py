@@ -0,0 +1,83 @@
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection
+
+from clothes.models import Category, Product
+from order.models import Order
+from order.services import OutOfStock, consume_stock, reserve_stock
+from order.tasks import sweep_expired_reservations
+from taskqueue.models import Job
+
+
+class Command(BaseCommand):
+    help = (
+        "Hammer reserve_stock from several threads against one product and check that "
+        "stock is never oversold. Reports reservations/second and lock errors. "
+        "Rows created by the benchmark are deleted afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=8, help="Concurrent checkout threads.")
+        parser.add_argument("--stock", type=int, default=500, help="Initial stock of the contended product.")
+        parser.add_argument("--attempts", type=int, default=100, help="Reservation attempts per thread.")
+
+    def handle(self, *args, **options):
+        from user.models import User
+
+        threads = options["threads"]
+        attempts = options["attempts"]
+        initial_stock = options["stock"]
+
+        category = Category.objects.create(name="__bench_stock__", slug="__bench_stock__")
+        product = Product.objects.create(
+            category=category, name="Bench stock", slug="__bench-stock__", price="499.00", stock=initial_stock,
+        )
+        users = [User.objects.create_user(username=f"__bench_stock_{i}__") for i in range(threads)]
+        orders = [Order.objects.create(user=user, total_amount=0, status=Order.PENDING) for user in users]
+        last_job = Job.objects.order_by("-id").values_list("id", flat=True).first() or 0
+
+        reserved = [0] * threads
+        sold_out = [0] * threads
+        lock_errors = [0] * threads
+
+        def worker(index):
+            try:
+                for _ in range(attempts):
+                    try:
+                        reserve_stock(orders[index], {(product.id, ''): 1})
+                        reserved[index] += 1
+                        # Consume the reservation as if the order was placed
+                        consume_stock(orders[index].id)
+                    except OutOfStock:
+                        sold_out[index] += 1
+                    except OperationalError:
+                        lock_errors[index] += 1
+            finally:
+                connection.close()
+
+        try:
+            start = time.perf_counter()
+            pool = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+            for t in pool:
+                t.start()
+            for t in pool:
+                t.join()
+            elapsed = time.perf_counter() - start
+
+            product.refresh_from_db()
+            total = sum(reserved)
+            self.stdout.write(
+                f"{threads} thread(s) x {attempts} attempt(s): {total} reserved, {sum(sold_out)} sold out, "
+                f"{sum(lock_errors)} lock error(s) in {elapsed:.2f}s "
+                f"({threads * attempts / elapsed:.1f} attempts/s)"
+            )
+            self.stdout.write(f"Stock: {initial_stock} -> {product.stock}")
+            if product.stock != initial_stock - total or product.stock < 0:
+                raise CommandError("Stock accounting mismatch: reservations oversold the product.")
+            self.stdout.write(self.style.SUCCESS("No overselling detected."))
+        finally:
+            User.objects.filter(pk__in=[u.pk for u in users]).delete()
+            Job.objects.filter(name=sweep_expired_reservations.task_name, id__gt=last_job).delete()
+            category.delete()
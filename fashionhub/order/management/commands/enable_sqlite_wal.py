@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+
+class Command(BaseCommand):
+    help = (
+        "Switch the production SQLite database to WAL journal mode. The mode is stored in the "
+        "database file, so this runs once per database, as a deploy step. The bundled "
+        "development database is left in rollback-journal mode."
+    )
+
+    def handle(self, *args, **options):
+        if connection.vendor != "sqlite":
+            raise CommandError("Only SQLite databases have a journal mode to switch.")
+        if not settings.PRODUCTION:
+            raise CommandError("Run this with DJANGO_ENV=production; the development database keeps its rollback journal.")
+        with connection.cursor() as cursor:
+            mode = cursor.execute("PRAGMA journal_mode=WAL").fetchone()[0]
+        if mode.lower() != "wal":
+            raise CommandError(f"SQLite stayed in journal_mode={mode}; is another process holding the database open?")
+        self.stdout.write(self.style.SUCCESS(f"{connection.settings_dict['NAME']} now runs in WAL mode."))
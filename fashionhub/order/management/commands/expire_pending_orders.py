@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from order.services import expire_pending_orders, release_expired_stock
+
+
+class Command(BaseCommand):
+    help = (
+        "Expire pending orders whose payment has not arrived within PENDING_ORDER_TTL and "
+        "return their reserved stock. Run periodically (e.g. from cron every minute)."
+    )
+
+    def handle(self, *args, **options):
+        expired = expire_pending_orders()
+        released = release_expired_stock()
+        if expired or released:
+            self.stdout.write(self.style.SUCCESS(
+                f"Expired {expired} pending order(s); released {released} reserved unit(s) back to stock."
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS("No expired pending orders found."))
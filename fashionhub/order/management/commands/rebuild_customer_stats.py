@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from order.services import rebuild_customer_stats
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute every customer's order count, lifetime spend and last order date "
+        "(CustomerStats) from their paid and Cash on Delivery orders."
+    )
+
+    def handle(self, *args, **options):
+        customers = rebuild_customer_stats()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt order stats for {customers} customer(s)."))
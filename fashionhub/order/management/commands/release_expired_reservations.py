@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from order.services import release_expired_stock
+
+
+class Command(BaseCommand):
+    help = (
+        "Return stock held by checkout reservations whose TTL has expired. "
+        "Run periodically (e.g. from cron every minute)."
+    )
+
+    def handle(self, *args, **options):
+        released = release_expired_stock()
+        if released:
+            self.stdout.write(self.style.SUCCESS(f"Released {released} reserved unit(s) back to stock."))
+        else:
+            self.stdout.write(self.style.SUCCESS("No expired reservations found."))
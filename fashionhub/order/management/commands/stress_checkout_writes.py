@@ -0,0 +1,103 @@
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, connections
+
+from clothes.models import Category, Product
+from order.models import Order
+from order.services import OutOfStock, confirm_cod_order, create_pending_order
+from order.tasks import send_order_confirmation, sweep_expired_orders, sweep_expired_reservations
+from taskqueue.models import Job
+
+
+def _checkouts(user_id, product_ids, rounds):
+    # Runs in a worker process with its own database connection
+    from user.models import User
+
+    user = User.objects.get(pk=user_id)
+    placed = sold_out = 0
+    errors = []
+    start = time.perf_counter()
+    try:
+        for i in range(rounds):
+            product_id = product_ids[i % len(product_ids)]
+            try:
+                order = create_pending_order(user, [{
+                    'product_id': product_id, 'name': 'Bench checkout', 'quantity': 1,
+                    'unit_price': '299.00', 'total_price': '299.00',
+                }])
+                confirm_cod_order(order.id)
+                placed += 1
+            except OutOfStock:
+                sold_out += 1
+            except OperationalError as exc:
+                errors.append(str(exc))
+    finally:
+        connection.close()
+    return placed, sold_out, errors, time.perf_counter() - start
+
+
+class Command(BaseCommand):
+    help = (
+        "Run N checkout processes at once (write the pending order with its stock reserved, "
+        "then confirm it as Cash on Delivery) against a "
+        "few shared products and fail if any of them hits \"database is locked\". Rows "
+        "created by the test are deleted afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--processes", type=int, default=8, help="Concurrent checkout processes.")
+        parser.add_argument("--rounds", type=int, default=50, help="Checkouts per process.")
+        parser.add_argument("--products", type=int, default=3, help="Products the checkouts contend for.")
+
+    def handle(self, *args, **options):
+        from user.models import User
+
+        processes = options["processes"]
+        rounds = options["rounds"]
+        if connection.vendor == "sqlite":
+            mode = connection.cursor().execute("PRAGMA journal_mode").fetchone()[0]
+            timeout = connection.cursor().execute("PRAGMA busy_timeout").fetchone()[0]
+            self.stdout.write(f"SQLite journal_mode={mode}, busy_timeout={timeout} ms")
+
+        category = Category.objects.create(name="__stress_checkout__", slug="__stress_checkout__")
+        products = Product.objects.bulk_create([
+            Product(category=category, name=f"Stress checkout {i}", slug=f"__stress-checkout-{i}__",
+                    price="299.00", stock=processes * rounds)
+            for i in range(options["products"])
+        ])
+        product_ids = [p.id for p in products]
+        users = [User.objects.create_user(username=f"__stress_checkout_{i}__") for i in range(processes)]
+        last_job = Job.objects.order_by("-id").values_list("id", flat=True).first() or 0
+
+        try:
+            # Forked workers must not share the parent's database connection
+            connections.close_all()
+            start = time.perf_counter()
+            with ProcessPoolExecutor(max_workers=processes, initializer=django.setup) as pool:
+                futures = [pool.submit(_checkouts, user.pk, product_ids, rounds) for user in users]
+                results = [future.result() for future in futures]
+            elapsed = time.perf_counter() - start
+
+            placed = sum(r[0] for r in results)
+            sold_out = sum(r[1] for r in results)
+            errors = [error for r in results for error in r[2]]
+            orders = Order.objects.filter(user__in=users).count()
+            self.stdout.write(
+                f"{processes} process(es) x {rounds} checkout(s): {placed} placed, {sold_out} sold out, "
+                f"{len(errors)} lock error(s) in {elapsed:.2f}s ({placed / elapsed:.1f} orders/s)"
+            )
+            if orders != placed:
+                raise CommandError(f"{placed} checkouts succeeded but {orders} orders were written.")
+            if errors:
+                raise CommandError(f"{len(errors)} checkout(s) failed, e.g. {errors[0]!r}.")
+            self.stdout.write(self.style.SUCCESS("No lock errors."))
+        finally:
+            User.objects.filter(pk__in=[u.pk for u in users]).delete()
+            Job.objects.filter(id__gt=last_job, name__in=[
+                send_order_confirmation.task_name, sweep_expired_reservations.task_name,
+                sweep_expired_orders.task_name,
+            ]).delete()
+            category.delete()
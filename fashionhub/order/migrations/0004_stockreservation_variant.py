@@ -0,0 +1,20 @@
+# Generated by Django 5.2.7 on 2026-10-18 10:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clothes', '0004_productvariant'),
+        ('order', '0003_stockreservation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stockreservation',
+            name='variant',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='reservations', to='clothes.productvariant'),
+        ),
+    ]
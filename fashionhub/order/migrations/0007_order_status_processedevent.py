@@ -0,0 +1,39 @@
+# Generated by Django 5.2.7 on 2026-10-18 10:44
+
+from django.db import migrations, models
+
+
+def status_from_is_paid(apps, schema_editor):
+    # Orders placed so far were either paid by card or cash on delivery
+    Order = apps.get_model('order', 'Order')
+    Order.objects.filter(is_paid=True).update(status='paid')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('order', '0006_order_user_created_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProcessedEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_id', models.CharField(max_length=255, unique=True)),
+                ('type', models.CharField(max_length=100)),
+                ('processed_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='payment_session_id',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Awaiting payment'), ('paid', 'Paid'), ('cod', 'Cash on delivery')], default='cod', max_length=10),
+        ),
+        migrations.RunPython(status_from_is_paid, migrations.RunPython.noop),
+    ]
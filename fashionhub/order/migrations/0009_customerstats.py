@@ -0,0 +1,44 @@
+# Generated by Django 5.2.7 on 2026-10-18 10:51
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Max, Sum
+
+
+def compute_customer_stats(apps, schema_editor):
+    Order = apps.get_model('order', 'Order')
+    CustomerStats = apps.get_model('order', 'CustomerStats')
+    totals = (Order.objects
+              .filter(status__in=['paid', 'cod'])
+              .values('user_id')
+              .annotate(count=Count('id'), spend=Sum('total_amount'), last=Max('created_at')))
+    CustomerStats.objects.bulk_create([
+        CustomerStats(user_id=row['user_id'], order_count=row['count'], lifetime_spend=row['spend'],
+                      last_order_at=row['last'])
+        for row in totals
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('order', '0008_order_pending_expiry_address'),
+        ('user', '0006_address_user_primary_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CustomerStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='customer_stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('order_count', models.PositiveIntegerField(default=0)),
+                ('lifetime_spend', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('last_order_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name_plural': 'customer stats',
+            },
+        ),
+        migrations.RunPython(compute_customer_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.7 on 2026-10-18 11:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('order', '0009_customerstats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stockreservation',
+            name='order',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='stock_reservations', to='order.order'),
+        ),
+        migrations.AlterField(
+            model_name='order',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Awaiting payment'), ('paid', 'Paid'), ('cod', 'Cash on delivery'), ('cancelled', 'Cancelled'), ('expired', 'Expired'), ('review', 'Paid, needs review')], default='cod', max_length=10),
+        ),
+    ]
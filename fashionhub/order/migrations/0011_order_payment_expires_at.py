@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 11:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('order', '0010_stockreservation_order_review_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='payment_expires_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
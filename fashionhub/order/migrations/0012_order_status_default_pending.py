@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 11:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('order', '0011_order_payment_expires_at'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='order',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Awaiting payment'), ('paid', 'Paid'), ('cod', 'Cash on delivery'), ('cancelled', 'Cancelled'), ('expired', 'Expired'), ('review', 'Paid, needs review')], default='pending', max_length=10),
+        ),
+    ]
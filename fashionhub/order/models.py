@@ -2,11 +2,54 @@ from django.db import models
 
 
 class Order(models.Model):
+    PENDING = 'pending'
+    PAID = 'paid'
+    COD = 'cod'
+    CANCELLED = 'cancelled'
+    EXPIRED = 'expired'
+    REVIEW = 'review'
+    STATUS_CHOICES = [
+        (PENDING, 'Awaiting payment'),
+        (PAID, 'Paid'),
+        (COD, 'Cash on delivery'),
+        (CANCELLED, 'Cancelled'),
+        (EXPIRED, 'Expired'),
+        (REVIEW, 'Paid, needs review'),
+    ]
+    # Allowed status changes (order.services applies them with conditional
+    # UPDATEs). A payment the provider took just before the checkout expired
+    # or was replaced by a newer one can be reported afterwards, so an expired
+    # or cancelled order may still become paid, if its stock can be reserved
+    # again, or else be held for review: paid, but not (yet) a sale.
+    TRANSITIONS = {
+        PENDING: {PAID, COD, CANCELLED, EXPIRED, REVIEW},
+        EXPIRED: {PAID, REVIEW},
+        CANCELLED: {PAID, REVIEW},
+    }
+
     user = models.ForeignKey('user.User', on_delete=models.CASCADE, related_name='orders')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     total_amount = models.DecimalField(max_digits=10, decimal_places=2)
     is_paid = models.BooleanField(default=False)
+    # Checkouts are written as pending orders; card orders are marked paid by
+    # the provider's webhook (order.webhooks), COD orders when confirmed
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    payment_session_id = models.CharField(max_length=255, blank=True, default='', db_index=True)
+    # When the provider's checkout session closes; fixed before the first
+    # attempt, so every retry of the checkout sends the same expiry
+    payment_expires_at = models.DateTimeField(null=True, blank=True)
+    address = models.ForeignKey('user.Address', on_delete=models.SET_NULL, null=True, blank=True, related_name='orders')
+    # When a pending order stops waiting for its payment
+    expires_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Order history: one user's orders, newest first
+            models.Index(fields=['user', '-created_at'], name='order_user_created_idx'),
+            # Expiry sweeper: pending orders past their expires_at
+            models.Index(fields=['status', 'expires_at'], name='order_status_expires_idx'),
+        ]
 
     def __str__(self):
         return f"Order {self.id} by {self.user.username}"
@@ -23,4 +66,99 @@ class OrderItem(models.Model):
 
     def __str__(self):
         return f"{self.product_name} x{self.quantity} (Order {self.order_id})"
-    
+
+
+class CustomerStats(models.Model):
+    """Running totals of a customer's placed (paid or Cash on Delivery) orders.
+
+    Updated in the same transaction that places an order (see
+    order.services), so the profile page and the admin never aggregate a
+    customer's whole history. ``rebuild_customer_stats`` recomputes the table
+    from the orders.
+    """
+    user = models.OneToOneField('user.User', on_delete=models.CASCADE, primary_key=True, related_name='customer_stats')
+    order_count = models.PositiveIntegerField(default=0)
+    lifetime_spend = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    last_order_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name_plural = 'customer stats'
+
+    def __str__(self):
+        return f"{self.order_count} order(s) by {self.user_id}"
+
+
+class ProcessedEvent(models.Model):
+    """A payment provider webhook event that has been handled.
+
+    Providers deliver events at least once; the unique ``event_id`` lets a
+    redelivered event be recognised and skipped.
+    """
+    event_id = models.CharField(max_length=255, unique=True)
+    type = models.CharField(max_length=100)
+    processed_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.type} {self.event_id}"
+
+
+class StockReservation(models.Model):
+    """Stock held back for a pending order between checkout and payment.
+
+    The variant's (or, for unsized lines, the product's) ``stock`` is
+    decremented when the reservation is made; the row only records how much
+    to give back if the reservation is cancelled or expires.
+    """
+    user = models.ForeignKey('user.User', on_delete=models.CASCADE, related_name='stock_reservations')
+    # Null only for reservations made before they belonged to an order. A
+    # deleted order leaves its rows for the expiry sweeper to restock.
+    order = models.ForeignKey(Order, on_delete=models.SET_NULL, null=True, blank=True, related_name='stock_reservations')
+    product = models.ForeignKey('clothes.Product', on_delete=models.CASCADE, related_name='reservations')
+    variant = models.ForeignKey('clothes.ProductVariant', on_delete=models.CASCADE, null=True, blank=True, related_name='reservations')
+    quantity = models.PositiveIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"{self.quantity} x product {self.product_id} for {self.user_id}"
+
+
+class Cart(models.Model):
+    """A shopping cart stored in the database instead of the session.
+
+    Guest carts have no user; the session only holds the cart's id and the
+    cart is attached to the account on login (see order.cart.merge_guest_cart).
+    ``item_count`` is the sum of line quantities, kept up to date on every
+    change so the navbar badge never has to read the lines.
+    """
+    user = models.OneToOneField('user.User', on_delete=models.CASCADE, null=True, blank=True, related_name='cart')
+    item_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    def __str__(self):
+        owner = self.user_id and f"user {self.user_id}" or "guest"
+        return f"Cart {self.id} ({owner})"
+
+
+class CartLine(models.Model):
+    cart = models.ForeignKey(Cart, on_delete=models.CASCADE, related_name='lines')
+    product = models.ForeignKey('clothes.Product', on_delete=models.CASCADE, related_name='cart_lines')
+    size = models.CharField(max_length=10, blank=True, default='')
+    quantity = models.PositiveIntegerField(default=1)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['cart', 'product', 'size'], name='unique_cart_product_size'),
+        ]
+
+    @property
+    def total_price(self):
+        return self.product.price * self.quantity
+
+    @property
+    def key(self):
+        return f"{self.product_id}:{self.size}"
+
+    def __str__(self):
+        return f"{self.quantity} x product {self.product_id} ({self.size or 'no size'}) in cart {self.cart_id}"
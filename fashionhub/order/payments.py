@@ -0,0 +1,284 @@
+import hashlib
+import json
+import random
+import threading
+import time
+from collections import namedtuple
+from urllib.parse import urlencode, urljoin
+
+import requests
+import stripe
+from django.conf import settings
+from django.urls import reverse
+from requests.adapters import HTTPAdapter
+
+
+# ---------------------------
+# Payment gateways
+# ---------------------------
+#
+# payment_process talks to a gateway object rather than the stripe module.
+# The Stripe gateway is built once per process around one pooled keep-alive
+# HTTP session with explicit connect/read timeouts, and every checkout is
+# created with an idempotency key and an expiry fixed per order, so a retried
+# POST gets the same Stripe session back instead of a second one; once an
+# order has its session, a re-submitted checkout is sent back to it
+# (retrieve_checkout). A circuit breaker sits in front of
+# the provider: after PAYMENT_BREAKER_FAILURES failed or slow calls in a row,
+# card payments are refused straight away (the shopper is offered Cash on
+# Delivery) until PAYMENT_BREAKER_RESET seconds have passed. Set
+# PAYMENT_GATEWAY = 'fake' to run the whole checkout offline.
+#
+# A session only starts the payment: the order is marked paid when the
+# provider's webhook reports the completed checkout (see order.webhooks).
+
+CheckoutSession = namedtuple('CheckoutSession', 'id url')
+
+# Prices are in rupees; providers charge in paise
+CHECKOUT_CURRENCY = 'inr'
+
+
+class PaymentError(Exception):
+    """The provider rejected the checkout; the message can be shown to the shopper."""
+
+
+class GatewayUnavailable(PaymentError):
+    """The provider is down or too slow, or the circuit breaker is open."""
+
+
+def idempotency_key(user_id, order_id):
+    """Key identifying the checkout of pending order ``order_id``.
+
+    A re-submitted checkout reuses its pending order, so it yields the same
+    key and Stripe replays the first response instead of opening a second
+    session.
+    """
+    payload = json.dumps({'user': user_id, 'order': order_id}, sort_keys=True)
+    return 'checkout-' + hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker, shared by the threads of a process."""
+
+    def __init__(self, failures=3, reset_after=30.0, clock=time.monotonic):
+        self.failures = failures
+        self.reset_after = reset_after
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._failed = 0
+        self._opened_at = None
+        self._probing = False
+
+    @property
+    def is_open(self):
+        with self._lock:
+            return self._opened_at is not None and self.clock() - self._opened_at < self.reset_after
+
+    def allow(self):
+        """Whether a call may go through; once the reset time has passed, lets one probe call in."""
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if self.clock() - self._opened_at < self.reset_after or self._probing:
+                return False
+            self._probing = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failed = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failed += 1
+            self._probing = False
+            if self._opened_at is not None or self._failed >= self.failures:
+                self._opened_at = self.clock()
+
+
+class StripeGateway:
+    """Stripe Checkout over one pooled, keep-alive HTTP session."""
+
+    def __init__(self, api_key, connect_timeout=3.05, read_timeout=10, max_retries=1, pool_size=10):
+        session = requests.Session()
+        session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=pool_size))
+        http_client = stripe.RequestsClient(timeout=(connect_timeout, read_timeout), session=session)
+        # A client object instead of the module-level stripe.api_key, so no
+        # request changes global state
+        self.client = stripe.StripeClient(api_key, http_client=http_client, max_network_retries=max_retries)
+
+    def create_checkout(self, *, line_items, success_url, cancel_url, idempotency_key, expires_at,
+                        metadata=None, client_reference_id=None):
+        try:
+            session = self.client.v1.checkout.sessions.create(
+                params={
+                    'payment_method_types': ['card'],
+                    'mode': 'payment',
+                    'line_items': line_items,
+                    'success_url': success_url,
+                    'cancel_url': cancel_url,
+                    'metadata': metadata or {},
+                    **({'client_reference_id': client_reference_id} if client_reference_id else {}),
+                    # Fixed per order (a replayed idempotency key must send the same
+                    # parameters); Stripe refuses one under 30 minutes away
+                    'expires_at': int(expires_at.timestamp()),
+                },
+                options={'idempotency_key': idempotency_key},
+            )
+        except (stripe.APIConnectionError, stripe.RateLimitError, stripe.APIError) as exc:
+            # Timeouts, refused connections, 5xx and throttling: the provider's problem
+            raise GatewayUnavailable(str(exc)) from exc
+        except stripe.StripeError as exc:
+            raise PaymentError(exc.user_message or str(exc)) from exc
+        return CheckoutSession(session.id, session.url)
+
+    def retrieve_checkout(self, session_id):
+        """The checkout session ``session_id``, if the shopper can still pay it."""
+        try:
+            session = self.client.v1.checkout.sessions.retrieve(session_id)
+        except (stripe.APIConnectionError, stripe.RateLimitError, stripe.APIError) as exc:
+            raise GatewayUnavailable(str(exc)) from exc
+        except stripe.StripeError as exc:
+            raise PaymentError(exc.user_message or str(exc)) from exc
+        if session.status != 'open':
+            raise PaymentError('This payment session has closed.')
+        return CheckoutSession(session.id, session.url)
+
+    def expire_checkout(self, session_id):
+        """Close an open checkout session so it can no longer be paid."""
+        try:
+            self.client.v1.checkout.sessions.expire(session_id)
+        except (stripe.APIConnectionError, stripe.RateLimitError, stripe.APIError) as exc:
+            raise GatewayUnavailable(str(exc)) from exc
+        except stripe.StripeError as exc:
+            # e.g. the session was already completed or expired
+            raise PaymentError(exc.user_message or str(exc)) from exc
+
+
+class FakeGateway:
+    """Offline stand-in for Stripe that approves every checkout.
+
+    The shopper is sent to a local page (``payment_fake_checkout``) whose
+    Pay button delivers a signed webhook event for the payment, then goes on
+    to ``success_url``. ``latency`` seconds are
+    slept per call and ``failure_rate`` of calls raise GatewayUnavailable, to
+    load-test the checkout and the circuit breaker without a network.
+    Repeated idempotency keys return the first session, as Stripe does.
+    """
+
+    def __init__(self, latency=0.0, failure_rate=0.0):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def create_checkout(self, *, line_items, success_url, cancel_url, idempotency_key, expires_at,
+                        metadata=None, client_reference_id=None):
+        if self.latency:
+            time.sleep(self.latency)
+        if self.failure_rate and random.random() < self.failure_rate:
+            raise GatewayUnavailable('Fake gateway outage')
+        with self._lock:
+            session = self._sessions.get(idempotency_key)
+            if session is None:
+                session_id = 'cs_fake_' + hashlib.sha256(idempotency_key.encode()).hexdigest()[:24]
+                query = urlencode({
+                    'session_id': session_id,
+                    'amount': sum(item['price_data']['unit_amount'] * item['quantity'] for item in line_items),
+                    'next': success_url.replace('{CHECKOUT_SESSION_ID}', session_id),
+                })
+                url = urljoin(success_url, reverse('payment_fake_checkout')) + '?' + query
+                session = CheckoutSession(session_id, url)
+                self._sessions[idempotency_key] = session
+        return session
+
+    def retrieve_checkout(self, session_id):
+        with self._lock:
+            session = next((s for s in self._sessions.values() if s.id == session_id), None)
+        if session is None:
+            raise PaymentError('This payment session has closed.')
+        return session
+
+    def expire_checkout(self, session_id):
+        # Nothing to close: the fake payment page only pays pending orders
+        pass
+
+
+class GuardedGateway:
+    """Wraps a gateway in a circuit breaker; slow successes count as failures."""
+
+    def __init__(self, gateway, breaker, slow_call=5.0):
+        self.gateway = gateway
+        self.breaker = breaker
+        self.slow_call = slow_call
+
+    @property
+    def available(self):
+        return not self.breaker.is_open
+
+    def create_checkout(self, **kwargs):
+        return self._call(self.gateway.create_checkout, **kwargs)
+
+    def retrieve_checkout(self, session_id):
+        return self._call(self.gateway.retrieve_checkout, session_id)
+
+    def expire_checkout(self, session_id):
+        return self._call(self.gateway.expire_checkout, session_id)
+
+    def _call(self, method, *args, **kwargs):
+        if not self.breaker.allow():
+            raise GatewayUnavailable('Card payments are paused after repeated provider failures')
+        start = time.monotonic()
+        try:
+            result = method(*args, **kwargs)
+        except GatewayUnavailable:
+            self.breaker.record_failure()
+            raise
+        except PaymentError:
+            # A rejected request says nothing about the provider's health
+            self.breaker.record_success()
+            raise
+        if time.monotonic() - start > self.slow_call:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        return result
+
+
+_gateway = None
+_gateway_lock = threading.Lock()
+
+
+def _build_gateway():
+    if settings.PAYMENT_GATEWAY == 'fake':
+        gateway = FakeGateway(latency=settings.PAYMENT_FAKE_LATENCY, failure_rate=settings.PAYMENT_FAKE_FAILURE_RATE)
+    elif settings.STRIPE_API_KEY:
+        gateway = StripeGateway(
+            settings.STRIPE_API_KEY,
+            connect_timeout=settings.PAYMENT_CONNECT_TIMEOUT,
+            read_timeout=settings.PAYMENT_READ_TIMEOUT,
+            max_retries=settings.PAYMENT_MAX_RETRIES,
+        )
+    else:
+        return None
+    breaker = CircuitBreaker(failures=settings.PAYMENT_BREAKER_FAILURES, reset_after=settings.PAYMENT_BREAKER_RESET)
+    return GuardedGateway(gateway, breaker, slow_call=settings.PAYMENT_SLOW_CALL)
+
+
+def get_gateway():
+    """The process-wide payment gateway, or None if card payments are not configured."""
+    global _gateway
+    if _gateway is None:
+        with _gateway_lock:
+            if _gateway is None:
+                _gateway = _build_gateway() or False
+    return _gateway or None
+
+
+def reset_gateway():
+    """Drop the process-wide gateway so the next call rebuilds it from settings."""
+    global _gateway
+    with _gateway_lock:
+        _gateway = None
@@ -0,0 +1,371 @@
+import logging
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Max, Sum
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from clothes.models import Product, ProductVariant
+from fashionhub.db import write_transaction
+from . import tasks
+from .cart import clear_cart
+from .models import Cart, CustomerStats, Order, OrderItem, StockReservation
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------
+# Order placement
+# ---------------------------
+
+def order_lines(cart_items):
+    """Item dicts for an order, from resolved CartLine rows; prices stay Decimal."""
+    return [
+        {
+            'product_id': line.product.id,
+            'name': line.product.name,
+            'size': line.size or '',
+            'quantity': line.quantity,
+            'unit_price': line.product.price,
+            'total_price': line.total_price,
+        } for line in cart_items
+    ]
+
+
+def _write_order(user, items, total, status, **fields):
+    items = items or []
+    product_ids = {it.get('product_id') for it in items if it.get('product_id')}
+    products = Product.objects.in_bulk(product_ids) if product_ids else {}
+    order = Order.objects.create(
+        user=user,
+        total_amount=total,
+        is_paid=status == Order.PAID,
+        status=status,
+        **fields,
+    )
+    OrderItem.objects.bulk_create([
+        OrderItem(
+            order=order,
+            product=products.get(it.get('product_id')),
+            product_name=it.get('name', ''),
+            size=it.get('size') or '',
+            quantity=int(it.get('quantity', 1)),
+            unit_price=it.get('unit_price', 0) or 0,
+            line_total=it.get('total_price', 0) or 0,
+        ) for it in items
+    ])
+    return order
+
+
+def create_pending_order(user, items, address=None, ttl=None):
+    """Write a checkout as a pending order that expires after ``ttl`` seconds.
+
+    The total is summed from the items' Decimal line totals. The items'
+    stock is reserved for the order in the same transaction, so OutOfStock
+    leaves no order behind. It stays reserved and no email is sent until the
+    order is confirmed as Cash on Delivery (confirm_cod_order) or its payment
+    arrives (finalise_paid_order).
+    """
+    if ttl is None:
+        ttl = settings.PENDING_ORDER_TTL
+    total = sum((Decimal(str(it['total_price'])) for it in items), Decimal('0'))
+    quantities = defaultdict(int)
+    for it in items:
+        quantities[(it['product_id'], it.get('size') or '')] += int(it['quantity'])
+    expires_at = timezone.now() + timedelta(seconds=ttl)
+    with write_transaction():
+        order = _write_order(user, items, total, Order.PENDING, address=address, expires_at=expires_at)
+        reserve_stock(order, dict(quantities), expires_at)
+        tasks.sweep_expired_orders.delay_until(expires_at + timedelta(seconds=1))
+    return order
+
+
+def payment_expiry(order, ttl=None):
+    """When ``order``'s checkout session at the provider closes, ``ttl`` seconds
+    (PAYMENT_SESSION_TTL) after the first time it is asked for.
+
+    Every attempt to open the session reuses the order's idempotency key, and
+    the provider refuses a replayed key with different parameters, so the
+    expiry is stored on the order (first writer wins) and never recomputed.
+    """
+    if order.payment_expires_at is None:
+        if ttl is None:
+            ttl = settings.PAYMENT_SESSION_TTL
+        Order.objects.filter(pk=order.pk, payment_expires_at__isnull=True).update(
+            payment_expires_at=timezone.now() + timedelta(seconds=ttl))
+        order.payment_expires_at = Order.objects.values_list('payment_expires_at', flat=True).get(pk=order.pk)
+    return order.payment_expires_at
+
+
+def _transition(orders, from_statuses, to_status, **fields):
+    """Move the orders in ``orders`` to ``to_status`` if they are still in one of ``from_statuses``.
+
+    A conditional ``UPDATE ... WHERE status IN (...)``, so of two racing
+    changes (a webhook and the sweeper, a redelivered event) only one wins.
+    Returns how many orders this call moved (for a single order, whether it
+    moved it).
+    """
+    for status in from_statuses:
+        if to_status not in Order.TRANSITIONS.get(status, ()):
+            raise ValueError(f"An order cannot go from {status} to {to_status}")
+    return orders.filter(status__in=from_statuses).update(
+        status=to_status, is_paid=to_status in (Order.PAID, Order.REVIEW), updated_at=timezone.now(), **fields,
+    )
+
+
+def _complete(order_id):
+    order = Order.objects.select_related('user').get(pk=order_id)
+    record_placed_order(order)
+    consume_stock(order_id)
+    # The shopper may never come back from the provider, so the cart is
+    # emptied here rather than on the success page
+    clear_cart(Cart.objects.filter(user=order.user).first())
+    tasks.send_order_confirmation.delay(order.id)
+    return order
+
+
+def confirm_cod_order(order_id):
+    """Place pending order ``order_id`` as Cash on Delivery. Returns None if it was not pending."""
+    with write_transaction():
+        if not _transition(Order.objects.filter(pk=order_id), [Order.PENDING], Order.COD):
+            return None
+        return _complete(order_id)
+
+
+def finalise_paid_order(order_id, session_id=''):
+    """Mark order ``order_id`` paid, consume its stock and empty the cart.
+
+    However often the provider reports the payment, only the first report
+    finalises the order. A payment for an order that already expired or was
+    cancelled only makes it a sale if its stock can be reserved again;
+    otherwise the order is held for review (paid, but not counted or
+    confirmed) for the shop to resolve by hand. Returns the order, or None if
+    it was not waiting for a payment or went to review.
+    """
+    late = [Order.EXPIRED, Order.CANCELLED]
+    with write_transaction():
+        order = Order.objects.filter(pk=order_id, status__in=[Order.PENDING, *late]).first()
+        if order is None:
+            return None
+        # The reservation is gone once the order is cancelled or its expiry swept
+        if not StockReservation.objects.filter(order_id=order_id).exists():
+            try:
+                reserve_stock(order, order_quantities(order_id))
+            except OutOfStock as exc:
+                _transition(Order.objects.filter(pk=order_id), [order.status], Order.REVIEW,
+                            payment_session_id=session_id)
+                logger.warning("Order %s was paid after it %s but %s; held for review",
+                               order_id, order.status, exc)
+                return None
+        paid = _transition(Order.objects.filter(pk=order_id), [order.status], Order.PAID,
+                           payment_session_id=session_id)
+        if not paid:
+            return None
+        return _complete(order_id)
+
+
+def hold_paid_order_for_review(order_id, session_id=''):
+    """Hold order ``order_id`` for review after a payment that does not match it.
+
+    The order is marked paid but not placed: its reserved stock goes back,
+    nothing is counted or emailed, and the shop resolves it by hand. Returns
+    whether the order was moved.
+    """
+    with write_transaction():
+        held = _transition(Order.objects.filter(pk=order_id), [Order.PENDING, Order.EXPIRED, Order.CANCELLED],
+                           Order.REVIEW, payment_session_id=session_id)
+        if held:
+            release_stock(order_id)
+    return bool(held)
+
+def cancel_pending_order(user, order_id):
+    """Cancel ``user``'s pending order and give its reserved stock back."""
+    with write_transaction():
+        cancelled = bool(_transition(Order.objects.filter(pk=order_id, user=user), [Order.PENDING], Order.CANCELLED))
+        if cancelled:
+            release_stock(order_id)
+    return cancelled
+
+
+def cancel_other_pending_orders(user, keep=None):
+    """Cancel ``user``'s pending orders (except ``keep``) when a new checkout starts.
+
+    Their stock is given back. Returns the payment session ids of the
+    cancelled orders, whose checkouts should be expired at the provider.
+    """
+    pending = (Order.objects
+               .filter(user=user, status=Order.PENDING)
+               .exclude(pk=keep)
+               .values_list('id', 'payment_session_id'))
+    return [session_id for order_id, session_id in pending
+            if cancel_pending_order(user, order_id) and session_id]
+
+
+def expire_pending_orders(now=None):
+    """Expire every pending order past its ``expires_at``. Returns how many expired.
+
+    Their reserved stock comes back through the reservation sweeper, as the
+    checkout reserves it for the same PENDING_ORDER_TTL.
+    """
+    with write_transaction():
+        return _transition(Order.objects.filter(expires_at__lte=now or timezone.now()), [Order.PENDING],
+                           Order.EXPIRED)
+
+
+# ---------------------------
+# Stock reservation
+# ---------------------------
+
+class OutOfStock(Exception):
+    """Raised when a product (or one of its sizes) does not have enough stock left."""
+
+    def __init__(self, product_id, size=''):
+        self.product_id = product_id
+        self.size = size
+        label = f"Product {product_id}" + (f" size {size}" if size else "")
+        super().__init__(f"{label} is out of stock")
+
+
+def order_quantities(order_id):
+    """Sum an order's item quantities per (product id, size), skipping deleted products."""
+    quantities = defaultdict(int)
+    items = OrderItem.objects.filter(order_id=order_id, product__isnull=False)
+    for product_id, size, qty in items.values_list('product_id', 'size', 'quantity'):
+        quantities[(product_id, size or '')] += qty
+    return dict(quantities)
+
+
+def reserve_stock(order, quantities, expires_at=None):
+    """Reserve ``{(product_id, size): quantity}`` for ``order`` by decrementing stock.
+
+    Lines with a size are taken from that size's ProductVariant; only products
+    that have no variants are taken from Product.stock, so a sized product's
+    line with a missing or unknown size is out of stock. Each row is decremented with a conditional
+    ``UPDATE ... SET stock = stock - n WHERE stock >= n`` so concurrent
+    checkouts can never drive stock negative. If any line is short the whole
+    reservation is rolled back and OutOfStock is raised. The reservation
+    expires at ``expires_at`` (by default STOCK_RESERVATION_TTL from now).
+    """
+    if expires_at is None:
+        expires_at = timezone.now() + timedelta(seconds=getattr(settings, 'STOCK_RESERVATION_TTL', 15 * 60))
+
+    variant_ids = {
+        (pid, size): vid for vid, pid, size in ProductVariant.objects
+        .filter(product_id__in={pid for pid, _ in quantities})
+        .values_list('id', 'product_id', 'size__name')
+    }
+    sized_products = {pid for pid, _ in variant_ids}
+
+    reservations = []
+    with write_transaction():
+        # Fixed row order keeps lock acquisition consistent across checkouts
+        for product_id, size in sorted(quantities):
+            qty = quantities[(product_id, size)]
+            variant_id = variant_ids.get((product_id, size))
+            if variant_id is not None:
+                rows = ProductVariant.objects.filter(pk=variant_id, stock__gte=qty)
+            elif size or product_id in sized_products:
+                raise OutOfStock(product_id, size)
+            else:
+                rows = Product.objects.filter(pk=product_id, stock__gte=qty)
+            if not rows.update(stock=F('stock') - qty):
+                raise OutOfStock(product_id, size)
+            reservations.append(StockReservation(
+                user_id=order.user_id, order=order, product_id=product_id, variant_id=variant_id,
+                quantity=qty, expires_at=expires_at,
+            ))
+        StockReservation.objects.bulk_create(reservations)
+        # Give the stock back promptly if the checkout is abandoned
+        tasks.sweep_expired_reservations.delay_until(expires_at + timedelta(seconds=1))
+
+
+def _restock(reservations):
+    """Delete the given reservations and put their quantity back on the shelf.
+
+    A reservation is only restocked by whoever manages to delete its row, so a
+    cancel racing the expiry sweeper cannot return the same stock twice.
+    """
+    restock = defaultdict(int)
+    with write_transaction():
+        for reservation_id, product_id, variant_id, qty in reservations:
+            deleted, _ = StockReservation.objects.filter(pk=reservation_id).delete()
+            if deleted:
+                restock[(product_id, variant_id or 0)] += qty
+        for product_id, variant_id in sorted(restock):
+            qty = restock[(product_id, variant_id)]
+            if variant_id:
+                ProductVariant.objects.filter(pk=variant_id).update(stock=F('stock') + qty)
+            else:
+                Product.objects.filter(pk=product_id).update(stock=F('stock') + qty)
+    return sum(restock.values())
+
+
+def release_stock(order_id):
+    """Give back the stock reserved for order ``order_id`` (e.g. payment cancelled)."""
+    reservations = list(
+        StockReservation.objects
+        .filter(order_id=order_id)
+        .values_list('id', 'product_id', 'variant_id', 'quantity')
+    )
+    if not reservations:
+        return 0
+    return _restock(reservations)
+
+
+def consume_stock(order_id):
+    """Turn order ``order_id``'s reservations into a sale; the stock stays decremented."""
+    StockReservation.objects.filter(order_id=order_id).delete()
+
+
+def release_expired_stock(now=None):
+    """Release every reservation whose TTL has passed. Returns units restocked."""
+    reservations = list(
+        StockReservation.objects
+        .filter(expires_at__lte=now or timezone.now())
+        .values_list('id', 'product_id', 'variant_id', 'quantity')
+    )
+    if not reservations:
+        return 0
+    return _restock(reservations)
+
+
+# ---------------------------
+# Customer stats
+# ---------------------------
+
+def record_placed_order(order):
+    """Add ``order`` to its customer's CustomerStats; call inside the placing transaction."""
+    stats = CustomerStats.objects.filter(user_id=order.user_id)
+    changes = {
+        'order_count': F('order_count') + 1,
+        'lifetime_spend': F('lifetime_spend') + order.total_amount,
+        'last_order_at': Greatest(Coalesce('last_order_at', order.created_at), order.created_at),
+    }
+    if stats.update(**changes):
+        return
+    try:
+        with transaction.atomic():
+            CustomerStats.objects.create(user_id=order.user_id, order_count=1, lifetime_spend=order.total_amount,
+                                         last_order_at=order.created_at)
+    except IntegrityError:
+        # A concurrent first order of the same customer created the row in between
+        stats.update(**changes)
+
+
+def rebuild_customer_stats():
+    """Recompute every customer's CustomerStats from their orders. Returns the number of customers."""
+    totals = (Order.objects
+              .filter(status__in=[Order.PAID, Order.COD])
+              .values('user_id')
+              .annotate(count=Count('id'), spend=Sum('total_amount'), last=Max('created_at')))
+    with write_transaction():
+        CustomerStats.objects.all().delete()
+        created = CustomerStats.objects.bulk_create([
+            CustomerStats(user_id=row['user_id'], order_count=row['count'], lifetime_spend=row['spend'],
+                          last_order_at=row['last'])
+            for row in totals
+        ])
+    return len(created)
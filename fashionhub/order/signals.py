@@ -0,0 +1,23 @@
+from django.contrib.auth.signals import user_logged_in
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+from . import payments
+from .cart import merge_guest_cart
+
+
+# Carry whatever a guest put in their cart over to their account
+
+@receiver(user_logged_in)
+def merge_cart_on_login(sender, request, user, **kwargs):
+    if request is not None:
+        merge_guest_cart(request, user)
+
+
+# The payment gateway is built once per process from settings; rebuild it
+# when tests or benchmarks override them
+
+@receiver(setting_changed)
+def reset_payment_gateway(sender, setting, **kwargs):
+    if setting.startswith('PAYMENT_') or setting == 'STRIPE_API_KEY':
+        payments.reset_gateway()
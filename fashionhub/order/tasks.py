@@ -0,0 +1,33 @@
+from django.core.mail import send_mail
+from django.template.loader import render_to_string
+
+from taskqueue.queue import task
+
+from . import services
+from .models import Order
+
+
+@task()
+def send_order_confirmation(order_id):
+    """Email the customer a summary of a newly placed order."""
+    order = Order.objects.select_related('user').prefetch_related('items').filter(pk=order_id).first()
+    if order is None or not order.user.email:
+        return
+    send_mail(
+        subject=f"Your FashionHub order #{order.id}",
+        message=render_to_string('order_confirmation_email.txt', {'order': order, 'items': order.items.all()}),
+        from_email=None,
+        recipient_list=[order.user.email],
+    )
+
+
+@task()
+def sweep_expired_reservations():
+    """Return stock held by checkout reservations whose TTL has passed."""
+    services.release_expired_stock()
+
+
+@task()
+def sweep_expired_orders():
+    """Expire pending orders whose payment did not arrive in time."""
+    services.expire_pending_orders()
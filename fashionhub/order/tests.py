@@ -1,3 +1,614 @@
-from django.test import TestCase
+import json
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import OperationalError, connection
+from django.db.models import QuerySet
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from clothes.models import Category, Product, ProductVariant, Size
+from clothes.pagination import encode_cursor
+from taskqueue.models import Job
+from user.models import Address, User
+from .cart import CART_SESSION_KEY, add_item, resolve_cart
+from .models import Cart, CustomerStats, Order, OrderItem, ProcessedEvent, StockReservation
+from .payments import (
+    CircuitBreaker, FakeGateway, GatewayUnavailable, GuardedGateway, PaymentError, get_gateway, reset_gateway,
+)
+from .services import (
+    OutOfStock, _transition, cancel_pending_order, confirm_cod_order, create_pending_order, expire_pending_orders,
+    finalise_paid_order, order_lines, payment_expiry, rebuild_customer_stats, record_placed_order,
+    release_expired_stock, reserve_stock,
+)
+from .tasks import send_order_confirmation
+from .views import LAST_ORDER_SESSION_KEY, ORDERS_PER_PAGE
+from .webhooks import fixture_event, sign_payload
+
+WEBHOOK_SECRET = 'whsec_fashionhub_tests'
+
+
+class CartQueryCountTests(TestCase):
+    """The cart page makes the same number of queries however many lines it has."""
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Tests', slug='tests')
+        cls.products = Product.objects.bulk_create([
+            Product(category=category, name=f'Product {i}', slug=f'product-{i}', price='499.00', stock=10)
+            for i in range(25)
+        ])
+
+    def setUp(self):
+        cache.clear()
+
+    def _cart_page_for(self, lines):
+        user = User.objects.create_user(username=f'cart-{lines}')
+        cart = Cart.objects.create(user=user)
+        for product in self.products[:lines]:
+            add_item(cart, product.id, quantity=2)
+        self.client.force_login(user)
+        # Warm the session and the cached badge count
+        self.client.get(reverse('cart'))
+
+    def test_cart_page_queries_do_not_grow_with_lines(self):
+        self._cart_page_for(1)
+        with CaptureQueriesContext(connection) as one_line:
+            response = self.client.get(reverse('cart'))
+        self.assertEqual(response.status_code, 200)
+        baseline = len(one_line)
+
+        self._cart_page_for(25)
+        with self.assertNumQueries(baseline):
+            response = self.client.get(reverse('cart'))
+        self.assertEqual(len(response.context['cart_items']), 25)
+
+
+class StockContentionTests(TransactionTestCase):
+    """Concurrent checkouts reserving the same size never sell more than is in stock."""
+
+    THREADS = 8
+    ATTEMPTS = 10
+    STOCK = 30
+
+    def test_concurrent_reservations_do_not_oversell(self):
+        category = Category.objects.create(name='Tests', slug='tests')
+        product = Product.objects.create(category=category, name='Contended shirt', slug='contended-shirt',
+                                         price='499.00')
+        variant = ProductVariant.objects.create(product=product, size=Size.objects.create(name='M'),
+                                                stock=self.STOCK)
+        orders = [
+            Order.objects.create(user=User.objects.create_user(username=f'buyer-{i}'), total_amount=0,
+                                 status=Order.PENDING)
+            for i in range(self.THREADS)
+        ]
+        reserved, sold_out, errors = [0] * self.THREADS, [0] * self.THREADS, []
+        start = threading.Barrier(self.THREADS)
+
+        def checkout(index):
+            try:
+                start.wait()
+                for _ in range(self.ATTEMPTS):
+                    try:
+                        reserve_stock(orders[index], {(product.id, 'M'): 1})
+                        reserved[index] += 1
+                    except OutOfStock:
+                        sold_out[index] += 1
+            except OperationalError as exc:
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=checkout, args=(i,)) for i in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        variant.refresh_from_db()
+        self.assertGreaterEqual(variant.stock, 0)
+        self.assertEqual(variant.stock, self.STOCK - sum(reserved))
+        self.assertEqual(StockReservation.objects.filter(variant=variant).count(), sum(reserved))
+        # More attempts than stock: everything sells, and the rest are turned away
+        self.assertEqual(sum(reserved), self.STOCK)
+        self.assertEqual(sum(sold_out), self.THREADS * self.ATTEMPTS - self.STOCK)
+
+
+@skipUnless(connection.vendor == 'sqlite', 'Journal modes are a SQLite setting')
+class SQLiteJournalModeTests(TestCase):
+    """Connecting never converts a database to WAL; only the production deploy command does."""
+
+    def test_connections_keep_the_journal_mode(self):
+        with connection.cursor() as cursor:
+            mode = cursor.execute('PRAGMA journal_mode').fetchone()[0]
+        self.assertNotEqual(mode.lower(), 'wal')
+
+    def test_enable_sqlite_wal_refuses_development_databases(self):
+        with self.assertRaisesMessage(CommandError, 'DJANGO_ENV=production'):
+            call_command('enable_sqlite_wal')
+
+
+class OrderPageQueryTests(TestCase):
+    """Order history, confirmation and detail pages cost the same however long the history is."""
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Tests', slug='tests')
+        cls.products = Product.objects.bulk_create([
+            Product(category=category, name=f'Product {i}', slug=f'product-{i}', price='499.00', stock=10)
+            for i in range(5)
+        ])
+
+    def setUp(self):
+        cache.clear()
+
+    def _customer(self, username, orders, items):
+        user = User.objects.create_user(username=username)
+        address = Address.objects.create(user=user, address1='1 Query Lane', city='Jalandhar', is_primary=True)
+        placed = []
+        for n in range(orders):
+            order = Order.objects.create(user=user, address=address, total_amount=0,
+                                         status=Order.PAID if n % 2 else Order.COD, is_paid=bool(n % 2))
+            OrderItem.objects.bulk_create([
+                OrderItem(order=order, product=product, product_name=product.name, quantity=1,
+                          unit_price=product.price, line_total=product.price)
+                for product in (self.products[(n + i) % len(self.products)] for i in range(items))
+            ])
+            placed.append(order)
+        self.client.force_login(user)
+        session = self.client.session
+        session[LAST_ORDER_SESSION_KEY] = placed[-1].id
+        session.save()
+        return placed
+
+    def _pages(self, placed):
+        return {
+            'orders': reverse('orders'),
+            'order_confirm': reverse('order_confirm'),
+            'order_detail': reverse('order_detail', args=[placed[-1].id]),
+        }
+
+    def test_order_pages_do_not_grow_with_history(self):
+        baseline = {}
+        for name, url in self._pages(self._customer('one-order', 1, 1)).items():
+            self.client.get(url)  # warm the session and the cached badge count
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(self.client.get(url).status_code, 200)
+            baseline[name] = len(queries)
+
+        placed = self._customer('long-history', 3 * ORDERS_PER_PAGE, 5)
+        pages = self._pages(placed)
+        newest_first = sorted(placed, key=lambda o: (o.created_at, o.id), reverse=True)
+        cursor = encode_cursor(newest_first[ORDERS_PER_PAGE - 1], 'next')
+        pages['orders (page 2)'] = f"{reverse('orders')}?cursor={cursor}"
+        for name, url in pages.items():
+            with self.subTest(page=name):
+                self.client.get(url)
+                with self.assertNumQueries(baseline.get(name, baseline['orders'])):
+                    response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+
+
+@override_settings(STRIPE_WEBHOOK_SECRET=WEBHOOK_SECRET)
+class StripeWebhookTests(TestCase):
+    """The bundled checkout.session.completed sample, signed and replayed against the endpoint."""
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Tests', slug='tests')
+        cls.product = Product.objects.create(category=category, name='Webhook shirt', slug='webhook-shirt',
+                                             price='1299.00', stock=5)
+        cls.user = User.objects.create_user(username='webhook', email='webhook@example.com')
+
+    def setUp(self):
+        cart = Cart.objects.create(user=self.user)
+        add_item(cart, self.product.id, quantity=2)
+        cart_items, _ = resolve_cart(cart)
+        self.order = create_pending_order(self.user, order_lines(cart_items))
+        self.order.payment_session_id = 'cs_test_webhook'
+        self.order.save(update_fields=['payment_session_id'])
+        self.event = fixture_event(order_id=self.order.id, session_id=self.order.payment_session_id,
+                                   amount_total=259800)
+        self.body = json.dumps(self.event).encode()
+
+    def _post(self, body, signature):
+        return self.client.post(reverse('stripe_webhook'), body, content_type='application/json',
+                                HTTP_STRIPE_SIGNATURE=signature)
+
+    def test_badly_signed_payloads_are_refused(self):
+        tampered = self.body.replace(b'"amount_total": 259800', b'"amount_total": 100')
+        stale = sign_payload(self.body, WEBHOOK_SECRET, timestamp=int(time.time()) - 3600)
+        refused = {
+            'tampered payload': (tampered, sign_payload(self.body, WEBHOOK_SECRET)),
+            'another secret': (self.body, sign_payload(self.body, 'whsec_wrong')),
+            'hour-old signature': (self.body, stale),
+            'unsigned': (self.body, ''),
+        }
+        for name, (body, signature) in refused.items():
+            with self.subTest(name), self.assertLogs('django.request', 'WARNING'):
+                self.assertEqual(self._post(body, signature).status_code, 400)
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, Order.PENDING)
+        self.assertFalse(ProcessedEvent.objects.exists())
+
+    def test_signed_event_pays_the_order_once(self):
+        last_job = Job.objects.order_by('-id').values_list('id', flat=True).first() or 0
+        self.assertEqual(self._post(self.body, sign_payload(self.body, WEBHOOK_SECRET)).status_code, 200)
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, Order.PAID)
+        self.assertTrue(self.order.is_paid)
+        self.assertEqual(self.order.total_amount, Decimal('2598.00'))
+        self.assertFalse(StockReservation.objects.filter(order=self.order).exists())
+        self.assertEqual(Cart.objects.get(user=self.user).item_count, 0)
+
+        # Stripe redelivers: acknowledged, but nothing happens twice
+        self.assertEqual(self._post(self.body, sign_payload(self.body, WEBHOOK_SECRET)).status_code, 200)
+        self.assertEqual(ProcessedEvent.objects.filter(event_id=self.event['id']).count(), 1)
+        emails = Job.objects.filter(id__gt=last_job, name=send_order_confirmation.task_name)
+        self.assertEqual(emails.count(), 1)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 3)
+
+    def _assert_held_for_review(self, **changes):
+        self.event['data']['object'].update(changes)
+        body = json.dumps(self.event).encode()
+        with self.assertLogs('order.webhooks', 'WARNING'):
+            self.assertEqual(self._post(body, sign_payload(body, WEBHOOK_SECRET)).status_code, 200)
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, Order.REVIEW)
+        self.assertTrue(self.order.is_paid)
+        # Not a sale: the stock goes back and nothing is sent
+        self.assertFalse(StockReservation.objects.filter(order=self.order).exists())
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 5)
+        self.assertFalse(Job.objects.filter(name=send_order_confirmation.task_name).exists())
+
+    def test_payment_of_another_amount_is_held_for_review(self):
+        self._assert_held_for_review(amount_total=100)
+
+    def test_payment_in_another_currency_is_held_for_review(self):
+        self._assert_held_for_review(currency='usd')
+
+
+@override_settings(PAYMENT_GATEWAY='fake')
+class CardCheckoutTests(TestCase):
+    """A re-submitted card checkout goes back to its order's session instead of opening another."""
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Tests', slug='tests')
+        cls.product = Product.objects.create(category=category, name='Card shirt', slug='card-shirt',
+                                             price='999.00', stock=5)
+        cls.user = User.objects.create_user(username='card')
+
+    def setUp(self):
+        reset_gateway()
+        self.addCleanup(reset_gateway)
+        add_item(Cart.objects.create(user=self.user), self.product.id)
+        self.client.force_login(self.user)
+
+    @override_settings(PAYMENT_GATEWAY='stripe', STRIPE_API_KEY='')
+    def test_card_payments_are_off_without_a_stripe_key(self):
+        self.assertIsNone(get_gateway())
+        response = self.client.post(reverse('payment'), {'paymentMethod': 'stripe'})
+        self.assertRedirects(response, reverse('checkout'), fetch_redirect_response=False)
+        self.assertFalse(Order.objects.filter(user=self.user).exists())
+
+    def test_resubmitted_checkout_reuses_its_session(self):
+        first = self.client.post(reverse('payment'), {'paymentMethod': 'stripe'})
+        order = Order.objects.get(user=self.user)
+        self.assertTrue(order.payment_session_id)
+        self.assertIsNotNone(order.payment_expires_at)
+
+        with mock.patch.object(FakeGateway, 'create_checkout', side_effect=AssertionError('opened a second session')):
+            second = self.client.post(reverse('payment'), {'paymentMethod': 'stripe'})
+        self.assertEqual(second.url, first.url)
+        self.assertEqual(Order.objects.filter(user=self.user).count(), 1)
+        # The expiry sent with the order's idempotency key never changes
+        self.assertEqual(payment_expiry(Order.objects.get(pk=order.pk), ttl=60), order.payment_expires_at)
+
+
+class CustomerStatsTests(TestCase):
+    """Placing orders keeps CustomerStats equal to what rebuild_customer_stats computes."""
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Tests', slug='tests')
+        cls.product = Product.objects.create(category=category, name='Stats shirt', slug='stats-shirt',
+                                             price=Decimal('450.00'), stock=20)
+        cls.alice = User.objects.create_user(username='alice')
+        cls.bob = User.objects.create_user(username='bob')
+
+    def _order(self, user, quantity):
+        return create_pending_order(user, [{
+            'product_id': self.product.id, 'name': self.product.name, 'size': '', 'quantity': quantity,
+            'unit_price': self.product.price, 'total_price': self.product.price * quantity,
+        }])
+
+    def _stats(self):
+        return {row[0]: row[1:] for row in CustomerStats.objects.order_by('user_id').values_list(
+            'user_id', 'order_count', 'lifetime_spend', 'last_order_at')}
+
+    def test_running_totals_match_a_rebuild(self):
+        confirm_cod_order(self._order(self.alice, 1).id)
+        finalise_paid_order(self._order(self.alice, 2).id)
+        confirm_cod_order(self._order(self.bob, 3).id)
+        self._order(self.bob, 1)  # still pending: not counted
+        last = Order.objects.filter(user=self.alice, status=Order.PAID).get()
+
+        placed = self._stats()
+        self.assertEqual(placed[self.alice.id], (2, Decimal('1350.00'), last.created_at))
+        self.assertEqual(placed[self.bob.id][:2], (1, Decimal('1350.00')))
+        self.assertEqual(rebuild_customer_stats(), 2)
+        self.assertEqual(self._stats(), placed)
+
+    def test_first_orders_racing_for_the_row_are_both_counted(self):
+        first, second = self._order(self.alice, 1), self._order(self.alice, 2)
+        real_update = QuerySet.update
+        raced = []
+
+        def update_after_the_other_checkout(queryset, **changes):
+            # The other checkout's insert lands between our UPDATE and INSERT
+            if queryset.model is CustomerStats and not raced:
+                raced.append(real_update(queryset, **changes))
+                record_placed_order(first)
+                return raced[0]
+            return real_update(queryset, **changes)
+
+        with mock.patch.object(QuerySet, 'update', update_after_the_other_checkout):
+            record_placed_order(second)
+        stats = CustomerStats.objects.get(user=self.alice)
+        self.assertEqual((stats.order_count, stats.lifetime_spend), (2, Decimal('1350.00')))
+
+
+class OrderStateMachineTests(TestCase):
+    """Orders only move along Order.TRANSITIONS, and each move happens once."""
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Tests', slug='tests')
+        cls.product = Product.objects.create(category=category, name='State shirt', slug='state-shirt',
+                                             price=Decimal('300.00'), stock=4)
+        cls.user = User.objects.create_user(username='states')
+
+    def _order(self, quantity=1, ttl=None):
+        return create_pending_order(self.user, [{
+            'product_id': self.product.id, 'name': self.product.name, 'size': '', 'quantity': quantity,
+            'unit_price': self.product.price, 'total_price': self.product.price * quantity,
+        }], ttl=ttl)
+
+    def _status(self, order):
+        order.refresh_from_db()
+        return order.status
+
+    def _stock(self):
+        self.product.refresh_from_db()
+        return self.product.stock
+
+    def test_new_orders_wait_for_their_payment(self):
+        order = Order.objects.create(user=self.user, total_amount=0)
+        self.assertEqual((order.status, order.is_paid), (Order.PENDING, False))
+
+    def test_cod_confirmation_happens_once(self):
+        order = self._order()
+        self.assertIsNotNone(confirm_cod_order(order.id))
+        self.assertIsNone(confirm_cod_order(order.id))
+        self.assertIsNone(finalise_paid_order(order.id))
+        self.assertFalse(cancel_pending_order(self.user, order.id))
+        self.assertEqual(self._status(order), Order.COD)
+        self.assertEqual(self._stock(), 3)
+
+    def test_cancelling_gives_the_stock_back(self):
+        order = self._order(2)
+        self.assertEqual(self._stock(), 2)
+        self.assertTrue(cancel_pending_order(self.user, order.id))
+        self.assertFalse(cancel_pending_order(self.user, order.id))
+        self.assertIsNone(confirm_cod_order(order.id))
+        self.assertEqual(self._status(order), Order.CANCELLED)
+        self.assertEqual(self._stock(), 4)
+
+    def test_late_payment_becomes_a_sale_while_stock_lasts(self):
+        order = self._order(2)
+        cancel_pending_order(self.user, order.id)
+        self.assertIsNotNone(finalise_paid_order(order.id, 'cs_late'))
+        order.refresh_from_db()
+        self.assertEqual((order.status, order.is_paid, order.payment_session_id), (Order.PAID, True, 'cs_late'))
+        self.assertEqual(self._stock(), 2)
+
+    def test_late_payment_without_stock_is_held_for_review(self):
+        order = self._order(3)
+        cancel_pending_order(self.user, order.id)
+        self._order(2)  # takes the stock back in the meantime
+        with self.assertLogs('order.services', 'WARNING'):
+            self.assertIsNone(finalise_paid_order(order.id))
+        order.refresh_from_db()
+        self.assertEqual((order.status, order.is_paid), (Order.REVIEW, True))
+        self.assertEqual(self._stock(), 2)
+        self.assertIsNone(finalise_paid_order(order.id))
+
+    def test_moves_outside_the_transition_table_are_refused(self):
+        order = self._order()
+        confirm_cod_order(order.id)
+        for from_status, to_status in [(Order.COD, Order.PAID), (Order.PAID, Order.PENDING),
+                                       (Order.REVIEW, Order.PAID), (Order.EXPIRED, Order.COD)]:
+            with self.subTest(f'{from_status} -> {to_status}'), self.assertRaises(ValueError):
+                _transition(Order.objects.filter(pk=order.id), [from_status], to_status)
+        self.assertEqual(self._status(order), Order.COD)
+
+
+class ExpirySweeperTests(TestCase):
+    """expire_pending_orders expires only pending orders past their expiry; their stock comes back."""
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Tests', slug='tests')
+        cls.product = Product.objects.create(category=category, name='Sweeper shirt', slug='sweeper-shirt',
+                                             price=Decimal('300.00'), stock=10)
+        cls.user = User.objects.create_user(username='sweeper')
+
+    def _order(self, ttl):
+        return create_pending_order(self.user, [{
+            'product_id': self.product.id, 'name': self.product.name, 'size': '', 'quantity': 1,
+            'unit_price': self.product.price, 'total_price': self.product.price,
+        }], ttl=ttl)
+
+    def test_sweeper_expires_only_overdue_pending_orders(self):
+        overdue = self._order(ttl=60)
+        paid_in_time = self._order(ttl=60)
+        finalise_paid_order(paid_in_time.id)
+        waiting = self._order(ttl=3600)
+        later = timezone.now() + timedelta(minutes=5)
+
+        self.assertEqual(expire_pending_orders(now=later), 1)
+        self.assertEqual(expire_pending_orders(now=later), 0)
+        statuses = dict(Order.objects.values_list('id', 'status'))
+        self.assertEqual(statuses, {overdue.id: Order.EXPIRED, paid_in_time.id: Order.PAID, waiting.id: Order.PENDING})
+
+        self.assertEqual(release_expired_stock(now=later), 1)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 8)
+        self.assertFalse(StockReservation.objects.filter(order=overdue).exists())
+        self.assertTrue(StockReservation.objects.filter(order=waiting).exists())
+
+    def test_payment_racing_the_sweeper_wins_once(self):
+        order = self._order(ttl=60)
+        later = timezone.now() + timedelta(minutes=5)
+        self.assertEqual(expire_pending_orders(now=later), 1)
+        self.assertIsNotNone(finalise_paid_order(order.id))
+        self.assertEqual(expire_pending_orders(now=later), 0)
+        order.refresh_from_db()
+        self.assertEqual(order.status, Order.PAID)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class CircuitBreakerTests(SimpleTestCase):
+    """The breaker opens on provider failures, lets one probe through after the reset time and closes on success."""
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.breaker = CircuitBreaker(failures=3, reset_after=30, clock=self.clock)
+        self.fake = FakeGateway()
+        self.gateway = GuardedGateway(self.fake, self.breaker)
+
+    def _checkout(self, key='checkout-1'):
+        return self.gateway.create_checkout(
+            line_items=[{'price_data': {'unit_amount': 49900}, 'quantity': 1}],
+            success_url='http://testserver/order/payment/success/', cancel_url='http://testserver/order/payment/cancel/',
+            idempotency_key=key, expires_at=timezone.now() + timedelta(minutes=35),
+        )
+
+    def _trip(self):
+        self.fake.failure_rate = 1.0
+        for _ in range(3):
+            with self.assertRaisesMessage(GatewayUnavailable, 'Fake gateway outage'):
+                self._checkout()
+        self.fake.failure_rate = 0.0
+
+    def test_outages_open_the_breaker(self):
+        self._trip()
+        self.assertFalse(self.gateway.available)
+        # The provider is back, but calls are refused without reaching it until the reset time
+        with mock.patch.object(self.fake, 'create_checkout') as create:
+            with self.assertRaisesMessage(GatewayUnavailable, 'paused'):
+                self._checkout()
+            self.clock.now += 29
+            with self.assertRaisesMessage(GatewayUnavailable, 'paused'):
+                self._checkout()
+        create.assert_not_called()
+
+    def test_successful_probe_closes_the_breaker(self):
+        self._trip()
+        self.clock.now += 30
+        self.assertTrue(self.gateway.available)
+        self.assertTrue(self.breaker.allow())
+        # Only one probe at a time while half-open
+        self.assertFalse(self.breaker.allow())
+        self.breaker.record_success()
+        self._checkout('after-probe')
+        self._checkout('and-again')
+        self.assertTrue(self.gateway.available)
+
+    def test_failed_probe_opens_the_breaker_again(self):
+        self._trip()
+        self.clock.now += 30
+        self.fake.failure_rate = 1.0
+        with self.assertRaisesMessage(GatewayUnavailable, 'Fake gateway outage'):
+            self._checkout()
+        self.fake.failure_rate = 0.0
+        self.assertFalse(self.gateway.available)
+        with self.assertRaisesMessage(GatewayUnavailable, 'paused'):
+            self._checkout()
+
+    def test_card_declines_do_not_trip_the_breaker(self):
+        with mock.patch.object(self.fake, 'create_checkout', side_effect=PaymentError('Your card was declined.')):
+            for _ in range(5):
+                with self.assertRaisesMessage(PaymentError, 'declined'):
+                    self._checkout()
+        self.assertTrue(self.gateway.available)
+        self.assertTrue(self._checkout().id.startswith('cs_fake_'))
+
+    def test_slow_successes_count_as_failures(self):
+        self.gateway.slow_call = 0.0
+        self.fake.latency = 0.001
+        for n in range(3):
+            self._checkout(f'slow-{n}')
+        self.assertFalse(self.gateway.available)
+
+
+class GuestCartMergeTests(TestCase):
+    """Logging in folds the guest's cart into the account's cart."""
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Tests', slug='tests')
+        cls.shirt = Product.objects.create(category=category, name='Merge shirt', slug='merge-shirt', price='799.00')
+        for size in ('M', 'L'):
+            ProductVariant.objects.create(product=cls.shirt, size=Size.objects.create(name=size), stock=10)
+        cls.cap = Product.objects.create(category=category, name='Merge cap', slug='merge-cap', price='299.00',
+                                         stock=10)
+        cls.user = User.objects.create_user(username='merger', password='merge-pass-123')
+
+    def _shop_as_guest(self, *lines):
+        for product, size in lines:
+            self.client.post(reverse('cart_add', args=[product.id]), {'size': size})
+        return self.client.session[CART_SESSION_KEY]
+
+    def _lines(self, cart):
+        return {(line.product_id, line.size): line.quantity for line in cart.lines.all()}
+
+    def test_guest_lines_are_merged_into_the_account_cart(self):
+        own = Cart.objects.create(user=self.user)
+        add_item(own, self.shirt.id, 'M', quantity=2)
+        add_item(own, self.cap.id)
+        guest_id = self._shop_as_guest((self.shirt, 'M'), (self.shirt, 'L'), (self.shirt, 'L'))
+
+        self.assertTrue(self.client.login(username='merger', password='merge-pass-123'))
+        cart = Cart.objects.get(user=self.user)
+        self.assertEqual(cart.id, own.id)
+        # Same product and size: quantities summed; the rest moved over
+        self.assertEqual(self._lines(cart), {(self.shirt.id, 'M'): 3, (self.shirt.id, 'L'): 2, (self.cap.id, ''): 1})
+        self.assertEqual(cart.item_count, 6)
+        self.assertFalse(Cart.objects.filter(pk=guest_id).exists())
+        self.assertEqual(self.client.session[CART_SESSION_KEY], cart.id)
+
+    def test_guest_cart_becomes_the_account_cart(self):
+        guest_id = self._shop_as_guest((self.cap, ''), (self.shirt, 'L'))
+        self.assertTrue(self.client.login(username='merger', password='merge-pass-123'))
+        cart = Cart.objects.get(user=self.user)
+        self.assertEqual(cart.id, guest_id)
+        self.assertEqual(self._lines(cart), {(self.cap.id, ''): 1, (self.shirt.id, 'L'): 1})
@@ -1,8 +1,10 @@
 from .import views
+from django.conf import settings
 from django.urls import path
 
 urlpatterns = [
-    path('cart/', views.cart, name='cart'),
+    # ASGI deployments get the async variant (see fashionhub/asgi.py)
+    path('cart/', views.cart_async if settings.ASYNC_VIEWS else views.cart, name='cart'),
     path('cart/add/<int:product_id>/', views.cart_add, name='cart_add'),
     path('checkout/', views.checkout, name='checkout'),
     path('cart/update/<int:product_id>/', views.cart_update, name='cart_update'),
@@ -12,6 +14,8 @@ urlpatterns = [
     path('payment/', views.payment_process, name='payment'),
     path('payment/success/', views.payment_success, name='payment_success'),
     path('payment/cancel/', views.payment_cancel, name='payment_cancel'),
+    path('payment/webhook/', views.stripe_webhook, name='stripe_webhook'),
+    path('payment/fake-checkout/', views.payment_fake_checkout, name='payment_fake_checkout'),
     path('confirm/', views.order_confirm, name='order_confirm'),
     path('orders/', views.orders, name='orders'),
     path('orders/<int:order_id>/', views.order_detail, name='order_detail'),
@@ -1,70 +1,73 @@
+import logging
+
 from django.shortcuts import render, get_object_or_404, redirect
+from django.conf import settings
 from django.contrib import messages
-from clothes.models import Product
+from django.http import Http404, HttpResponse, HttpResponseBadRequest
+from django.utils.http import url_has_allowed_host_and_scheme
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_http_methods, require_POST
+from clothes.models import Product, ProductVariant
 from django.contrib.auth.decorators import login_required
-from django.conf import settings
 from django.urls import reverse
 from user.models import Address
-import stripe
 from django.utils import timezone
-from datetime import datetime
+from django.db.models import Prefetch
+from clothes.models import primary_image_prefetch
+from clothes.pagination import CursorPaginator
 from .models import Order, OrderItem
-
-# ---------------------------
-# Helper: manage session cart
-# ---------------------------
-
-def get_cart(request):
-    """Retrieve cart dictionary from session."""
-    return request.session.get('cart', {})
-
-def save_cart(request, cart):
-    """Save the updated cart to session."""
-    request.session['cart'] = cart
-    request.session.modified = True
-
+from fashionhub.shortcuts import arender
+from .cart import (
+    add_item, aget_cart, aresolve_cart, change_size, get_cart, line_quantity,
+    remove_item, resolve_cart, set_quantity,
+)
+from .payments import CHECKOUT_CURRENCY, GatewayUnavailable, PaymentError, get_gateway, idempotency_key
+from .services import (
+    OutOfStock, cancel_other_pending_orders, cancel_pending_order, confirm_cod_order, create_pending_order,
+    order_lines, payment_expiry,
+)
+from .webhooks import InvalidPayload, handle_event, parse_event, signed_fixture
+
+logger = logging.getLogger(__name__)
 
 # ---------------------------
 # Cart Views
 # ---------------------------
 
 def cart(request):
-    cart_data = get_cart(request)
-    cart_items = []
-    grand_total = 0
-    for key, qty in cart_data.items():
-        # key format: "<product_id>:<size>"
-        parts = key.split(':', 1)
-        try:
-            pid = int(parts[0])
-        except (ValueError, IndexError):
-            continue
-        size = parts[1] if len(parts) > 1 and parts[1] != '' else None
-        try:
-            product = Product.objects.get(id=pid)
-        except Product.DoesNotExist:
-            continue
-        total_price = product.price * qty
-        grand_total += total_price
-        cart_items.append({
-            'product': product,
-            'quantity': qty,
-            'total_price': total_price,
-            'size': size
-        })
-
+    cart_items, grand_total = resolve_cart(get_cart(request))
     return render(request, 'cart.html', {'cart_items': cart_items, 'grand_total': grand_total})
 
 
+async def cart_async(request):
+    # Served instead of cart() when settings.ASYNC_VIEWS is on
+    cart_items, grand_total = await aresolve_cart(await aget_cart(request))
+    return await arender(request, 'cart.html', {'cart_items': cart_items, 'grand_total': grand_total})
+
+
 def cart_add(request, product_id):
     if request.method != 'POST':
         return redirect('product_list')
-    product = get_object_or_404(Product, id=product_id, is_available=True)
-    cart_data = get_cart(request)
     size = request.POST.get('size', '')
-    key = f"{product_id}:{size}"
-    cart_data[key] = cart_data.get(key, 0) + 1
-    save_cart(request, cart_data)
+    user_cart = get_cart(request)
+    # Sized products: one indexed lookup gives both the product and its stock in that size
+    variant = (ProductVariant.objects
+               .select_related('product')
+               .filter(product_id=product_id, product__is_available=True, size__name=size)
+               .first()) if size else None
+    if variant is not None:
+        product = variant.product
+        if line_quantity(user_cart, product_id, size) + 1 > variant.stock:
+            messages.error(request, f"Sorry, {product.name} in size {size} is out of stock.")
+            return redirect(request.META.get('HTTP_REFERER', 'product_list'))
+    else:
+        product = get_object_or_404(Product, id=product_id, is_available=True)
+        # Sized products are only sold in one of their sizes, never off Product.stock
+        if size or product.variants.exists():
+            messages.error(request, f"Please choose one of the available sizes for {product.name}.")
+            return redirect(request.META.get('HTTP_REFERER', 'product_list'))
+    user_cart = user_cart or get_cart(request, create=True)
+    add_item(user_cart, product.id, size)
     messages.success(request, f"Added {product.name} to cart")
     return redirect(request.META.get('HTTP_REFERER', 'product_list'))
 
@@ -72,12 +75,9 @@ def cart_add(request, product_id):
 def cart_remove(request, product_id):
     if request.method != 'POST':
         return redirect('cart')
-    cart_data = get_cart(request)
     size = request.POST.get('size', '')
-    key = f"{product_id}:{size}"
-    if key in cart_data:
-        del cart_data[key]
-        save_cart(request, cart_data)
+    user_cart = get_cart(request)
+    if user_cart is not None and remove_item(user_cart, product_id, size):
         messages.success(request, 'Item removed from cart')
     return redirect('cart')
 
@@ -89,18 +89,12 @@ def cart_update(request, product_id):
     product = get_object_or_404(Product, id=product_id)
     quantity = int(request.POST.get('quantity', 1))
     size = request.POST.get('size', '')
-    key = f"{product_id}:{size}"
-    cart_data = get_cart(request)
-
-    if quantity > 0:
-        cart_data[key] = quantity
-        messages.info(request, f"Updated quantity of {product.name}")
-    else:
-        if key in cart_data:
-            del cart_data[key]
+    user_cart = get_cart(request)
+    if user_cart is not None and set_quantity(user_cart, product_id, size, quantity):
+        if quantity > 0:
+            messages.info(request, f"Updated quantity of {product.name}")
+        else:
             messages.info(request, f"Removed {product.name} from cart")
-
-    save_cart(request, cart_data)
     return redirect('cart')
 
 
@@ -109,18 +103,15 @@ def cart_update_size(request, product_id):
     if request.method != 'POST':
         return redirect('cart')
 
-    cart = request.session.get('cart', {})
     old_size = request.POST.get('old_size', '')
     new_size = request.POST.get('size', '')
-
-    old_key = f"{product_id}:{old_size}"
-    new_key = f"{product_id}:{new_size}"
-
-    if old_key in cart:
-        qty = cart.pop(old_key)  # remove old key and get quantity
-        cart[new_key] = qty      # re-add under new key
-        request.session['cart'] = cart
-        request.session.modified = True
+    variants = ProductVariant.objects.filter(product_id=product_id)
+    # Only an existing size of the product, or no size for a product without sizes
+    if (not variants.filter(size__name=new_size).exists()) if new_size else variants.exists():
+        messages.error(request, 'Please choose one of the available sizes.')
+        return redirect('cart')
+    user_cart = get_cart(request)
+    if user_cart is not None and change_size(user_cart, product_id, old_size, new_size):
         messages.success(request, 'Product size updated successfully.')
 
     return redirect('cart')
@@ -129,278 +120,283 @@ def cart_update_size(request, product_id):
 
 @login_required
 def checkout(request):
-    cart = request.session.get('cart', {})
-    cart_items = []
-    cart_total = 0
-
-    for key, qty in cart.items():
-        pid, *rest = key.split(':')
-        size = rest[0] if rest else ''
-        product = Product.objects.get(id=pid)
-        total_price = product.price * qty
-        cart_total += total_price
-        cart_items.append({
-            'product': product,
-            'quantity': qty,
-            'total_price': total_price,
-            'size': size
-        })
+    cart_items, cart_total = resolve_cart(get_cart(request))
 
-    addresses = Address.objects.filter(user=request.user)
+    addresses = Address.objects.filter(user=request.user).order_by('-is_primary', '-id')
+    gateway = get_gateway()
 
     return render(request, 'checkout.html', {
         'cart_items': cart_items,
         'cart_total': cart_total,
-        'addresses': addresses
+        'addresses': addresses,
+        'card_payments_available': gateway is not None and gateway.available,
     })
 
+PENDING_ORDER_SESSION_KEY = 'pending_order_id'
+LAST_ORDER_SESSION_KEY = 'last_order_id'
+
+
+def _reusable_pending_order(request, items, address, payment_method):
+    """The pending order of a re-submitted checkout (double click, browser retry),
+    if its contents are unchanged."""
+    order = (Order.objects
+             .filter(pk=request.session.get(PENDING_ORDER_SESSION_KEY), user=request.user,
+                     status=Order.PENDING, expires_at__gt=timezone.now())
+             .first())
+    if order is None or order.address_id != getattr(address, 'id', None):
+        return None
+    # An order already sent to the card provider could still be paid there
+    if payment_method == 'cod' and order.payment_session_id:
+        return None
+    # Its checkout session has closed; a replayed one could not be paid
+    if order.payment_expires_at is not None and order.payment_expires_at <= timezone.now():
+        return None
+    lines = sorted(order.items.values_list('product_id', 'size', 'quantity', 'unit_price'))
+    wanted = sorted((it['product_id'], it['size'], it['quantity'], it['unit_price']) for it in items)
+    return order if lines == wanted else None
+
+
+def _expire_checkouts(session_ids):
+    """Close the provider checkouts of cancelled orders, so they can no longer be paid.
+
+    Best effort: a payment that still gets through is handled by
+    finalise_paid_order.
+    """
+    if not session_ids:
+        return
+    gateway = get_gateway()
+    for session_id in session_ids:
+        try:
+            if gateway is None:
+                raise GatewayUnavailable('Card payments are not configured')
+            gateway.expire_checkout(session_id)
+        except PaymentError as exc:
+            logger.warning("Could not expire checkout session %s: %s", session_id, exc)
+
+
 @login_required
 def payment_process(request):
     # Only accept POST from checkout
     if request.method != 'POST':
         return redirect('checkout')
 
-    cart = request.session.get('cart', {})
-    if not cart:
+    # Build cart summary
+    user_cart = get_cart(request)
+    cart_items, cart_total = resolve_cart(user_cart)
+    if not cart_items:
         messages.error(request, 'Your cart is empty.')
         return redirect('cart')
 
-    # Build cart summary
-    cart_items = []
-    cart_total = 0
-    for key, qty in cart.items():
-        pid, *rest = key.split(':')
-        size = rest[0] if rest else ''
-        product = get_object_or_404(Product, id=int(pid))
-        total_price = product.price * qty
-        cart_total += total_price
-        cart_items.append({
-            'product': product,
-            'quantity': qty,
-            'total_price': total_price,
-            'size': size
-        })
-
     payment_method = request.POST.get('paymentMethod')
+    if payment_method not in ('stripe', 'cod'):
+        messages.error(request, 'Invalid payment method selected.')
+        return redirect('checkout')
+
+    gateway = get_gateway() if payment_method == 'stripe' else None
+    if payment_method == 'stripe' and gateway is None:
+        messages.error(request, 'Payment is temporarily unavailable. Please try Cash on Delivery or try again later.')
+        return redirect('checkout')
+
     # capture selected address (optional)
     selected_address_id = request.POST.get('selected_address')
     address_obj = None
     if selected_address_id:
+        address_obj = Address.objects.filter(id=selected_address_id, user=request.user).first()
+
+    # The checkout becomes a pending order; only its id goes in the session
+    items = order_lines(cart_items)
+    order = _reusable_pending_order(request, items, address_obj, payment_method)
+    # A new checkout replaces any earlier one still waiting for its payment,
+    # on this device or another, and gives its stock back
+    _expire_checkouts(cancel_other_pending_orders(request.user, keep=getattr(order, 'id', None)))
+    if order is None:
+        # The order holds its stock before handing off to payment, so
+        # concurrent checkouts can't oversell, for as long as it waits
         try:
-            address_obj = Address.objects.get(id=selected_address_id, user=request.user)
-        except Address.DoesNotExist:
-            address_obj = None
-
-    # Build a pending order snapshot in session so we can show confirmation
-    order_id = timezone.now().strftime('FH%Y%m%d%H%M%S') + f"-{request.user.id}"
-    pending_order = {
-        'order_id': order_id,
-        'items': [
-            {
-                'product_id': i['product'].id,
-                'name': i['product'].name,
-                'size': i['size'] or '',
-                'quantity': int(i['quantity']),
-                'unit_price': float(i['product'].price),
-                'total_price': float(i['total_price']),
-            } for i in cart_items
-        ],
-        'total': float(cart_total),
-        'address': {
-            'address1': getattr(address_obj, 'address1', None),
-            'address2': getattr(address_obj, 'address2', None),
-            'city': getattr(address_obj, 'city', None),
-            'state': getattr(address_obj, 'state', None),
-            'pincode': getattr(address_obj, 'pincode', None),
-        } if address_obj else None,
-        'placed_at': timezone.now().isoformat(),
-    }
-    request.session['pending_order'] = pending_order
-    request.session.modified = True
-    if payment_method == 'stripe':
-        # Create a Stripe Checkout Session for simple redirect-based payment
-        stripe.api_key = getattr(settings, 'STRIPE_API_KEY', None)
-        if not stripe.api_key:
-            messages.error(request, 'Payment is temporarily unavailable. Please try Cash on Delivery or try again later.')
-            return redirect('checkout')
-
-        line_items = []
-        for item in cart_items:
-            unit_amount = int(float(item['product'].price) * 100)  # INR in paise
-            if unit_amount < 1:
-                unit_amount = 1
-            name = f"{item['product'].name}"
-            if item['size']:
-                name += f" (Size: {item['size'].upper()})"
-            line_items.append({
-                'price_data': {
-                    'currency': 'inr',
-                    'product_data': {'name': name},
-                    'unit_amount': unit_amount,
-                },
-                'quantity': int(item['quantity']),
-            })
+            order = create_pending_order(request.user, items, address=address_obj)
+        except OutOfStock as e:
+            name = next(i.product.name for i in cart_items if i.product.id == e.product_id)
+            if e.size:
+                name += f' (Size: {e.size.upper()})'
+            messages.error(request, f'Sorry, {name} does not have enough stock left for your order.')
+            return redirect('cart')
+    request.session[PENDING_ORDER_SESSION_KEY] = order.id
+
+    if payment_method == 'cod':
+        confirm_cod_order(order.id)
+        request.session[LAST_ORDER_SESSION_KEY] = order.id
+        request.session.pop(PENDING_ORDER_SESSION_KEY, None)
+        messages.success(request, 'Order placed successfully! Pay on delivery.')
+        return redirect('order_confirm')
 
-        try:
-            # Build absolute URLs for success/cancel
-            success_url = request.build_absolute_uri(reverse('payment_success'))
-            cancel_url = request.build_absolute_uri(reverse('payment_cancel'))
+    line_items = []
+    for item in cart_items:
+        unit_amount = max(int(item.product.price * 100), 1)  # INR in paise
+        name = f"{item.product.name}"
+        if item.size:
+            name += f" (Size: {item.size.upper()})"
+        line_items.append({
+            'price_data': {
+                'currency': CHECKOUT_CURRENCY,
+                'product_data': {'name': name},
+                'unit_amount': unit_amount,
+            },
+            'quantity': item.quantity,
+        })
 
-            session = stripe.checkout.Session.create(
-                payment_method_types=['card'],
-                mode='payment',
+    try:
+        if order.payment_session_id:
+            # A re-submitted checkout goes back to the session opened for the order
+            session = gateway.retrieve_checkout(order.payment_session_id)
+        else:
+            session = gateway.create_checkout(
                 line_items=line_items,
-                success_url=success_url,
-                cancel_url=cancel_url,
+                # Stripe fills in {CHECKOUT_SESSION_ID} itself
+                success_url=request.build_absolute_uri(reverse('payment_success')) + '?session_id={CHECKOUT_SESSION_ID}',
+                cancel_url=request.build_absolute_uri(reverse('payment_cancel')),
+                idempotency_key=idempotency_key(request.user.id, order.id),
+                expires_at=payment_expiry(order),
+                client_reference_id=str(order.id),
+                metadata={'order_id': str(order.id), 'user_id': str(request.user.id)},
             )
-            return redirect(session.url)
-        except Exception as e:
+    except PaymentError as e:
+        # During an outage an order already sent to the provider may still be
+        # paid there, so it keeps its stock. Otherwise it was never sent, or its
+        # session can no longer be paid: the stock goes back (a payment that got
+        # through anyway is handled by finalise_paid_order).
+        if not order.payment_session_id or not isinstance(e, GatewayUnavailable):
+            cancel_pending_order(request.user, order.id)
+            request.session.pop(PENDING_ORDER_SESSION_KEY, None)
+        if isinstance(e, GatewayUnavailable):
+            messages.error(request, 'Card payments are unavailable right now. Please choose Cash on Delivery or try again in a few minutes.')
+        else:
             messages.error(request, f'Unable to start payment: {e}')
-            return redirect('checkout')
-
-    elif payment_method == 'cod':
-        # Read pending snapshot first (created above)
-        pending = request.session.get('pending_order')
-
-        # Place order in DB as unpaid
-        order = Order.objects.create(
-            user=request.user,
-            total_amount=cart_total,
-            is_paid=False,
-        )
-        # Create order items from pending snapshot
-        if pending and pending.get('items'):
-            for it in pending['items']:
-                prod = None
-                pid = it.get('product_id')
-                if pid:
-                    try:
-                        prod = Product.objects.get(id=pid)
-                    except Product.DoesNotExist:
-                        prod = None
-                OrderItem.objects.create(
-                    order=order,
-                    product=prod,
-                    product_name=it.get('name', ''),
-                    size=it.get('size') or '',
-                    quantity=int(it.get('quantity', 1)),
-                    unit_price=it.get('unit_price', 0) or 0,
-                    line_total=it.get('total_price', 0) or 0,
-                )
-        # enrich and move pending->last_order, clear cart and go to confirm page
-        if pending is None:
-            pending = {}
-        pending['db_id'] = order.id
-        request.session['last_order'] = pending
-        request.session['pending_order'] = None
-        request.session['cart'] = {}
-        request.session.modified = True
-        messages.success(request, 'Order placed successfully! Pay on delivery.')
-        return redirect('order_confirm')
-    else:
-        messages.error(request, 'Invalid payment method selected.')
         return redirect('checkout')
+    Order.objects.filter(pk=order.id).update(payment_session_id=session.id)
+    return redirect(session.url)
 
 
 @login_required
 def payment_success(request):
-    # Create paid order record in DB and move pending order to last_order
-    pending = request.session.get('pending_order')
-    total = 0
-    try:
-        total = float(pending.get('total', 0)) if pending else 0
-    except Exception:
-        total = 0
-    order = Order.objects.create(
-        user=request.user,
-        total_amount=total,
-        is_paid=True,
-    )
-    # Create order items
-    if pending and pending.get('items'):
-        for it in pending['items']:
-            prod = None
-            pid = it.get('product_id')
-            if pid:
-                try:
-                    prod = Product.objects.get(id=pid)
-                except Product.DoesNotExist:
-                    prod = None
-            OrderItem.objects.create(
-                order=order,
-                product=prod,
-                product_name=it.get('name', ''),
-                size=it.get('size') or '',
-                quantity=int(it.get('quantity', 1)),
-                unit_price=it.get('unit_price', 0) or 0,
-                line_total=it.get('total_price', 0) or 0,
-            )
-    if pending is None:
-        pending = {}
-    pending['db_id'] = order.id
-    request.session['last_order'] = pending
-    request.session['pending_order'] = None
-    request.session['cart'] = {}
-    request.session.modified = True
-    messages.success(request, 'Payment successful! Thank you for your order.')
+    """Where the shopper lands after paying; the order itself is finalised by the webhook."""
+    order = (Order.objects
+             .filter(user=request.user, payment_session_id=request.GET.get('session_id') or None)
+             .only('id', 'status')
+             .first())
+    if order is None:
+        messages.error(request, 'We could not find that payment. Your orders are listed below.')
+        return redirect('orders')
+    request.session[LAST_ORDER_SESSION_KEY] = order.id
+    request.session.pop(PENDING_ORDER_SESSION_KEY, None)
+    if order.status == Order.PAID:
+        messages.success(request, 'Payment successful! Thank you for your order.')
+    else:
+        messages.info(request, 'Thank you! We are confirming your payment with the bank; your order will update shortly.')
     return redirect('order_confirm')
 
 
 @login_required
 def payment_cancel(request):
+    order_id = request.session.pop(PENDING_ORDER_SESSION_KEY, None)
+    if order_id and cancel_pending_order(request.user, order_id):
+        session_id = Order.objects.filter(pk=order_id).values_list('payment_session_id', flat=True).first()
+        _expire_checkouts([session_id] if session_id else [])
     messages.info(request, 'Payment was canceled. You can try again or choose Cash on Delivery.')
     return redirect('checkout')
 
 
+@csrf_exempt
+@require_POST
+def stripe_webhook(request):
+    """Stripe event endpoint; only correctly signed events are applied."""
+    try:
+        event = parse_event(request.body, request.META.get('HTTP_STRIPE_SIGNATURE'), settings.STRIPE_WEBHOOK_SECRET)
+    except InvalidPayload:
+        return HttpResponseBadRequest('Invalid signature')
+    handle_event(event)
+    # Duplicates are acknowledged too, or Stripe would keep redelivering them
+    return HttpResponse(status=200)
+
+
+@login_required
+@require_http_methods(['GET', 'POST'])
+def payment_fake_checkout(request):
+    """The fake gateway's "payment page".
+
+    Shows the shopper's pending order; paying (a POST) delivers a signed
+    checkout.session.completed event for it, as Stripe would, and sends the
+    shopper on.
+    """
+    if settings.PAYMENT_GATEWAY != 'fake':
+        raise Http404
+    data = request.POST if request.method == 'POST' else request.GET
+    order = get_object_or_404(Order, user=request.user, status=Order.PENDING,
+                              payment_session_id=data.get('session_id') or None)
+    # The amount the provider would charge, in paise, must be the order's total
+    try:
+        amount = int(data.get('amount', ''))
+    except ValueError:
+        amount = None
+    if amount != int(order.total_amount * 100):
+        return HttpResponseBadRequest('Amount does not match the order')
+    next_url = data.get('next', '')
+    if not url_has_allowed_host_and_scheme(next_url, allowed_hosts={request.get_host()}):
+        next_url = reverse('orders')
+    if request.method != 'POST':
+        return render(request, 'fake_checkout.html', {'order': order, 'amount': amount, 'next': next_url})
+
+    body, signature = signed_fixture(
+        settings.STRIPE_WEBHOOK_SECRET,
+        order_id=order.id,
+        session_id=order.payment_session_id,
+        amount_total=amount,
+    )
+    handle_event(parse_event(body, signature, settings.STRIPE_WEBHOOK_SECRET))
+    return redirect(next_url)
+
+
+ORDERS_PER_PAGE = 10
+
+
+def _items_with_primary_image():
+    """Prefetches for an order's items: their products in the same query as the
+    items, plus only each product's primary image."""
+    return (
+        Prefetch('items', queryset=OrderItem.objects.select_related('product').order_by('id')),
+        primary_image_prefetch('items__product__images'),
+    )
+
+
 @login_required
 def order_confirm(request):
-    last_order = request.session.get('last_order')
-    if not last_order:
+    order = (Order.objects
+             .filter(pk=request.session.get(LAST_ORDER_SESSION_KEY), user=request.user)
+             .select_related('address')
+             .prefetch_related(*_items_with_primary_image())
+             .first())
+    if order is None:
         messages.info(request, 'No recent order to show.')
         return redirect('home')
-    # Parse placed_at (ISO string) to datetime so template can format nicely
-    placed_iso = last_order.get('placed_at') if isinstance(last_order, dict) else None
-    if placed_iso:
-        try:
-            iso = placed_iso.replace('Z', '+00:00')
-            dt = datetime.fromisoformat(iso)
-            if timezone.is_naive(dt):
-                dt = timezone.make_aware(dt, timezone.get_current_timezone())
-            last_order['placed_at_dt'] = dt
-        except Exception:
-            # leave as-is; template will fallback to raw string
-            pass
-    
-    # Enrich items with product objects for image display
-    items_with_products = []
-    for item in last_order.get('items', []):
-        product_obj = None
-        if 'product_id' in item:
-            try:
-                product_obj = Product.objects.get(id=item['product_id'])
-            except Product.DoesNotExist:
-                pass
-        items_with_products.append({
-            **item,
-            'product': product_obj
-        })
-    last_order['items_enriched'] = items_with_products
-    
-    # We can keep last_order for the page refresh; optionally clear it after render
     return render(request, 'orderconfirm.html', {
-        'order': last_order,
+        'order': order,
     })
 
 
 @login_required
 def orders(request):
-    """List all orders placed by the current user, newest first."""
+    """List the current user's orders, newest first, a page at a time.
+
+    Pages are keyset-paginated on (created_at, id), so a long history costs
+    the same per page as a short one.
+    """
     user_orders = (Order.objects
                    .filter(user=request.user)
-                   .order_by('-created_at')
-                   .prefetch_related('items', 'items__product', 'items__product__images'))
+                   .filter(status__in=[Order.PAID, Order.COD, Order.REVIEW])
+                   .prefetch_related(*_items_with_primary_image()))
+    page_obj = CursorPaginator(user_orders, ORDERS_PER_PAGE).get_page(request.GET.get('cursor'))
     return render(request, 'orders.html', {
-        'orders': user_orders,
+        'orders': page_obj,
+        'page_obj': page_obj,
     })
 
 
@@ -408,9 +404,8 @@ def orders(request):
 def order_detail(request, order_id):
     """Show detailed view of a single order."""
     order = get_object_or_404(Order, id=order_id, user=request.user)
-    items = order.items.select_related('product').prefetch_related('product__images').all()
+    items = order.items.select_related('product').prefetch_related(primary_image_prefetch('product__images')).all()
     return render(request, 'order_detail.html', {
         'order': order,
         'items': items,
     })
-
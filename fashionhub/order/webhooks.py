@@ -0,0 +1,126 @@
+import copy
+import hashlib
+import hmac
+import json
+import logging
+import time
+import uuid
+from functools import lru_cache
+from pathlib import Path
+
+import stripe
+from django.db import IntegrityError, transaction
+
+from fashionhub.db import write_transaction
+from .models import Order, ProcessedEvent
+from .payments import CHECKOUT_CURRENCY
+from .services import finalise_paid_order, hold_paid_order_for_review
+
+logger = logging.getLogger(__name__)
+
+FIXTURE = Path(__file__).resolve().parent / 'testdata' / 'checkout_session_completed.json'
+
+
+# ---------------------------
+# Stripe webhooks
+# ---------------------------
+#
+# Card orders are written as pending before the shopper leaves for Stripe and
+# are only marked paid here, when Stripe reports the completed checkout. Every
+# event is recorded in ProcessedEvent in the same transaction as its effect:
+# Stripe delivers at least once, and a redelivered event finds its row already
+# there and is skipped. A payment whose amount or currency is not the order's
+# total puts the order on hold for review instead of placing it.
+
+class InvalidPayload(Exception):
+    """The request is not a correctly signed, well-formed Stripe event."""
+
+
+def sign_payload(payload, secret, timestamp=None):
+    """Stripe-Signature header value for ``payload``, as Stripe would send it."""
+    timestamp = int(time.time()) if timestamp is None else timestamp
+    if isinstance(payload, bytes):
+        payload = payload.decode()
+    # Stripe's scheme: HMAC-SHA256 of "<timestamp>.<body>" keyed with the secret
+    signature = hmac.new(secret.encode(), f"{timestamp}.{payload}".encode(), hashlib.sha256).hexdigest()
+    return f"t={timestamp},v1={signature}"
+
+
+def parse_event(payload, signature, secret, tolerance=300):
+    """Verify ``signature`` against the raw request body and return the event dict."""
+    if not secret:
+        raise InvalidPayload('No webhook signing secret is configured')
+    if isinstance(payload, bytes):
+        payload = payload.decode('utf-8', errors='replace')
+    try:
+        stripe.WebhookSignature.verify_header(payload, signature or '', secret, tolerance)
+        event = json.loads(payload)
+    except (stripe.SignatureVerificationError, ValueError) as exc:
+        raise InvalidPayload(str(exc)) from exc
+    if not isinstance(event, dict) or not event.get('id') or not event.get('type'):
+        raise InvalidPayload('Not a Stripe event')
+    return event
+
+
+def _completed_order_id(session):
+    reference = session.get('client_reference_id') or (session.get('metadata') or {}).get('order_id')
+    try:
+        return int(reference)
+    except (TypeError, ValueError):
+        return None
+
+
+def handle_event(event):
+    """Apply a verified event once. Returns False if it had already been processed."""
+    with write_transaction():
+        try:
+            with transaction.atomic():
+                ProcessedEvent.objects.create(event_id=event['id'], type=event['type'])
+        except IntegrityError:
+            return False
+
+        if event['type'] in ('checkout.session.completed', 'checkout.session.async_payment_succeeded'):
+            session = event['data']['object']
+            # Delayed payment methods complete the session before the money arrives
+            if session.get('payment_status') != 'paid':
+                return True
+            order_id = _completed_order_id(session)
+            total = Order.objects.filter(pk=order_id).values_list('total_amount', flat=True).first()
+            charged = (session.get('amount_total'), (session.get('currency') or '').lower())
+            if total is not None and charged != (int(total * 100), CHECKOUT_CURRENCY):
+                # Not what the order costs: take the money, but let the shop sort it out
+                logger.warning("Stripe event %s: order %s totals %s but %s %s was charged; held for review",
+                               event['id'], order_id, total, *charged)
+                hold_paid_order_for_review(order_id, session.get('id', ''))
+            elif total is None or finalise_paid_order(order_id, session.get('id', '')) is None:
+                logger.warning("Stripe event %s: order %s is unknown or not pending", event['id'], order_id)
+    return True
+
+
+@lru_cache(maxsize=1)
+def _fixture():
+    with open(FIXTURE) as f:
+        return json.load(f)
+
+
+def fixture_event(order_id, session_id, amount_total=None, event_id=None):
+    """A checkout.session.completed event for ``order_id``, built from the bundled sample.
+
+    Used by the fake payment gateway and by the webhook tests.
+    """
+    event = copy.deepcopy(_fixture())
+    event['id'] = event_id or f"evt_fake_{uuid.uuid4().hex[:24]}"
+    event['created'] = int(time.time())
+    session = event['data']['object']
+    session['id'] = session_id
+    session['client_reference_id'] = str(order_id)
+    session['metadata']['order_id'] = str(order_id)
+    if amount_total is not None:
+        session['amount_total'] = session['amount_subtotal'] = amount_total
+    return event
+
+
+def signed_fixture(secret, **kwargs):
+    """``(body, Stripe-Signature header)`` of a fixture_event() signed with ``secret``."""
+    body = json.dumps(fixture_event(**kwargs)).encode()
+    return body, sign_payload(body, secret)
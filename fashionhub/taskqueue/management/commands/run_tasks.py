@@ -0,0 +1,76 @@
+import os
+import socket
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connections
+
+from taskqueue.queue import claim, requeue_stale, run_job, run_job_by_id
+
+
+def _run_in_thread(job):
+    # Each thread gets its own connection; close it so idle threads do not hold one open
+    try:
+        return run_job(job)
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = (
+        "Run queued background jobs. Workers claim jobs from the taskqueue table, so several "
+        "of these can run side by side. Use --once to drain the queue and exit."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--concurrency", type=int, default=4, help="Jobs run at the same time.")
+        parser.add_argument("--mode", choices=("thread", "process"), default="thread",
+                            help="Run jobs in threads (I/O-bound work such as email) or processes "
+                                 "(CPU-bound work such as image resizing).")
+        parser.add_argument("--poll", type=float, default=1.0, help="Seconds to sleep when the queue is empty.")
+        parser.add_argument("--once", action="store_true", help="Exit as soon as no job is due.")
+
+    def handle(self, *args, **options):
+        concurrency = max(1, options["concurrency"])
+        worker_id = f"{socket.gethostname()}:{os.getpid()}"
+
+        if options["mode"] == "process":
+            # Forked workers must not share the parent's database connection
+            connections.close_all()
+            pool = ProcessPoolExecutor(max_workers=concurrency, initializer=django.setup)
+            submit = lambda job: pool.submit(run_job_by_id, job.pk)  # noqa: E731
+        else:
+            pool = ThreadPoolExecutor(max_workers=concurrency)
+            submit = lambda job: pool.submit(_run_in_thread, job)  # noqa: E731
+
+        self.stdout.write(f"Worker {worker_id} started ({options['mode']} x{concurrency}).")
+        ran = failed = 0
+        running = set()
+        try:
+            while True:
+                close_old_connections()
+                requeue_stale()
+                free = concurrency - len(running)
+                if free:
+                    for job in claim(worker_id, limit=free):
+                        running.add(submit(job))
+
+                if not running:
+                    if options["once"]:
+                        break
+                    time.sleep(options["poll"])
+                    continue
+
+                done, running = wait(running, timeout=options["poll"], return_when="FIRST_COMPLETED")
+                for future in done:
+                    ran += 1
+                    if not future.result():
+                        failed += 1
+        except KeyboardInterrupt:
+            self.stdout.write("Stopping; waiting for running jobs to finish...")
+        finally:
+            pool.shutdown(wait=True)
+
+        self.stdout.write(self.style.SUCCESS(f"Ran {ran} job(s); {failed} failed or will be retried."))
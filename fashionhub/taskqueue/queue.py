@@ -0,0 +1,172 @@
+import logging
+import random
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+
+# ---------------------------
+# Task registry
+# ---------------------------
+#
+# Apps declare background work in a ``tasks.py`` module (loaded by
+# TaskqueueConfig.ready()):
+#
+#     @task()
+#     def send_order_confirmation(order_id): ...
+#
+#     send_order_confirmation.delay(order.id)
+#
+# ``delay()`` only inserts a Job row, so it joins the caller's transaction: a
+# rolled-back order never sends its email. Arguments must be JSON-serialisable
+# (pass ids, not model instances). With TASKQUEUE_EAGER = True jobs run inline
+# instead, once the caller's transaction commits, which is handy in
+# development and tests.
+
+_registry = {}
+
+
+class UnknownTask(Exception):
+    """Raised when a job names a task that is not registered."""
+
+
+def task(name=None, max_attempts=5):
+    """Register a function as a background task and give it ``.delay()``."""
+    def decorator(func):
+        task_name = name or f"{func.__module__}.{func.__qualname__}"
+        _registry[task_name] = func
+        func.task_name = task_name
+        func.delay = lambda *args, **kwargs: enqueue(task_name, args, kwargs, max_attempts=max_attempts)
+        func.delay_until = lambda run_at, *args, **kwargs: enqueue(
+            task_name, args, kwargs, run_at=run_at, max_attempts=max_attempts,
+        )
+        return func
+    return decorator
+
+
+def enqueue(name, args=(), kwargs=None, run_at=None, max_attempts=5):
+    """Queue a call to task ``name``; returns the Job (or None when run eagerly)."""
+    if name not in _registry:
+        raise UnknownTask(name)
+    if getattr(settings, 'TASKQUEUE_EAGER', False):
+        # Like a queued job, it never sees (or outlives) an uncommitted write
+        transaction.on_commit(lambda: _registry[name](*args, **(kwargs or {})))
+        return None
+    return Job.objects.create(
+        name=name,
+        args=list(args),
+        kwargs=kwargs or {},
+        run_at=run_at or timezone.now(),
+        max_attempts=max_attempts,
+    )
+
+
+# ---------------------------
+# Claiming and running jobs
+# ---------------------------
+
+def backoff(attempts):
+    """Seconds to wait before retry number ``attempts`` (exponential, with jitter)."""
+    base = getattr(settings, 'TASKQUEUE_RETRY_DELAY', 10)
+    delay = min(base * 2 ** (attempts - 1), getattr(settings, 'TASKQUEUE_MAX_RETRY_DELAY', 60 * 60))
+    return delay * random.uniform(0.8, 1.2)
+
+
+def claim(worker_id, limit=1):
+    """Mark up to ``limit`` due jobs as running for ``worker_id`` and return them.
+
+    Each candidate is claimed with ``UPDATE ... WHERE status = 'queued'``; only
+    the worker whose update matched owns the job, so several workers can poll
+    the same table without running anything twice.
+    """
+    now = timezone.now()
+    candidates = list(
+        Job.objects
+        .filter(status=Job.QUEUED, run_at__lte=now)
+        .order_by('run_at', 'id')
+        .values_list('id', flat=True)[:limit * 2]
+    )
+    claimed = []
+    for job_id in candidates:
+        if len(claimed) == limit:
+            break
+        if Job.objects.filter(pk=job_id, status=Job.QUEUED).update(
+            status=Job.RUNNING, locked_by=worker_id, locked_at=now, attempts=F('attempts') + 1,
+        ):
+            claimed.append(job_id)
+    return list(Job.objects.filter(pk__in=claimed).order_by('run_at', 'id'))
+
+
+def run_job(job):
+    """Run a claimed job and record the outcome. Returns True on success.
+
+    A failed job goes back to the queue with an exponential backoff until it
+    has used up ``max_attempts``, after which it is marked failed. The task
+    is not wrapped in a transaction (long CPU work would hold the database
+    lock); tasks that make several writes use transaction.atomic themselves.
+    """
+    func = _registry.get(job.name)
+    try:
+        if func is None:
+            raise UnknownTask(job.name)
+        func(*job.args, **job.kwargs)
+    except Exception as exc:
+        error = ''.join(traceback.format_exception(exc))
+        if job.attempts >= job.max_attempts or isinstance(exc, UnknownTask):
+            logger.error("Job %s (%s) failed permanently: %s", job.pk, job.name, exc)
+            Job.objects.filter(pk=job.pk).update(
+                status=Job.FAILED, last_error=error, locked_by='', locked_at=None, updated_at=timezone.now(),
+            )
+        else:
+            delay = backoff(job.attempts)
+            logger.warning("Job %s (%s) failed, retrying in %.0fs: %s", job.pk, job.name, delay, exc)
+            Job.objects.filter(pk=job.pk).update(
+                status=Job.QUEUED, last_error=error, locked_by='', locked_at=None,
+                run_at=timezone.now() + timedelta(seconds=delay), updated_at=timezone.now(),
+            )
+        return False
+    Job.objects.filter(pk=job.pk).update(
+        status=Job.DONE, last_error='', locked_by='', locked_at=None, updated_at=timezone.now(),
+    )
+    return True
+
+
+def run_job_by_id(job_id):
+    """Run an already-claimed job by primary key (used by process-pool workers)."""
+    job = Job.objects.filter(pk=job_id, status=Job.RUNNING).first()
+    return run_job(job) if job else False
+
+
+def requeue_stale(timeout=None):
+    """Put back jobs whose worker died mid-run (running for longer than ``timeout`` seconds)."""
+    if timeout is None:
+        timeout = getattr(settings, 'TASKQUEUE_LOCK_TIMEOUT', 10 * 60)
+    cutoff = timezone.now() - timedelta(seconds=timeout)
+    return Job.objects.filter(status=Job.RUNNING, locked_at__lt=cutoff).update(
+        status=Job.QUEUED, locked_by='', locked_at=None, run_at=timezone.now(),
+    )
+
+
+def run_pending(worker_id='inline', limit=None):
+    """Run due jobs one after another in this process until none are left.
+
+    Returns the number of jobs run. Lets tests and scripts drain the queue
+    without starting a worker.
+    """
+    ran = 0
+    while limit is None or ran < limit:
+        jobs = claim(worker_id)
+        if not jobs:
+            break
+        for job in jobs:
+            run_job(job)
+            ran += 1
+    return ran
@@ -0,0 +1,140 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.db import transaction
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from .models import Job
+from .queue import backoff, claim, enqueue, requeue_stale, run_job, task
+
+calls = []
+
+
+@task(name='taskqueue.tests.record')
+def record(value):
+    calls.append(value)
+
+
+@task(name='taskqueue.tests.explode', max_attempts=2)
+def explode():
+    raise ValueError('boom')
+
+
+class QueueTestCase(TestCase):
+
+    def setUp(self):
+        calls.clear()
+
+    def _claim_one(self, worker_id='worker-1'):
+        jobs = claim(worker_id)
+        self.assertEqual(len(jobs), 1)
+        return jobs[0]
+
+
+class ClaimTests(QueueTestCase):
+    """Workers claim due jobs with a conditional UPDATE, so each job runs once."""
+
+    def test_due_jobs_are_claimed_oldest_first(self):
+        later = record.delay('later')
+        first = Job.objects.create(name=record.task_name, args=['first'],
+                                   run_at=timezone.now() - timedelta(minutes=1))
+        record.delay_until(timezone.now() + timedelta(hours=1), 'future')
+
+        claimed = claim('worker-1', limit=5)
+        self.assertEqual([job.pk for job in claimed], [first.pk, later.pk])
+        for job in claimed:
+            self.assertEqual(job.status, Job.RUNNING)
+            self.assertEqual(job.locked_by, 'worker-1')
+            self.assertEqual(job.attempts, 1)
+
+    def test_a_claimed_job_is_not_claimed_again(self):
+        record.delay('once')
+        self._claim_one('worker-1')
+        self.assertEqual(claim('worker-2'), [])
+
+
+class RunJobTests(QueueTestCase):
+
+    def test_success_marks_the_job_done(self):
+        record.delay('hello')
+        job = self._claim_one()
+        self.assertTrue(run_job(job))
+        self.assertEqual(calls, ['hello'])
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.locked_by, job.last_error), (Job.DONE, '', ''))
+
+    @override_settings(TASKQUEUE_RETRY_DELAY=10)
+    def test_failure_requeues_with_backoff(self):
+        explode.delay()
+        job = self._claim_one()
+        before = timezone.now()
+        with self.assertLogs('taskqueue.queue', 'WARNING'):
+            self.assertFalse(run_job(job))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.locked_by, job.attempts), (Job.QUEUED, '', 1))
+        self.assertIn('ValueError: boom', job.last_error)
+        # First retry: 10s, give or take 20% jitter
+        self.assertGreaterEqual(job.run_at, before + timedelta(seconds=8))
+        self.assertLessEqual(job.run_at, timezone.now() + timedelta(seconds=12))
+        self.assertEqual(claim('worker-2'), [])
+
+    def test_failure_after_max_attempts_is_permanent(self):
+        explode.delay()
+        for attempt in range(2):
+            Job.objects.update(run_at=timezone.now())
+            job = self._claim_one()
+            with self.assertLogs('taskqueue.queue', 'ERROR' if attempt else 'WARNING'):
+                run_job(job)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 2))
+        Job.objects.update(run_at=timezone.now())
+        self.assertEqual(claim('worker-1'), [])
+
+    def test_unknown_task_fails_without_retrying(self):
+        Job.objects.create(name='taskqueue.tests.missing')
+        job = self._claim_one()
+        with self.assertLogs('taskqueue.queue', 'ERROR'):
+            self.assertFalse(run_job(job))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 1))
+
+    @override_settings(TASKQUEUE_RETRY_DELAY=10, TASKQUEUE_MAX_RETRY_DELAY=60)
+    def test_backoff_doubles_up_to_the_cap(self):
+        with mock.patch('taskqueue.queue.random.uniform', return_value=1.0):
+            self.assertEqual([backoff(n) for n in (1, 2, 3, 4, 10)], [10, 20, 40, 60, 60])
+
+
+class RequeueStaleTests(QueueTestCase):
+
+    def test_jobs_of_dead_workers_go_back_to_the_queue(self):
+        record.delay('stale')
+        record.delay('busy')
+        stale, busy = claim('worker-1', limit=2)
+        Job.objects.filter(pk=stale.pk).update(locked_at=timezone.now() - timedelta(minutes=30))
+
+        self.assertEqual(requeue_stale(timeout=10 * 60), 1)
+        stale.refresh_from_db()
+        busy.refresh_from_db()
+        self.assertEqual((stale.status, stale.locked_by, stale.locked_at), (Job.QUEUED, '', None))
+        self.assertEqual(busy.status, Job.RUNNING)
+        self.assertEqual([job.pk for job in claim('worker-2')], [stale.pk])
+
+
+@override_settings(TASKQUEUE_EAGER=True)
+class EagerTests(QueueTestCase):
+
+    def test_eager_jobs_run_after_the_transaction_commits(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                self.assertIsNone(enqueue(record.task_name, ['eager']))
+                self.assertEqual(calls, [])
+        self.assertEqual(calls, ['eager'])
+        self.assertFalse(Job.objects.exists())
+
+    def test_eager_jobs_of_a_rolled_back_transaction_never_run(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                record.delay('rolled back')
+                raise RuntimeError
+        self.assertEqual((calls, callbacks), ([], []))
@@ -0,0 +1,165 @@
+import hashlib
+import re
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadhandler import FileUploadHandler, StopUpload
+from PIL import Image, ImageOps
+
+
+# ---------------------------
+# Profile picture processing
+# ---------------------------
+#
+# Uploads are never stored as-is. The original is validated from its header
+# (format, dimensions) before any pixels are decoded, JPEGs are decoded at a
+# reduced scale with Image.draft() so a 50 MP phone photo never sits in memory
+# at full size, and the result is centre-cropped to fixed square sizes saved
+# without EXIF (which can hold GPS coordinates). Files are named after a hash
+# of the upload, so the same photo uploaded twice is stored once.
+
+# Rendition name -> square edge in pixels; the largest is what
+# User.profile_picture points at, the others sit next to it
+AVATAR_SIZES = {
+    'small': 64,
+    'medium': 160,
+    'large': 320,
+}
+AVATAR_DIR = 'profile_pics'
+ALLOWED_FORMATS = {'JPEG', 'PNG', 'WEBP', 'GIF'}
+MAX_PIXELS = 40_000_000
+
+_AVATAR_NAME = re.compile(rf'^{AVATAR_DIR}/(?P<digest>[0-9a-f]{{16}})-(?P<size>\d+)\.jpg$')
+
+
+class InvalidAvatar(ValueError):
+    """Raised when an uploaded profile picture is rejected; the message is user-facing."""
+
+
+def _max_bytes():
+    return getattr(settings, 'PROFILE_PICTURE_MAX_BYTES', 5 * 1024 * 1024)
+
+
+class AvatarUploadLimit(FileUploadHandler):
+    """Stop reading an upload as soon as it passes PROFILE_PICTURE_MAX_BYTES.
+
+    Installed ahead of Django's own handlers, so an oversized file is never
+    spooled to memory or disk. The request is flagged with
+    ``avatar_too_large`` and the file is left out of request.FILES.
+    """
+
+    def receive_data_chunk(self, raw_data, start):
+        if start + len(raw_data) > _max_bytes():
+            self.request.avatar_too_large = True
+            raise StopUpload()
+        return raw_data
+
+    def file_complete(self, file_size):
+        return None
+
+
+def avatar_name(digest, size):
+    return f'{AVATAR_DIR}/{digest}-{size}.jpg'
+
+
+def _digest(upload):
+    # chunks() reads the upload (in memory or a temp file) a piece at a time
+    digest = hashlib.sha256()
+    for chunk in upload.chunks():
+        digest.update(chunk)
+    upload.seek(0)
+    return digest.hexdigest()[:16]
+
+
+def _open_validated(upload):
+    if upload.size > _max_bytes():
+        raise InvalidAvatar(f'Profile pictures must be smaller than {_max_bytes() // (1024 * 1024)} MB.')
+    try:
+        # Image.open only parses the header; pixels are decoded on load()
+        image = Image.open(upload)
+    except (OSError, Image.DecompressionBombError):
+        raise InvalidAvatar('Please upload a JPEG, PNG, WebP or GIF image.')
+    if image.format not in ALLOWED_FORMATS:
+        raise InvalidAvatar('Please upload a JPEG, PNG, WebP or GIF image.')
+    width, height = image.size
+    if width * height > MAX_PIXELS:
+        raise InvalidAvatar('That image is too large; please upload a smaller photo.')
+    return image
+
+
+def _decode(image):
+    """Decode ``image`` at the smallest scale that still covers the largest avatar."""
+    largest = max(AVATAR_SIZES.values())
+    # JPEG only: let libjpeg scale down by 1/2, 1/4 or 1/8 while decoding
+    image.draft('RGB', (largest, largest))
+    try:
+        image.load()
+    except (OSError, Image.DecompressionBombError):
+        raise InvalidAvatar('That image appears to be damaged; please try another.')
+    image = ImageOps.exif_transpose(image)
+    if image.mode != 'RGB':
+        rgba = image.convert('RGBA')
+        image = Image.new('RGB', rgba.size, (255, 255, 255))
+        image.paste(rgba, mask=rgba.getchannel('A'))
+    return image
+
+
+def save_avatar(upload, storage=default_storage):
+    """Validate ``upload`` and store its avatar sizes; return the name of the largest.
+
+    Raises InvalidAvatar with a message suitable for showing to the user.
+    """
+    image = _open_validated(upload)
+    digest = _digest(upload)
+    names = {size: avatar_name(digest, size) for size in AVATAR_SIZES.values()}
+    if all(storage.exists(name) for name in names.values()):
+        return names[max(names)]
+
+    source = _decode(image)
+    for size in sorted(AVATAR_SIZES.values(), reverse=True):
+        # Each smaller size is cut from the previous one, not the original
+        source = ImageOps.fit(source, (size, size), Image.Resampling.LANCZOS)
+        if not storage.exists(names[size]):
+            buffer = BytesIO()
+            source.save(buffer, 'JPEG', quality=85, optimize=True, progressive=True)
+            storage.save(names[size], ContentFile(buffer.getvalue()))
+    return names[max(names)]
+
+
+def avatar_variant(name, label):
+    """Name of the ``label`` size ('small', 'medium', 'large') of a stored avatar.
+
+    Pictures uploaded before avatars were resized only have the one file,
+    which is returned unchanged.
+    """
+    match = _AVATAR_NAME.match(name or '')
+    if not match:
+        return name
+    return avatar_name(match['digest'], AVATAR_SIZES[label])
+
+
+def delete_avatar(name, storage=default_storage):
+    """Delete every stored size of the avatar ``name`` (or the legacy file itself)."""
+    if not name:
+        return
+    match = _AVATAR_NAME.match(name)
+    names = [avatar_name(match['digest'], size) for size in AVATAR_SIZES.values()] if match else [name]
+    for path in names:
+        storage.delete(path)
+
+
+def set_profile_picture(user, upload):
+    """Store ``upload`` as ``user``'s profile picture and delete the one it replaces.
+
+    The old files are kept if another account still points at them (identical
+    uploads share storage).
+    """
+    storage = user.profile_picture.storage
+    new_name = save_avatar(upload, storage)
+    old_name = user.profile_picture.name
+    user.profile_picture = new_name
+    user.save(update_fields=['profile_picture'])
+    if old_name and old_name != new_name and not user._meta.model.objects.filter(profile_picture=old_name).exists():
+        delete_avatar(old_name, storage)
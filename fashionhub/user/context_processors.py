@@ -1,15 +1,23 @@
+from django.utils.functional import SimpleLazyObject
+
+from order.cart import cart_item_count as get_cart_item_count
+
+
+# Context processors run for every template rendered with a request, admin
+# pages included. Their values are lazy so the session (and the cart count
+# behind it) is only loaded by templates that actually show them.
+
 def is_logged_in(request):
     """Expose login state to templates using Django auth.
 
     Uses request.user.is_authenticated so navbar and other templates
     reflect the actual authentication state.
     """
-    return {'is_logged_in': bool(getattr(request, 'user', None) and request.user.is_authenticated)}
+    return {'is_logged_in': SimpleLazyObject(
+        lambda: bool(getattr(request, 'user', None) and request.user.is_authenticated)
+    )}
 
 
 def cart_item_count(request):
-    """Calculate and expose the total number of items in the cart."""
-    cart = request.session.get('cart', {})
-    # Sum all quantities across all cart items
-    total_items = sum(cart.values())
-    return {'cart_item_count': total_items}
+    """Expose the total number of items in the cart (see order.cart)."""
+    return {'cart_item_count': SimpleLazyObject(lambda: get_cart_item_count(request))}
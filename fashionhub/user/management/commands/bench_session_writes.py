@@ -0,0 +1,102 @@
+import time
+from importlib import import_module
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from clothes.models import Category, Product, ProductVariant, Size
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Replay a typical shopping visit (browse, add to cart, update the cart, log in, "
+        "check out) against the plain database session engine and the configured one, and "
+        "report session reads and writes per request. Everything is rolled back afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--visits", type=int, default=20, help="Visits to replay per engine.")
+        parser.add_argument("--baseline", default="django.contrib.sessions.backends.db",
+                            help="Session engine to compare against.")
+
+    def _visit(self, product, user):
+        client = Client(HTTP_HOST="localhost")
+        add = reverse("cart_add", args=[product.id])
+        update = reverse("cart_update", args=[product.id])
+        steps = [
+            ("get", reverse("home"), {}),
+            ("get", reverse("product_detail", args=[product.slug]), {}),
+            ("post", add, {"size": "M"}),
+            ("post", add, {"size": "M"}),
+            ("get", reverse("cart"), {}),
+            ("post", update, {"size": "M", "quantity": 3}),
+            # Same quantity again: nothing changes
+            ("post", update, {"size": "M", "quantity": 3}),
+            ("get", reverse("contact"), {}),
+            ("post", reverse("login"), {"username": user.username, "password": "bench-password"}),
+            ("get", reverse("cart"), {}),
+            ("get", reverse("checkout"), {}),
+        ]
+        reads = writes = 0
+        for method, url, data in steps:
+            with CaptureQueriesContext(connection) as queries:
+                getattr(client, method)(url, data)
+            for query in queries:
+                sql = query["sql"]
+                if "django_session" in sql:
+                    if sql.startswith("SELECT"):
+                        reads += 1
+                    else:
+                        writes += 1
+        self.session_keys.append((settings.SESSION_ENGINE, client.cookies[settings.SESSION_COOKIE_NAME].value))
+        return len(steps), reads, writes
+
+    def handle(self, *args, **options):
+        from user.models import User
+
+        engines = [options["baseline"], settings.SESSION_ENGINE]
+        results = []
+        self.session_keys = []
+        try:
+            with transaction.atomic():
+                category = Category.objects.create(name="__bench_session__", slug="__bench_session__")
+                product = Product.objects.create(
+                    category=category, name="Bench session", slug="__bench-session__", price="999.00",
+                )
+                size, _ = Size.objects.get_or_create(name="M")
+                ProductVariant.objects.create(product=product, size=size, stock=1_000)
+
+                for engine in engines:
+                    with override_settings(SESSION_ENGINE=engine):
+                        requests = reads = writes = 0
+                        start = time.perf_counter()
+                        for i in range(options["visits"]):
+                            user = User.objects.create_user(username=f"__bench_session_{engine}_{i}__",
+                                                            password="bench-password")
+                            steps, step_reads, step_writes = self._visit(product, user)
+                            requests += steps
+                            reads += step_reads
+                            writes += step_writes
+                        results.append((engine, requests, reads, writes, time.perf_counter() - start))
+                raise _Rollback
+        except _Rollback:
+            pass
+        finally:
+            # The rows are gone with the rollback, but cached sessions would linger
+            for engine, key in self.session_keys:
+                import_module(engine).SessionStore(session_key=key).delete()
+
+        for engine, requests, reads, writes, elapsed in results:
+            self.stdout.write(
+                f"{engine}\n  {requests} requests: {reads / requests:.2f} session reads and "
+                f"{writes / requests:.2f} session writes per request ({elapsed:.2f}s)"
+            )
+        self.stdout.write(self.style.SUCCESS("Benchmark finished; generated rows rolled back."))
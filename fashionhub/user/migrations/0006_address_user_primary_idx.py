@@ -0,0 +1,17 @@
+# Generated by Django 5.2.7 on 2026-10-18 10:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0005_alter_user_options_alter_user_managers_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='address',
+            index=models.Index(fields=['user', '-is_primary', '-id'], name='address_user_primary_idx'),
+        ),
+    ]
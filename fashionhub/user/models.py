@@ -20,5 +20,11 @@ class Address(models.Model):
     pincode = models.CharField(max_length=12, blank=True, null=True)
     is_primary = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [
+            # Address book and checkout: primary address first, then newest
+            models.Index(fields=['user', '-is_primary', '-id'], name='address_user_primary_idx'),
+        ]
+
     def __str__(self):
         return f"{self.user.username} - {self.city or self.address1 or 'Address'}"
@@ -0,0 +1,14 @@
+from django import template
+
+from user.avatars import avatar_variant
+
+register = template.Library()
+
+
+@register.filter
+def avatar_url(user, label='medium'):
+    """URL of one size of ``user``'s profile picture, e.g. ``user|avatar_url:'small'``."""
+    picture = getattr(user, 'profile_picture', None)
+    if not picture:
+        return ''
+    return picture.storage.url(avatar_variant(picture.name, label))
@@ -1,3 +1,139 @@
-from django.test import TestCase
+from io import BytesIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.messages import get_messages
+from django.core.files.storage import InMemoryStorage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from .avatars import AVATAR_DIR, InvalidAvatar, avatar_variant, delete_avatar, save_avatar
+from .models import User
+
+
+def image_upload(size=(400, 300), fmt='PNG', mode='RGB', color=(200, 30, 30), name='photo', **save_kwargs):
+    buffer = BytesIO()
+    Image.new(mode, size, color).save(buffer, fmt, **save_kwargs)
+    return SimpleUploadedFile(f'{name}.{fmt.lower()}', buffer.getvalue())
+
+
+class AvatarValidationTests(TestCase):
+    """Uploads are rejected from their size and header before any pixels are decoded."""
+
+    def setUp(self):
+        self.storage = InMemoryStorage()
+
+    def assertRejected(self, upload, message):
+        with self.assertRaisesMessage(InvalidAvatar, message):
+            save_avatar(upload, self.storage)
+        self.assertEqual(self.storage.listdir('')[1], [])
+
+    @override_settings(PROFILE_PICTURE_MAX_BYTES=1024 * 1024)
+    def test_oversized_file_is_rejected(self):
+        upload = SimpleUploadedFile('big.png', b'\x00' * (1024 * 1024 + 1))
+        self.assertRejected(upload, 'Profile pictures must be smaller than 1 MB.')
+
+    def test_file_that_is_not_an_image_is_rejected(self):
+        upload = SimpleUploadedFile('photo.jpg', b'definitely not a picture')
+        self.assertRejected(upload, 'Please upload a JPEG, PNG, WebP or GIF image.')
+
+    def test_unsupported_format_is_rejected(self):
+        self.assertRejected(image_upload(fmt='BMP'), 'Please upload a JPEG, PNG, WebP or GIF image.')
+
+    def test_too_many_pixels_is_rejected(self):
+        with mock.patch('user.avatars.MAX_PIXELS', 400 * 300 - 1):
+            self.assertRejected(image_upload(), 'That image is too large; please upload a smaller photo.')
+
+    def test_truncated_image_is_rejected(self):
+        data = image_upload(fmt='JPEG').read()
+        upload = SimpleUploadedFile('photo.jpg', data[:len(data) // 2])
+        self.assertRejected(upload, 'That image appears to be damaged; please try another.')
+
+
+class AvatarResizeTests(TestCase):
+    """Each upload is stored as square RGB JPEGs of every avatar size, without EXIF."""
+
+    def setUp(self):
+        self.storage = InMemoryStorage()
+
+    def _stored_files(self):
+        return sorted(self.storage.listdir(AVATAR_DIR)[1])
+
+    def _open(self, name):
+        with self.storage.open(name) as f:
+            image = Image.open(BytesIO(f.read()))
+            image.load()
+        return image
+
+    def test_every_size_is_stored_as_a_square_jpeg(self):
+        name = save_avatar(image_upload(size=(900, 500), mode='RGBA', color=(10, 120, 10, 0)), self.storage)
+
+        self.assertRegex(name, rf'^{AVATAR_DIR}/[0-9a-f]{{16}}-320\.jpg$')
+        digest = name[len(AVATAR_DIR) + 1:].split('-')[0]
+        self.assertEqual(self._stored_files(), [f'{digest}-160.jpg', f'{digest}-320.jpg', f'{digest}-64.jpg'])
+        for label, edge in (('small', 64), ('medium', 160), ('large', 320)):
+            image = self._open(avatar_variant(name, label))
+            self.assertEqual((image.format, image.mode, image.size), ('JPEG', 'RGB', (edge, edge)))
+        # Transparent pixels are flattened onto white, not black
+        self.assertGreater(min(self._open(name).getpixel((160, 160))), 240)
+
+    def test_exif_is_stripped_after_applying_the_orientation(self):
+        exif = Image.Exif()
+        exif[0x0112] = 6  # Orientation: rotate 90 degrees clockwise
+        exif[0x010F] = 'PhoneMaker'
+        # Left half red, right half blue; rotated upright, red ends up on top
+        photo = Image.new('RGB', (800, 400), (0, 0, 255))
+        photo.paste((255, 0, 0), (0, 0, 400, 400))
+        buffer = BytesIO()
+        photo.save(buffer, 'JPEG', exif=exif)
+
+        name = save_avatar(SimpleUploadedFile('phone.jpg', buffer.getvalue()), self.storage)
+        image = self._open(name)
+        self.assertEqual(len(image.getexif()), 0)
+        top, bottom = image.getpixel((160, 20)), image.getpixel((160, 300))
+        self.assertGreater(top[0], 200)
+        self.assertGreater(bottom[2], 200)
+
+    def test_large_jpeg_is_decoded_at_reduced_scale(self):
+        upload = image_upload(size=(4000, 3000), fmt='JPEG')
+        with mock.patch('user.avatars.ImageOps.exif_transpose', side_effect=lambda image: image) as transpose:
+            save_avatar(upload, self.storage)
+        decoded = transpose.call_args.args[0]
+        self.assertLess(decoded.size[0], 4000)
+        self.assertGreaterEqual(min(decoded.size), 320)
+
+    def test_same_upload_is_stored_once(self):
+        first = save_avatar(image_upload(), self.storage)
+        stored = self._stored_files()
+        with mock.patch.object(self.storage, 'save') as save:
+            second = save_avatar(image_upload(), self.storage)
+        self.assertEqual(first, second)
+        save.assert_not_called()
+        self.assertEqual(self._stored_files(), stored)
+
+    def test_delete_removes_every_size(self):
+        name = save_avatar(image_upload(), self.storage)
+        delete_avatar(name, self.storage)
+        self.assertEqual(self._stored_files(), [])
+
+    def test_legacy_pictures_have_a_single_file(self):
+        self.assertEqual(avatar_variant('profile_pics/me.png', 'small'), 'profile_pics/me.png')
+
+
+class ProfilePictureUploadTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='avatar', password='avatar-pass-123')
+        self.client.force_login(self.user)
+
+    @override_settings(PROFILE_PICTURE_MAX_BYTES=2048)
+    def test_oversized_upload_is_stopped_while_streaming(self):
+        upload = SimpleUploadedFile('big.png', b'\x00' * 10_000)
+        response = self.client.post(reverse('profile'), {'profile_picture': upload})
+
+        self.assertRedirects(response, reverse('profile'), fetch_redirect_response=False)
+        self.assertEqual([str(m) for m in get_messages(response.wsgi_request)],
+                         ['That picture is too large; please upload a smaller photo.'])
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.profile_picture)
@@ -2,7 +2,10 @@ from django.contrib.auth import authenticate, login as auth_login, logout as aut
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.shortcuts import get_object_or_404, render, redirect
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
+from .avatars import AvatarUploadLimit, InvalidAvatar, set_profile_picture
 from .models import User, Address
+from order.models import CustomerStats
 import re
 
 
@@ -74,20 +77,36 @@ def logout(request):
 
 # ---------------- PROFILE ----------------
 @login_required(login_url='login')
+@csrf_exempt
 def profile(request):
+    # The size limit has to be installed before anything reads request.POST,
+    # which is why CSRF is checked in _profile rather than by the middleware
+    request.upload_handlers.insert(0, AvatarUploadLimit(request))
+    return _profile(request)
+
+
+@csrf_protect
+def _profile(request):
     user = request.user
     addresses = Address.objects.filter(user=user).order_by('-is_primary', '-id')
 
     # Handle profile picture upload
-    if request.method == 'POST' and request.FILES.get('profile_picture'):
-        user.profile_picture = request.FILES['profile_picture']
-        user.save()
-        messages.success(request, 'Profile picture updated successfully.')
+    if request.method == 'POST' and (request.FILES.get('profile_picture') or getattr(request, 'avatar_too_large', False)):
+        try:
+            if getattr(request, 'avatar_too_large', False):
+                raise InvalidAvatar('That picture is too large; please upload a smaller photo.')
+            set_profile_picture(user, request.FILES['profile_picture'])
+        except InvalidAvatar as exc:
+            messages.error(request, str(exc))
+        else:
+            messages.success(request, 'Profile picture updated successfully.')
         return redirect('profile')
 
     return render(request, 'profile.html', {
         'user': user,
         'addresses': addresses,
+        # Kept up to date at order placement; one primary key lookup
+        'order_stats': CustomerStats.objects.filter(user=user).first(),
     })
 
 